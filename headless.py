@@ -0,0 +1,46 @@
+# headless.py 无界面批量运行入口，例：python headless.py --total-time 60 --stride 10 --output run.npz
+# 长时间运行：--checkpoint run.ckpt 定期存档，中断后 --resume run.ckpt 继续
+import argparse
+import numpy as np
+from src.config import SIMULATION_PARAMS
+from src.headless_runner import run_headless
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="不创建窗口，以最快速度推进物理模拟")
+    parser.add_argument('--total-time', type=float, default=SIMULATION_PARAMS['total_time'], help="模拟总时长（秒）")
+    parser.add_argument('--dt', type=float, default=SIMULATION_PARAMS['dt'], help="物理步长")
+    parser.add_argument('--num-bodies', type=int, default=SIMULATION_PARAMS['num_bodies'], help="天体数量")
+    parser.add_argument('--initial-conditions', default=SIMULATION_PARAMS['initial_conditions'],
+                        help="初始分布 uniform/plummer/disk/orbits")
+    parser.add_argument('--solver', default=SIMULATION_PARAMS['gravity_solver'], help="引力求解器 direct/barnes_hut")
+    parser.add_argument('--integrator', default=SIMULATION_PARAMS['integrator'],
+                        help="积分器 taylor/verlet/leapfrog/block")
+    parser.add_argument('--precision', default=SIMULATION_PARAMS['precision'], help="引力内核精度 float64/float32")
+    parser.add_argument('--kernel-backend', default=SIMULATION_PARAMS['kernel_backend'],
+                        help="内核后端 numpy/numba（未安装 numba 时回退到 numpy）")
+    parser.add_argument('--fusion-mode', default=SIMULATION_PARAMS['fusion_mode'],
+                        help="融合模式 pair（逐对）/cluster（一帧内合并整个重叠簇）")
+    parser.add_argument('--diagnostics', action='store_true', help="统计每步的能量与动量漂移")
+    parser.add_argument('--stride', type=int, default=1, help="每隔多少帧记录一次快照")
+    parser.add_argument('--seed', type=int, default=None, help="随机种子")
+    parser.add_argument('--output', default=None, help="快照保存路径（.npz）")
+    parser.add_argument('--profile', default=None, help="导出每帧各物理阶段耗时（.csv/.json）")
+    parser.add_argument('--record', default=None, help="逐帧轨迹记录目录，可用 python -m src.trajectory <目录> 回放")
+    parser.add_argument('--checkpoint', default=None, help="存档路径，运行中定期及结束时原子写入")
+    parser.add_argument('--checkpoint-every', type=int, default=1000, help="每隔多少帧写一次存档")
+    parser.add_argument('--resume', default=None, help="从存档恢复（沿用存档中的参数），运行到 --total-time 为止")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.seed is not None:
+        np.random.seed(args.seed)
+    params = dict(SIMULATION_PARAMS, dt=args.dt, num_bodies=args.num_bodies,
+                  initial_conditions=args.initial_conditions, gravity_solver=args.solver,
+                  integrator=args.integrator, fusion_mode=args.fusion_mode,
+                  precision=args.precision, kernel_backend=args.kernel_backend, diagnostics=args.diagnostics or SIMULATION_PARAMS['diagnostics'])
+    run_headless(None if args.resume else params, args.total_time, args.stride, args.output, args.record,
+                 profile=args.profile, checkpoint=args.checkpoint,
+                 checkpoint_every=args.checkpoint_every if args.checkpoint else 0, resume=args.resume)
@@ -0,0 +1,52 @@
+# src/artist_pool.py 圆环图元池：结束的特效、消失天体的圆环不再丢弃，放回池中重新着色、调整大小后复用
+import matplotlib.pyplot as plt
+from typing import List
+from src.config import RENDERER_PARAMS
+
+
+class CirclePool:
+    """Circle 补丁池，池中最多保留 max_size 个空闲圆环，超出的才真正从画布删除
+    这样 ax.patches 的数量只取决于同一时刻画面上的圆环数，不会随运行时间无限增长"""
+
+    def __init__(self, ax, max_size:int = None):
+        self.ax = ax
+        self.max_size = RENDERER_PARAMS.get('artist_pool_size', 3000) if max_size is None else max_size
+        self.free = []
+        self.created = 0 # 累计新建的圆环数，用于观察复用效果
+
+    def acquire(self, pos, radius, color, zorder, linewidth=None, animated=False)->plt.Circle:
+        """取出一个圆环并设置成需要的样子；linewidth 为 None 表示实心圆，否则为空心圆环"""
+        if self.free:
+            circle = self.free.pop()
+        else:
+            circle = plt.Circle((0, 0), 0)
+            self.ax.add_patch(circle)
+            self.created += 1
+        circle.center = pos
+        circle.radius = radius
+        if linewidth is None:
+            # 与 plt.Circle(pos, r, color=color, ec='none') 一致
+            circle.set_fill(True)
+            circle.set_facecolor(color)
+            circle.set_edgecolor('none')
+            circle.set_linewidth(None)
+        else:
+            # 与 plt.Circle(pos, r, color=color, fill=False, linewidth=lw, ec=color) 一致
+            circle.set_fill(False)
+            circle.set_facecolor(color)
+            circle.set_edgecolor(color)
+            circle.set_linewidth(linewidth)
+        circle.set_zorder(zorder)
+        circle.set_alpha(None)
+        circle.set_animated(animated)
+        circle.set_visible(True)
+        return circle
+
+    def release(self, circles:List[plt.Circle])->None:
+        """归还圆环：隐藏后放回池中，池满时直接从画布删除"""
+        for circle in circles:
+            if len(self.free) < self.max_size:
+                circle.set_visible(False)
+                self.free.append(circle)
+            else:
+                circle.remove()
@@ -0,0 +1,115 @@
+# src/barnes_hut.py Barnes–Hut 四叉树引力求解器，复杂度 O(N log N)
+# 树的建立与遍历都按层批量进行，每一层只有少量 numpy 调用，不对单个天体做 Python 循环
+import numpy as np
+from typing import Dict, Optional
+from src.kernels import pairwise_acceleration, SOFTENING
+
+MAX_DEPTH = 24 # 四叉树最大深度，防止完全重合的天体无限细分
+
+
+class QuadTree:
+    """按层构建的四叉树，所有节点信息存放在平铺数组里
+    mass/com/size 为节点总质量、质心与边长，child_start/child_count 为子节点区间（CSR 形式）"""
+
+    def __init__(self, positions:np.ndarray, masses:np.ndarray, max_depth:int = MAX_DEPTH):
+        n = len(positions)
+        low = positions.min(axis=0)
+        width = float(np.max(positions.max(axis=0) - low)) or 1.0
+        width *= 1 + 1e-9  # 稍微放大，保证最右侧的天体落在格子内部
+
+        node_mass, node_com, node_size, node_leaf, node_parent = [], [], [], [], []
+        node_count = 0
+        active = np.arange(n)  # 当前层仍需细分的天体
+        parent_of_active = np.full(n, -1)  # 这些天体在上一层所属的节点
+        for level in range(max_depth + 1):
+            if len(active) == 0:
+                break
+            cells = 1 << level
+            cell = np.floor((positions[active] - low) / width * cells).astype(np.int64)
+            np.clip(cell, 0, cells - 1, out=cell)
+            # 键 = 父节点编号*4 + 象限（格子坐标的最低位），同一父节点的子格子排在一起，子节点区间天然连续
+            keys = (parent_of_active + 1) * 4 + (cell[:, 0] & 1) * 2 + (cell[:, 1] & 1)
+            unique_keys, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+            m = len(unique_keys)
+            mass = np.bincount(inverse, masses[active], minlength=m)
+            com = np.stack([np.bincount(inverse, masses[active] * positions[active, 0], minlength=m),
+                            np.bincount(inverse, masses[active] * positions[active, 1], minlength=m)], axis=1)
+            com /= np.where(mass > 0, mass, 1)[:, np.newaxis]
+            count = np.bincount(inverse, minlength=m)
+            leaf = (count == 1) | (level == max_depth)
+
+            node_mass.append(mass)
+            node_com.append(com)
+            node_size.append(np.full(m, width / cells))
+            node_leaf.append(leaf)
+            node_parent.append(parent_of_active[first])
+
+            ids = node_count + np.arange(m)
+            node_count += m
+            split = ~leaf[inverse]
+            active = active[split]
+            parent_of_active = ids[inverse][split]
+
+        self.mass = np.concatenate(node_mass)
+        self.com = np.concatenate(node_com)
+        self.size = np.concatenate(node_size)
+        self.leaf = np.concatenate(node_leaf)
+        parent = np.concatenate(node_parent)
+        # 子节点按父节点分组且编号连续，统计每个父节点的第一个子节点与子节点数
+        children = np.nonzero(parent >= 0)[0]
+        self.child_count = np.bincount(parent[children], minlength=node_count)
+        self.child_start = np.zeros(node_count, dtype=np.int64)
+        has_child = self.child_count > 0
+        self.child_start[has_child] = children[np.searchsorted(parent[children], np.nonzero(has_child)[0])]
+
+    def __len__(self) -> int:
+        return len(self.mass)
+
+
+def barnes_hut_acceleration(positions:np.ndarray, masses:np.ndarray, G:float,
+                            theta:float = 0.5, targets:Optional[np.ndarray] = None)->np.ndarray:
+    """用 Barnes–Hut 近似计算加速度，节点边长/距离 < theta 时把整个节点当作质点
+    软化方式与直接求和一致：a = G*M*dr/(d+SOFTENING)^3
+    targets 给出行号时用全部天体建树，只遍历这些天体，返回 (len(targets),2)"""
+    n = len(positions)
+    target_positions = positions if targets is None else positions[targets]
+    m = len(target_positions)
+    accelerations = np.zeros((m, 2))
+    if n == 0 or m == 0:
+        return accelerations
+    tree = QuadTree(positions, masses)
+    # 待处理的（天体, 节点）对，从根节点开始逐层展开；body 为 target_positions 中的行号
+    body = np.arange(m)
+    node = np.zeros(m, dtype=np.int64)
+    while len(body):
+        dr = tree.com[node] - target_positions[body]
+        distance = np.sqrt(dr[:, 0] ** 2 + dr[:, 1] ** 2)
+        accept = tree.leaf[node] | (tree.size[node] < theta * distance)
+
+        b, d = body[accept], distance[accept] + SOFTENING
+        factor = G * tree.mass[node[accept]] / d ** 3
+        accelerations[:, 0] += np.bincount(b, factor * dr[accept, 0], minlength=m)
+        accelerations[:, 1] += np.bincount(b, factor * dr[accept, 1], minlength=m)
+
+        # 没被接受的节点展开成它的子节点
+        body, node = body[~accept], node[~accept]
+        counts = tree.child_count[node]
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        node = np.repeat(tree.child_start[node], counts) + offsets
+        body = np.repeat(body, counts)
+    return accelerations
+
+
+def barnes_hut_error(positions:np.ndarray, masses:np.ndarray, G:float,
+                     theta:float = 0.5)->Dict[str, float]:
+    """与精确直接求和对比，返回加速度相对误差的统计"""
+    exact = pairwise_acceleration(positions, masses, G)
+    approx = barnes_hut_acceleration(positions, masses, G, theta)
+    scale = np.linalg.norm(exact, axis=1)
+    error = np.linalg.norm(approx - exact, axis=1) / np.where(scale > 0, scale, 1)
+    return {
+        'theta': theta,
+        'mean_rel_err': float(error.mean()) if len(error) else 0.0,
+        'median_rel_err': float(np.median(error)) if len(error) else 0.0,
+        'max_rel_err': float(error.max()) if len(error) else 0.0,
+    }
@@ -0,0 +1,232 @@
+# src/batched_engine.py 批量多宇宙推进：B 个小规模模拟放在补齐的 (B, N_max, ...) 数组里同步步进
+# 引力与融合检测对所有宇宙一次 numpy 调用完成；被融合的天体只清除 alive 标记并把质量置0，不重新分配数组
+# 每个宇宙的结果与单独用 PhysicsEngine 运行完全一致（逐位相同）
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from src.simulation_data import SimulationState
+from src.physics_engine import PhysicsEngine
+from src.kernels import SOFTENING, CHUNK_ELEMENTS
+
+BATCHED_INTEGRATORS = ('taylor', 'verlet', 'leapfrog') # 块步长需要逐天体子步，不适合批量同步推进
+
+
+class BatchedState:
+    """B 个宇宙的补齐数组，原地更新（不保留历史帧）
+    alive 为 False 的位置是空位或已被融合的天体，其质量、速度、加速度均为0，对引力没有贡献"""
+
+    def __init__(self, ids:np.ndarray, mass:np.ndarray, radius:np.ndarray, pos:np.ndarray, vel:np.ndarray,
+                 acc:np.ndarray, alive:np.ndarray, acc_valid:np.ndarray, time:float = 0.0, frame:int = 0):
+        self.ids = ids
+        self.mass = mass
+        self.radius = radius
+        self.pos = pos
+        self.vel = vel
+        self.acc = acc
+        self.alive = alive
+        self.acc_valid = acc_valid # 每个宇宙一个标记，含义同 SimulationState.acc_valid
+        self.time = time
+        self.frame = frame
+
+    @classmethod
+    def from_states(cls, states:List[SimulationState])->'BatchedState':
+        """把多个 SimulationState 补齐打包，天体在每行中的顺序保持不变"""
+        b = len(states)
+        n = max((len(state) for state in states), default=0)
+        batch = cls(np.full((b, n), -1, dtype=np.int64), np.zeros((b, n)), np.zeros((b, n)),
+                    np.zeros((b, n, 2)), np.zeros((b, n, 2)), np.zeros((b, n, 2)),
+                    np.zeros((b, n), dtype=bool), np.array([state.acc_valid for state in states], dtype=bool),
+                    states[0].time if states else 0.0, states[0].frame if states else 0)
+        for u, state in enumerate(states):
+            rows = slice(0, len(state))
+            for name in SimulationState.ARRAY_FIELDS:
+                getattr(batch, name)[u, rows] = getattr(state, name)
+            batch.alive[u, rows] = True
+        return batch
+
+    def __len__(self)->int:
+        return len(self.ids)
+
+    def counts(self)->np.ndarray:
+        """每个宇宙剩余的天体数"""
+        return self.alive.sum(axis=1)
+
+    def universe(self, u:int)->SimulationState:
+        """取出第 u 个宇宙的紧凑状态"""
+        alive = self.alive[u]
+        return SimulationState.from_arrays(*(getattr(self, name)[u, alive] for name in SimulationState.ARRAY_FIELDS),
+                                           time=self.time, frame=self.frame, acc_valid=bool(self.acc_valid[u]))
+
+    def compact(self)->None:
+        """把每行存活的天体按原顺序左移，截掉所有宇宙都已空出的尾部列（行内相对顺序不变，结果不受影响）"""
+        counts = self.counts()
+        width = int(counts.max()) if len(counts) else 0
+        order = np.argsort(~self.alive, axis=1, kind='stable')[:, :width]
+        for name in ('ids', 'mass', 'radius', 'alive'):
+            setattr(self, name, np.take_along_axis(getattr(self, name), order, axis=1))
+        for name in ('pos', 'vel', 'acc'):
+            setattr(self, name, np.take_along_axis(getattr(self, name), order[:, :, np.newaxis], axis=1))
+
+
+def batched_acceleration(positions:np.ndarray, masses:np.ndarray, G:np.ndarray)->np.ndarray:
+    """批量直接求和：positions (B,N,2)，masses (B,N)，G (B,)，按宇宙分块限制 (b,N,N) 临时数组大小
+    运算顺序与 kernels.pairwise_acceleration 相同，质量为0的空位贡献恰好为0"""
+    b, n = masses.shape
+    accelerations = np.zeros((b, n, 2))
+    if n == 0:
+        return accelerations
+    chunk = max(1, CHUNK_ELEMENTS // (n * n))
+    for start in range(0, b, chunk):
+        stop = min(start + chunk, b)
+        p = positions[start:stop]
+        dr = p[:, np.newaxis, :, :] - p[:, :, np.newaxis, :]
+        distance = np.sqrt(np.einsum('bijk,bijk->bij', dr, dr)) + SOFTENING
+        force_magnitude = G[start:stop, np.newaxis, np.newaxis] * masses[start:stop, np.newaxis, :] / distance ** 2
+        accelerations[start:stop] = np.einsum('bij,bijk->bik', force_magnitude / distance, dr)
+    return accelerations
+
+
+def batched_fusion_candidates(positions:np.ndarray, radii:np.ndarray,
+                              alive:np.ndarray)->Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """所有宇宙中满足 distance < (r_i+r_j)/3 的存活天体对 (宇宙, i, j)，i<j
+    每个宇宙内按 (距离, i, j) 排序，与 kernels.fusion_candidates 的顺序一致"""
+    b, n = alive.shape
+    found = []
+    chunk = max(1, CHUNK_ELEMENTS // max(1, n * n))
+    for start in range(0, b, chunk):
+        stop = min(start + chunk, b)
+        x, y, r = positions[start:stop, :, 0], positions[start:stop, :, 1], radii[start:stop]
+        dx = x[:, :, np.newaxis] - x[:, np.newaxis, :]
+        dy = y[:, :, np.newaxis] - y[:, np.newaxis, :]
+        reach = (r[:, :, np.newaxis] + r[:, np.newaxis, :]) / 3
+        # 先用平方距离粗筛（略放宽阈值，不开方），命中的少数天体对再按原公式精确判定
+        u, i, j = np.nonzero(dx * dx + dy * dy < reach * reach * (1 + 1e-9))
+        keep = (i < j) & alive[u + start, i] & alive[u + start, j]
+        u, i, j = u[keep], i[keep], j[keep]
+        dr = positions[u + start, i] - positions[u + start, j]
+        distance = np.sqrt(dr[:, 0] ** 2 + dr[:, 1] ** 2)
+        hit = distance < (radii[u + start, i] + radii[u + start, j]) / 3
+        found.append((u[hit] + start, i[hit], j[hit], distance[hit]))
+    if not found:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    u, i, j, distance = (np.concatenate(column) for column in zip(*found))
+    order = np.lexsort((j, i, distance, u))
+    return u[order], i[order], j[order]
+
+
+class BatchedPhysicsEngine:
+    """同步推进多个宇宙；所有宇宙共用 dt 与积分器，G 与初始条件参数可以各不相同"""
+
+    def __init__(self, params_list:List[Dict]):
+        self.params_list = params_list
+        self.dt = params_list[0]['dt']
+        self.integrator = params_list[0].get('integrator', 'taylor')
+        if any(p['dt'] != self.dt or p.get('integrator', 'taylor') != self.integrator for p in params_list):
+            raise ValueError("批量推进要求所有宇宙使用相同的 dt 与积分器")
+        if self.integrator not in BATCHED_INTEGRATORS:
+            raise ValueError(f"批量推进不支持积分器 {self.integrator}，可选 {BATCHED_INTEGRATORS}")
+        if any(p.get('gravity_solver', 'direct') != 'direct' for p in params_list):
+            raise ValueError("批量推进只支持直接求和（小规模宇宙下 Barnes–Hut 没有优势）")
+        if any(p.get('fusion_mode', 'pair') != 'pair' for p in params_list):
+            raise ValueError("批量推进只支持逐对融合（fusion_mode='pair'）")
+        self.G = np.array([p['G'] for p in params_list], dtype=float)
+
+    def initialize(self, rngs:Optional[List[np.random.Generator]] = None)->BatchedState:
+        """用与 PhysicsEngine 相同的初始化逻辑生成每个宇宙，rngs 为每个宇宙独立的随机数发生器"""
+        states = [PhysicsEngine(p).initialize_physics_state(p, None if rngs is None else rngs[u])
+                  for u, p in enumerate(self.params_list)]
+        return BatchedState.from_states(states)
+
+    def compute_accelerations(self, positions:np.ndarray, state:BatchedState,
+                              universes:Optional[np.ndarray] = None)->np.ndarray:
+        """只计算 universes 中的宇宙（None 为全部），空位的加速度置0"""
+        if universes is None:
+            acceleration = batched_acceleration(positions, state.mass, self.G)
+            acceleration[~state.alive] = 0
+            return acceleration
+        acceleration = batched_acceleration(positions[universes], state.mass[universes], self.G[universes])
+        acceleration[~state.alive[universes]] = 0
+        return acceleration
+
+    def integrate(self, state:BatchedState)->None:
+        """按积分器原地推进位置与速度，公式与 src/integrator.py 中对应的函数逐项一致"""
+        dt = self.dt
+        if self.integrator == 'taylor':
+            acceleration = self.compute_accelerations(state.pos, state)
+            state.pos = state.pos + state.vel * dt + 1/2 * acceleration * dt ** 2
+            state.vel = state.vel + acceleration * dt
+            state.acc = acceleration
+            state.acc_valid[:] = False
+        elif self.integrator == 'verlet':
+            acceleration = state.acc
+            stale = np.nonzero(~state.acc_valid)[0]
+            if len(stale):
+                acceleration = acceleration.copy()
+                acceleration[stale] = self.compute_accelerations(state.pos, state, stale)
+            half_velocity = state.vel + 1/2 * acceleration * dt
+            state.pos = state.pos + half_velocity * dt
+            state.acc = self.compute_accelerations(state.pos, state)
+            state.vel = half_velocity + 1/2 * state.acc * dt
+            state.acc_valid[:] = True
+        else:
+            half_position = state.pos + 1/2 * state.vel * dt
+            acceleration = self.compute_accelerations(half_position, state)
+            state.vel = state.vel + acceleration * dt
+            state.pos = half_position + 1/2 * state.vel * dt
+            state.acc = acceleration
+            state.acc_valid[:] = False
+
+    def fuse(self, state:BatchedState)->List[Tuple[int, int, int]]:
+        """检测并执行融合，规则与 PhysicsEngine.detect_fusion 相同：按距离从近到远贪心配对，
+        同一天体一帧内多次吞并只保留第一次的结果；返回 (宇宙, 消失天体id, 吞并它的天体id) 列表"""
+        universe, row_a, row_b = batched_fusion_candidates(state.pos, state.radius, state.alive)
+        if len(universe) == 0:
+            return []
+        mass, position, velocity = state.mass.copy(), state.pos.copy(), state.vel.copy() # 融合前的数据
+        removed, updated, events = set(), set(), []
+        for u, a, b in zip(universe.tolist(), row_a.tolist(), row_b.tolist()):
+            if mass[u, a] < mass[u, b]:
+                fusion_row, remove_row = b, a
+            else:
+                fusion_row, remove_row = a, b
+            if (u, remove_row) in removed or (u, fusion_row) in removed:
+                continue
+            removed.add((u, remove_row))
+            events.append((u, int(state.ids[u, remove_row]), int(state.ids[u, fusion_row])))
+            if (u, fusion_row) in updated:
+                continue
+            updated.add((u, fusion_row))
+            total_mass = mass[u, fusion_row] + mass[u, remove_row]
+            state.pos[u, fusion_row] = (position[u, fusion_row] * mass[u, fusion_row] +
+                                        position[u, remove_row] * mass[u, remove_row]) / total_mass
+            state.vel[u, fusion_row] = (velocity[u, fusion_row] * mass[u, fusion_row] +
+                                        velocity[u, remove_row] * mass[u, remove_row]) / total_mass
+            state.mass[u, fusion_row] = total_mass
+            state.radius[u, fusion_row] = 3 / 7 * total_mass ** (1 / 3)
+        # 被融合的天体只做掩码：清除 alive，质量/速度/加速度置0，之后对引力与融合检测都不再有影响
+        u, rows = (np.array(column, dtype=np.int64) for column in zip(*removed))
+        state.alive[u, rows] = False
+        state.mass[u, rows] = 0
+        state.radius[u, rows] = 0
+        state.vel[u, rows] = 0
+        state.acc[u, rows] = 0
+        state.acc_valid[np.unique(u)] = False
+        return events
+
+    def step(self, state:BatchedState)->List[Tuple[int, int, int]]:
+        """推进一帧：积分 → 融合（掩码删除）→ 时间前进；所有宇宙的尾部都空出 1/8 宽度后压缩数组"""
+        self.integrate(state)
+        events = self.fuse(state)
+        state.time += self.dt
+        state.frame += 1
+        if events and state.counts().max() * 8 <= state.ids.shape[1] * 7:
+            state.compact()
+        return events
+
+    def run(self, state:BatchedState, frames:int)->List[Tuple[int, int, int, int]]:
+        """推进 frames 帧，返回所有融合事件 (帧号, 宇宙, 消失天体id, 吞并它的天体id)"""
+        events = []
+        for _ in range(frames):
+            step_events = self.step(state)
+            events.extend((state.frame, *event) for event in step_events)
+        return events
@@ -0,0 +1,725 @@
+# src/benchmark.py 性能基准，纯计算部分不依赖 matplotlib
+# 用法：python -m src.benchmark gravity
+import sys
+import time
+import numpy as np
+from typing import List, Dict, Callable, Optional
+from src.kernels import pairwise_acceleration, fusion_candidates, SOFTENING
+from src.barnes_hut import barnes_hut_acceleration, barnes_hut_error
+
+
+def random_bodies_arrays(n:int, seed:int = 0, lim:float = 50.0):
+    """生成可复现的随机位置与质量数组"""
+    rng = np.random.default_rng(seed)
+    positions = rng.uniform(-lim, lim, (n, 2))
+    masses = rng.uniform(10, 1000, n)
+    return positions, masses
+
+
+def acceleration_loop(positions:np.ndarray, masses:np.ndarray, G:float)->np.ndarray:
+    """原始的纯 Python 双重循环实现，作为正确性与性能对照"""
+    accelerations = []
+    for i in range(len(positions)):
+        acceleration = np.array([0.0, 0.0])
+        for j in range(len(positions)):
+            if i != j:
+                dr = positions[j] - positions[i]
+                distance = np.linalg.norm(dr) + SOFTENING
+                force_magnitude = G * masses[j] / (distance ** 2)
+                acceleration += force_magnitude * dr / distance
+        accelerations.append(acceleration)
+    return np.array(accelerations).reshape(-1, 2)
+
+
+def time_call(fn:Callable, repeat:int = 3)->float:
+    """取多次运行中的最短耗时（秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_gravity(ns=(20, 100, 500, 1000, 2000), G:float = 2, loop_limit:int = 1000,
+                  repeat:int = 3)->List[Dict]:
+    """对比双重循环与向量化内核在不同 N 下的耗时，超过 loop_limit 的 N 不再运行循环版本"""
+    results = []
+    for n in ns:
+        positions, masses = random_bodies_arrays(n)
+        vectorized = time_call(lambda: pairwise_acceleration(positions, masses, G), repeat)
+        row = {'n': n, 'vectorized_s': vectorized, 'loop_s': None, 'speedup': None, 'max_abs_err': None}
+        if n <= loop_limit:
+            loop = time_call(lambda: acceleration_loop(positions, masses, G), 1)
+            err = np.max(np.abs(acceleration_loop(positions, masses, G) -
+                                pairwise_acceleration(positions, masses, G)))
+            row.update(loop_s=loop, speedup=loop / vectorized, max_abs_err=float(err))
+        results.append(row)
+        print(f"N={n:>6}  向量化 {vectorized * 1e3:9.3f} ms  " +
+              (f"循环 {row['loop_s'] * 1e3:9.3f} ms  加速 {row['speedup']:7.1f}x  误差 {row['max_abs_err']:.2e}"
+               if row['loop_s'] is not None else "循环 (跳过)"))
+    return results
+
+
+def fusion_candidates_brute(positions:np.ndarray, radii:np.ndarray):
+    """暴力遍历所有 i<j 天体对的融合候选，作为网格粗筛的对照"""
+    row_a, row_b = np.triu_indices(len(positions), 1)
+    dr = positions[row_a] - positions[row_b]
+    distance = np.sqrt(dr[:, 0] ** 2 + dr[:, 1] ** 2)
+    hit = distance < (radii[row_a] + radii[row_b]) / 3
+    order = np.argsort(distance[hit], kind='stable')
+    return row_a[hit][order], row_b[hit][order], distance[hit][order]
+
+
+def random_fusion_arrays(n:int, rng:np.random.Generator):
+    """生成随机的位置与半径，分布范围随 N 缩放，保证有一定数量的融合候选"""
+    lim = rng.uniform(1, 3) * np.sqrt(n)
+    positions = rng.uniform(-lim, lim, (n, 2))
+    # 偶尔把部分天体放到完全重合的位置，覆盖距离相同的情况
+    if n > 2 and rng.random() < 0.3:
+        positions[rng.integers(0, n, n // 4)] = positions[0]
+    mass = rng.uniform(10, 1000, n)
+    return positions, 3 / 7 * mass ** (1 / 3)
+
+
+def check_fusion_equivalence(trials:int = 200, max_n:int = 300, seed:int = 0)->int:
+    """随机状态上比较网格粗筛与暴力遍历的融合候选（内容与顺序都必须一致），返回检查的候选对总数"""
+    rng = np.random.default_rng(seed)
+    checked = 0
+    for trial in range(trials):
+        n = int(rng.integers(0, max_n))
+        positions, radii = random_fusion_arrays(n, rng)
+        grid = fusion_candidates(positions, radii)
+        brute = fusion_candidates_brute(positions, radii)
+        for got, expected in zip(grid, brute):
+            if not np.array_equal(got, expected):
+                raise AssertionError(f"第 {trial} 组（N={n}）网格粗筛结果与暴力遍历不一致")
+        checked += len(brute[0])
+    print(f"{trials} 组随机状态一致，共 {checked} 个融合候选对")
+    return checked
+
+
+def bench_fusion(ns=(20, 100, 1000, 5000, 10000), brute_limit:int = 5000, repeat:int = 3)->List[Dict]:
+    """对比网格粗筛与暴力遍历的融合检测耗时"""
+    rng = np.random.default_rng(0)
+    results = []
+    for n in ns:
+        positions, radii = random_fusion_arrays(n, rng)
+        grid = time_call(lambda: fusion_candidates(positions, radii), repeat)
+        brute = time_call(lambda: fusion_candidates_brute(positions, radii), 1) if n <= brute_limit else None
+        results.append({'n': n, 'grid_s': grid, 'brute_s': brute})
+        print(f"N={n:>6}  网格 {grid * 1e3:9.3f} ms  " +
+              (f"暴力 {brute * 1e3:9.3f} ms" if brute is not None else "暴力 (跳过)"))
+    return results
+
+
+def bench_fusion_cluster(n:int = 2000, lim:float = 60, frames:int = 40, layer:int = 30, seed:int = 0)->List[Dict]:
+    """稠密坍缩场景下逐对融合与并查集按簇融合的对比：仍有融合发生的帧数、创建的特效数与圆环数、质量是否守恒、
+    每帧融合检测耗时；另核对每簇只有两个天体时两种模式逐位相同"""
+    from src.config import SIMULATION_PARAMS
+    from src.physics_engine import PhysicsEngine
+    results = []
+    for mode in ('pair', 'cluster'):
+        params = dict(SIMULATION_PARAMS, num_bodies=n, x_lim=lim, y_lim=lim, fusion_mode=mode)
+        physics = PhysicsEngine(params)
+        state = physics.initialize_physics_state(params, np.random.default_rng(seed))
+        mass = state.mass.sum()
+        detect = physics.detect_fusion_clusters if mode == 'cluster' else physics.detect_fusion
+        detect_time = time_call(lambda: detect(state))
+        fusion_frames = effects = 0
+        for _ in range(frames):
+            result = physics.step(state)
+            state = result['state']
+            if result['fusion_id']:
+                fusion_frames += 1
+                clusters = result.get('fusion_clusters')
+                effects += 2 * len(clusters) if clusters is not None else len(result['fusion_id']) + len(result['remove_id'])
+        row = {'mode': mode, 'fusion_frames': fusion_frames, 'effects': effects, 'circles': effects * layer,
+               'bodies_left': len(state), 'mass_error': abs(state.mass.sum() - mass) / mass,
+               'detect_ms': detect_time * 1e3}
+        results.append(row)
+        print(f"{mode:>8}  有融合的帧 {fusion_frames:3d}/{frames}  特效 {effects:5d} 个（满层圆环 {row['circles']:6d}）  "
+              f"剩余天体 {len(state):5d}  质量相对误差 {row['mass_error']:.2e}  首帧融合检测 {row['detect_ms']:7.2f} ms")
+    # 两两配对、互不相邻的重叠对：两种模式应逐位相同
+    rng = np.random.default_rng(seed)
+    pairs = 500
+    centers = np.repeat(np.stack(np.meshgrid(np.arange(25), np.arange(20)), -1).reshape(-1, 2) * 40.0, 2, axis=0)
+    pos = centers + rng.uniform(-1, 1, (2 * pairs, 2))
+    mass = rng.uniform(10, 1000, 2 * pairs)
+    vel = rng.uniform(-5, 5, (2 * pairs, 2))
+    from src.simulation_data import SimulationState
+    pair_state = SimulationState.from_arrays(np.arange(2 * pairs), mass, 3 / 7 * mass ** (1 / 3), pos, vel)
+    engine = PhysicsEngine(dict(SIMULATION_PARAMS))
+    expected, got = engine.detect_fusion(pair_state), engine.detect_fusion_clusters(pair_state)
+    identical = expected[:3] == got[:3] and all(np.array_equal(getattr(expected[3], name), getattr(got[3], name))
+                                                for name in SimulationState.ARRAY_FIELDS)
+    results.append({'pairs': len(expected[0]), 'identical': bool(identical)})
+    print(f"{len(expected[0])} 个互不相邻的重叠对：两种模式逐位一致 {identical}")
+    return results
+
+
+def check_precision(ns=(10, 100, 1000, 5000), float32_tol:float = 1e-4, compiled_tol:float = 1e-10,
+                    seed:int = 0)->List[Dict]:
+    """float32 引力内核相对 float64 参考的误差上界检查（NumPy 与已安装时的 Numba 内核都检查），
+    以及 Numba 内核的耗时、float64 下与 NumPy 的一致性、融合粗筛逐位相同；任一项超出界限时抛出 AssertionError
+    误差按天体计：|a - a_ref| / max(|a_ref|, 1e-3·rms|a_ref|)，避免合力几乎抵消的天体把相对误差放大"""
+    from src import compiled_kernel
+    results = []
+    for n in ns:
+        positions, masses = random_bodies_arrays(n, seed)
+        radii = 3 / 7 * masses ** (1 / 3)
+        reference = pairwise_acceleration(positions, masses, 2.0)
+        norm = np.linalg.norm(reference, axis=1)
+        scale = np.maximum(norm, 1e-3 * np.sqrt(np.mean(norm ** 2)))
+        kernels = {'numpy_float64': lambda: pairwise_acceleration(positions, masses, 2.0),
+                   'numpy_float32': lambda: pairwise_acceleration(positions, masses, 2.0, dtype=np.float32)}
+        if compiled_kernel.AVAILABLE:
+            kernels['numba_float64'] = lambda: compiled_kernel.compiled_acceleration(positions, masses, 2.0)
+            kernels['numba_float32'] = lambda: compiled_kernel.compiled_acceleration(positions, masses, 2.0,
+                                                                                      dtype=np.float32)
+        for name, kernel in kernels.items():
+            kernel() # Numba 首次调用时编译，不计入耗时
+            error = float(np.max(np.linalg.norm(kernel() - reference, axis=1) / scale))
+            row = {'n': n, 'kernel': name, 'time_ms': time_call(kernel) * 1e3, 'max_rel_err': error}
+            results.append(row)
+            print(f"N={n:>6}  {name:>14}  {row['time_ms']:9.3f} ms  最大相对误差 {error:.2e}")
+            if name.endswith('float32'):
+                assert error < float32_tol, f"{name} 在 N={n} 时误差 {error:.2e} 超过 {float32_tol:.0e}"
+            elif name.startswith('numba'):
+                assert error < compiled_tol, f"{name} 在 N={n} 时与 NumPy 相差 {error:.2e}"
+        if compiled_kernel.AVAILABLE:
+            compiled_kernel.compiled_fusion_candidates(positions, radii)
+            expected = fusion_candidates(positions, radii)
+            got = compiled_kernel.compiled_fusion_candidates(positions, radii)
+            assert all(np.array_equal(x, y) for x, y in zip(expected, got)), f"Numba 融合粗筛在 N={n} 时结果不同"
+            row = {'n': n, 'kernel': 'fusion', 'numpy_ms': time_call(lambda: fusion_candidates(positions, radii)) * 1e3,
+                   'numba_ms': time_call(lambda: compiled_kernel.compiled_fusion_candidates(positions, radii)) * 1e3}
+            results.append(row)
+            print(f"N={n:>6}  融合粗筛 NumPy {row['numpy_ms']:8.3f} ms  Numba {row['numba_ms']:8.3f} ms  结果逐位一致")
+    if not compiled_kernel.AVAILABLE:
+        print("未安装 numba，只检查了 NumPy 内核")
+    return results
+
+
+def bench_barnes_hut(ns=(100, 500, 1000, 2000, 5000, 10000, 20000), theta:float = 0.5, G:float = 2,
+                     direct_limit:int = 20000, repeat:int = 3)->List[Dict]:
+    """对比 Barnes–Hut 与直接求和的耗时与误差，找出 Barnes–Hut 开始更快的交叉点"""
+    results = []
+    crossover = None
+    for n in ns:
+        rng = np.random.default_rng(n)
+        # 一个重的中心天体加大量轻天体，接近实际运行时的分布
+        positions = rng.normal(0, 20, (n, 2))
+        masses = rng.uniform(10, 1000, n)
+        positions[0], masses[0] = 0, 3000
+        tree = time_call(lambda: barnes_hut_acceleration(positions, masses, G, theta), repeat)
+        direct = time_call(lambda: pairwise_acceleration(positions, masses, G), 1) if n <= direct_limit else None
+        row = {'n': n, 'barnes_hut_s': tree, 'direct_s': direct}
+        if direct is not None:
+            row.update(barnes_hut_error(positions, masses, G, theta))
+            if crossover is None and tree < direct:
+                crossover = n
+        results.append(row)
+        print(f"N={n:>6}  Barnes–Hut {tree * 1e3:9.3f} ms  " +
+              (f"直接求和 {direct * 1e3:9.3f} ms  平均相对误差 {row['mean_rel_err']:.2e}  最大 {row['max_rel_err']:.2e}"
+               if direct is not None else "直接求和 (跳过)"))
+    print(f"theta={theta} 时 Barnes–Hut 从 N={crossover} 开始快于直接求和" if crossover else "测试范围内未出现交叉点")
+    return results
+
+
+def random_state(n:int, seed:int = 0, lim:float = 50.0):
+    """生成可复现的随机 SimulationState（静止天体，质量在默认范围内）"""
+    from src.simulation_data import SimulationState
+    rng = np.random.default_rng(seed)
+    mass = rng.uniform(10, 1000, n)
+    return SimulationState.from_arrays(np.arange(n), mass, 3 / 7 * mass ** (1 / 3),
+                                       rng.uniform(-lim, lim, (n, 2)), np.zeros((n, 2)))
+
+
+def bench_renderer(ns=(100, 500, 1000), frames:int = 3)->List[Dict]:
+    """在 Agg 后端下对比 Circle 补丁渲染与集合渲染的每帧更新与绘制耗时"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from src.renderer import RENDERER_BACKENDS
+    results = []
+    for n in ns:
+        state = random_state(n)
+        for backend, renderer_class in RENDERER_BACKENDS.items():
+            renderer = renderer_class(0)
+            renderer.initialize_graphics(state)
+            renderer.fig.canvas.draw()
+            update = time_call(lambda: renderer.update_graphics(state.with_arrays(pos=state.pos + 1), []), frames)
+            draw = time_call(renderer.fig.canvas.draw, frames)
+            artists = len(renderer.ax.get_children())
+            plt.close(renderer.fig)
+            results.append({'n': n, 'backend': backend, 'update_s': update, 'draw_s': draw, 'artists': artists})
+            print(f"N={n:>6}  {backend:<10}  更新 {update * 1e3:9.3f} ms  绘制 {draw * 1e3:9.3f} ms  图元 {artists}")
+    return results
+
+
+def bench_lod(scenes=(('crowded', 1000, 50, 50), ('spread', 2000, 500, 50), ('zoomed_out', 2000, 500, 500)),
+              backends=('collection', 'patch'), frames:int = 3)->List[Dict]:
+    """细节层次开/关的圆环数、绘制耗时与画面差异（Agg 后端，静态随机天体）
+    场景为 (名称, 天体数, 分布范围, 视野半宽)：crowded 全部在视野内，spread 大部分在视野外，zoomed_out 视野放大到分布范围"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from src.renderer import RENDERER_BACKENDS
+    results = []
+    for name, n, lim, view in scenes:
+        state = random_state(n, lim=lim)
+        for backend in backends:
+            rings, draw, images = {}, {}, {}
+            for lod in (False, True):
+                renderer = RENDERER_BACKENDS[backend](0, blit=False)
+                renderer.lod = lod
+                renderer.ax.set_xlim(-view, view)
+                renderer.ax.set_ylim(-view, view)
+                renderer.initialize_graphics(state)
+                renderer.fig.canvas.draw()
+                draw[lod] = time_call(renderer.fig.canvas.draw, frames)
+                images[lod] = np.asarray(renderer.fig.canvas.buffer_rgba())[..., :3].astype(int)
+                if backend == 'patch':
+                    rings[lod] = sum(len(graphic['body_circles']) for graphic in renderer.graphics)
+                else:
+                    rings[lod] = sum(len(collection.get_offsets()) for collection in renderer.collections)
+                plt.close(renderer.fig)
+            diff = np.abs(images[True] - images[False]).max(axis=-1)
+            row = {'scene': name, 'n': n, 'backend': backend, 'rings_full': rings[False], 'rings_lod': rings[True],
+                   'draw_full_ms': draw[False] * 1e3, 'draw_lod_ms': draw[True] * 1e3,
+                   'changed_pixels': int((diff > 0).sum()), 'mean_abs_diff': float(diff.mean())}
+            results.append(row)
+            print(f"{name:<11} N={n:>5} {backend:<10} 圆环 {rings[False]:>6} → {rings[True]:>6} "
+                  f"({rings[False] / max(rings[True], 1):5.1f}x)  绘制 {row['draw_full_ms']:8.1f} → {row['draw_lod_ms']:8.1f} ms  "
+                  f"像素差异 {row['changed_pixels']} 个，平均 {row['mean_abs_diff']:.3f}/255")
+    return results
+
+
+def bench_trails(ns=(100, 1000, 5000), length:int = 60, frames:int = 100, draws:int = 3)->List[Dict]:
+    """环形缓冲 + 单个 LineCollection 的尾迹与“每个天体一个 Line2D、Python 列表不断追加”的朴素实现对比：
+    每帧更新耗时与整帧绘制耗时（Agg 后端，天体做匀速圆周运动）"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from src.trails import TrailRenderer
+    results = []
+    for n in ns:
+        base = random_state(n)
+        phase = np.linspace(0, 2 * np.pi, n, endpoint=False)
+
+        def state_at(frame):
+            angle = phase + 0.05 * frame
+            offset = 5 * np.stack([np.cos(angle), np.sin(angle)], axis=1)
+            return base.with_arrays(pos=base.pos + offset)
+
+        states = [state_at(frame) for frame in range(frames)]
+        row = {'n': n, 'length': length}
+        for name in ('ring_buffer', 'line2d'):
+            fig, ax = plt.subplots(figsize=(10, 10))
+            ax.set_xlim(-60, 60)
+            ax.set_ylim(-60, 60)
+            if name == 'ring_buffer':
+                trails = TrailRenderer(ax, length, lambda body: np.ones(3))
+                trails.reset(states[0])
+                start = time.perf_counter()
+                for state in states[1:]:
+                    trails.update(state)
+            else:
+                lines = [ax.plot([], [], color='white', alpha=0.6, linewidth=1.0)[0] for _ in range(n)]
+                history = [[] for _ in range(n)]
+                start = time.perf_counter()
+                for state in states[1:]:
+                    for line, points, position in zip(lines, history, state.pos):
+                        points.append(position)
+                        recent = np.array(points[-length:])
+                        line.set_data(recent[:, 0], recent[:, 1])
+            row[f'{name}_update_ms'] = (time.perf_counter() - start) / (frames - 1) * 1e3
+            row[f'{name}_draw_ms'] = time_call(fig.canvas.draw, draws) * 1e3
+            plt.close(fig)
+        results.append(row)
+        print(f"N={n:>5}  环形缓冲 更新 {row['ring_buffer_update_ms']:8.2f} ms 绘制 {row['ring_buffer_draw_ms']:8.1f} ms  |  "
+              f"每天体一个 Line2D 更新 {row['line2d_update_ms']:8.2f} ms 绘制 {row['line2d_draw_ms']:8.1f} ms")
+    return results
+
+
+def bench_blit(n:int = 200, frames:int = 20, seed:int = 0)->Dict:
+    """驱动 MainController 的 FuncAnimation 逐帧推进，对比 blit 与整帧重绘的帧率（Agg 后端，同一随机种子）"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from src.config import SIMULATION_PARAMS, RENDERER_PARAMS
+    from src.main_controller import MainController
+    saved = SIMULATION_PARAMS['num_bodies'], RENDERER_PARAMS['blit']
+    fps = {}
+    try:
+        SIMULATION_PARAMS['num_bodies'] = n
+        for blit in (False, True):
+            RENDERER_PARAMS['blit'] = blit
+            np.random.seed(seed)
+            controller = MainController(save_gif=False)
+            controller.renderer.fig.canvas.draw()  # 触发动画的首次绘制（blit 模式下缓存背景）
+            start = time.perf_counter()
+            for _ in range(frames):
+                controller.ani._step()
+            fps[blit] = frames / (time.perf_counter() - start)
+            controller.ani.pause()
+            plt.close(controller.renderer.fig)
+    finally:
+        SIMULATION_PARAMS['num_bodies'], RENDERER_PARAMS['blit'] = saved
+    print(f"N={n}  blit=False {fps[False]:.1f} FPS  blit=True {fps[True]:.1f} FPS  提升 {fps[True] / fps[False]:.2f}x")
+    return {'n': n, 'fps_full': fps[False], 'fps_blit': fps[True]}
+
+
+def bench_soak(frames:int = 100000, n:int = 50, fusions_per_frame:float = 0.2, sample_every:int = 5000,
+               backend:Optional[str] = None, seed:int = 0)->List[Dict]:
+    """长时间压力测试：每帧按概率产生融合（消失一个天体、补入一个新天体），驱动 Renderer 与 SpecialEffect
+    每隔 sample_every 帧整帧绘制一次并记录更新耗时、绘制耗时、画布补丁数与 Python 内存，观察是否保持平稳"""
+    import tracemalloc
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from src.renderer import RENDERER_BACKENDS
+    from src.special_effect import SpecialEffect
+    from src.simulation_data import SimulationState
+    from src.config import RENDERER_PARAMS
+    backend = backend or RENDERER_PARAMS['backend']
+    rng = np.random.default_rng(seed)
+    state = random_state(n, seed)
+    next_id = n
+    renderer = RENDERER_BACKENDS[backend](0, blit=False)
+    effect = SpecialEffect(renderer.ax, renderer)
+    renderer.initialize_graphics(state)
+    tracemalloc.start()
+    results = []
+    update_time = 0.0
+    for frame in range(1, frames + 1):
+        start = time.perf_counter()
+        moved = state.with_arrays(pos=state.pos + rng.normal(0, 0.2, state.pos.shape))
+        remove_id = []
+        if rng.random() < fusions_per_frame:
+            fusion_row, remove_row = rng.choice(len(moved), 2, replace=False)
+            fid, rid = int(moved.ids[fusion_row]), int(moved.ids[remove_row])
+            remove_id = [rid]
+            effect.create_fusion_effect([fid], state, moved)
+            effect.create_remove_effect(remove_id, moved, [[rid, fid]])
+            mass = rng.uniform(10, 1000, 1)
+            spawned = SimulationState.from_arrays([next_id], mass, 3 / 7 * mass ** (1 / 3),
+                                                  rng.uniform(-50, 50, (1, 2)), np.zeros((1, 2)))
+            next_id += 1
+            moved = moved.remove_bodies(remove_id)
+            moved = SimulationState.from_arrays(*(np.concatenate([getattr(moved, name), getattr(spawned, name)])
+                                                  for name in SimulationState.ARRAY_FIELDS), copy=False)
+        state = moved
+        renderer.update_graphics(state, remove_id)
+        effect.update_remove_effect()
+        effect.update_fusion_effect()
+        update_time += time.perf_counter() - start
+        if frame % sample_every == 0:
+            draw = time_call(renderer.fig.canvas.draw, 1)
+            memory = tracemalloc.get_traced_memory()[0]
+            row = {'frame': frame, 'update_ms': update_time / sample_every * 1e3, 'draw_ms': draw * 1e3,
+                   'patches': len(renderer.ax.patches), 'memory_mb': memory / 2 ** 20}
+            results.append(row)
+            update_time = 0.0
+            print(f"帧 {frame:>7}  更新 {row['update_ms']:7.3f} ms  绘制 {row['draw_ms']:8.2f} ms  "
+                  f"补丁 {row['patches']:>6}  内存 {row['memory_mb']:7.2f} MB")
+    tracemalloc.stop()
+    plt.close(renderer.fig)
+    return results
+
+
+def bench_integrators(integrators=('taylor', 'verlet', 'leapfrog', 'block'), dts=(0.05, 0.025, 0.0125),
+                      n:int = 20, total_time:float = 10, seed:int = 3)->List[Dict]:
+    """相同初始条件下比较各积分器：累计/单步最大能量漂移、单步最大动量漂移与耗时
+    漂移只统计积分本身（融合造成的能量损失不计入），用于在相同精度下选择更大的 dt"""
+    from src.config import SIMULATION_PARAMS
+    from src.physics_engine import PhysicsEngine
+    results = []
+    for integrator in integrators:
+        for dt in dts:
+            np.random.seed(seed)
+            params = dict(SIMULATION_PARAMS, num_bodies=n, dt=dt, integrator=integrator, diagnostics=True)
+            physics = PhysicsEngine(params)
+            state = physics.initialize_physics_state(params)
+            energy, momentum = [], []
+            start = time.perf_counter()
+            for _ in range(int(round(total_time / dt))):
+                result = physics.step(state)
+                state = result['state']
+                energy.append(abs(result['diagnostics']['energy_drift']))
+                momentum.append(result['diagnostics']['momentum_drift'])
+            elapsed = time.perf_counter() - start
+            row = {'integrator': integrator, 'dt': dt, 'energy_drift_sum': float(np.sum(energy)),
+                   'energy_drift_max': float(np.max(energy)), 'momentum_drift_max': float(np.max(momentum)),
+                   'seconds': elapsed}
+            results.append(row)
+            print(f"{integrator:>8}  dt={dt:<7}  能量漂移 累计 {row['energy_drift_sum']:.3e} "
+                  f"单步最大 {row['energy_drift_max']:.3e}  动量漂移 {row['momentum_drift_max']:.3e}  "
+                  f"耗时 {elapsed:.2f} s（含诊断）")
+    return results
+
+
+def bench_sweep(processes=None, runs:int = 32, n:int = 50, total_time:float = 5)->List[Dict]:
+    """参数扫描的并行扩展性：同一批任务分别用 1..CPU 核数个进程运行，报告吞吐量与相对 1 进程的加速比"""
+    import os
+    from src.sweep import sweep_tasks, run_sweep
+    from src.config import SIMULATION_PARAMS
+    cores = os.cpu_count() or 1
+    processes = processes or sorted({1, *(p for p in (2, 4, 8, 16, 32) if p <= cores), cores})
+    tasks = sweep_tasks(seeds=range(runs), base=dict(SIMULATION_PARAMS, num_bodies=n, total_time=total_time))
+    results = []
+    for count in processes:
+        start = time.perf_counter()
+        run_sweep(tasks, count, verbose=False)
+        elapsed = time.perf_counter() - start
+        row = {'processes': count, 'seconds': elapsed, 'runs_per_s': runs / elapsed,
+               'speedup': results[0]['seconds'] / elapsed if results else 1.0}
+        results.append(row)
+        print(f"进程 {count:>3}  {runs} 次运行用时 {elapsed:7.2f} s  吞吐 {row['runs_per_s']:6.2f} 次/秒  "
+              f"加速 {row['speedup']:5.2f}x（理想 {count}x）")
+    return results
+
+
+def bench_batched(bs=(1, 10, 100, 500), n:int = 20, frames:int = 200, seed:int = 0)->List[Dict]:
+    """批量多宇宙与逐个 PhysicsEngine 的吞吐量对比（宇宙·步/秒），并逐位核对每个宇宙的最终状态与融合事件"""
+    from src.config import SIMULATION_PARAMS
+    from src.physics_engine import PhysicsEngine
+    from src.batched_engine import BatchedPhysicsEngine
+    results = []
+    for b in bs:
+        params_list = [dict(SIMULATION_PARAMS, num_bodies=n) for _ in range(b)]
+        seeds = [seed + u for u in range(b)]
+        batched = BatchedPhysicsEngine(params_list)
+        batch = batched.initialize([np.random.default_rng(s) for s in seeds])
+        start = time.perf_counter()
+        batched_events = batched.run(batch, frames)
+        batched_time = time.perf_counter() - start
+
+        single_time, identical = 0.0, True
+        for u, (params, s) in enumerate(zip(params_list, seeds)):
+            physics = PhysicsEngine(params)
+            state = physics.initialize_physics_state(params, np.random.default_rng(s))
+            events = []
+            start = time.perf_counter()
+            for _ in range(frames):
+                result = physics.step(state)
+                state = result['state']
+                events.extend((state.frame, u, r, f) for r, f in result['fused_pair'])
+            single_time += time.perf_counter() - start
+            universe = batch.universe(u)
+            identical &= all(np.array_equal(getattr(universe, name), getattr(state, name))
+                             for name in ('ids', 'mass', 'radius', 'pos', 'vel'))
+            identical &= events == [event for event in batched_events if event[1] == u]
+        row = {'universes': b, 'n': n, 'frames': frames,
+               'single_steps_per_s': b * frames / single_time, 'batched_steps_per_s': b * frames / batched_time,
+               'speedup': single_time / batched_time, 'identical': bool(identical)}
+        results.append(row)
+        print(f"B={b:>5}  N={n}  逐个 {row['single_steps_per_s']:10.0f} 宇宙·步/秒  "
+              f"批量 {row['batched_steps_per_s']:10.0f} 宇宙·步/秒  加速 {row['speedup']:6.1f}x  "
+              f"结果一致 {row['identical']}")
+    return results
+
+
+def bench_profiler(n:int = 20, frames:int = 2000, seed:int = 0)->Dict:
+    """帧阶段计时的开销：同一组物理帧分别不计时、计时运行，比较每帧耗时"""
+    from src.config import SIMULATION_PARAMS
+    from src.physics_engine import PhysicsEngine
+    from src.profiler import FrameProfiler
+    params = dict(SIMULATION_PARAMS, num_bodies=n)
+    timings = {}
+    for name, profiler in (('off', None), ('on', FrameProfiler(frames))):
+        physics = PhysicsEngine(params)
+        state = physics.initialize_physics_state(params, np.random.default_rng(seed))
+        start = time.perf_counter()
+        for _ in range(frames):
+            if profiler is not None:
+                profiler.begin_frame(state.frame + 1)
+            state = physics.step(state, profiler)['state']
+        timings[name] = (time.perf_counter() - start) / frames
+    result = {'off_us': timings['off'] * 1e6, 'on_us': timings['on'] * 1e6,
+              'overhead_us': (timings['on'] - timings['off']) * 1e6}
+    print(f"每帧 不计时 {result['off_us']:.1f} us  计时 {result['on_us']:.1f} us  "
+          f"计时开销 {result['overhead_us']:.1f} us/帧")
+    return result
+
+
+def bench_pipeline(n:int = 3000, lim:float = 1500, frames:int = 10, depth:int = 8, seed:int = 0)->List[Dict]:
+    """串行与流水线（线程/进程）的离屏帧率对比：每帧取物理结果、创建与推进特效、更新图形并整帧绘制
+    串行时分别统计物理与渲染耗时，流水线的理想加速为 (物理+渲染)/max(物理, 渲染)，需要多核才能接近
+    同时核对流水线得到的最终状态与串行运行逐位相同"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from src.config import SIMULATION_PARAMS
+    from src.physics_engine import PhysicsEngine
+    from src.pipeline import PhysicsPipeline, compact_result
+    from src.renderer import create_renderer
+    from src.special_effect import SpecialEffect
+    from src.simulation_data import SimulationState
+    params = dict(SIMULATION_PARAMS, num_bodies=n, x_lim=lim, y_lim=lim)
+    results, reference = [], None
+    physics_time = 0.0
+    for mode in (None, 'thread', 'process'):
+        physics = PhysicsEngine(params)
+        state = physics.initialize_physics_state(params, np.random.default_rng(seed))
+        renderer = create_renderer(0, blit=False)
+        effect = SpecialEffect(renderer.ax, renderer)
+        renderer.initialize_graphics(state)
+        renderer.fig.canvas.draw()
+        pipeline = PhysicsPipeline(physics, state, mode, depth) if mode else None
+        start = time.perf_counter()
+        for _ in range(frames):
+            if pipeline:
+                result = pipeline.next_result(timeout=60)
+            else:
+                physics_start = time.perf_counter()
+                result = compact_result(physics.step(state))
+                physics_time += time.perf_counter() - physics_start
+            if result['fusion_id']:
+                effect.create_fusion_effect(result['fusion_id'], state, result['fused_state'])
+                effect.create_remove_effect(result['remove_id'], result['moved_state'], result['fused_pair'])
+            state = result['state']
+            renderer.update_graphics(state, result['remove_id'])
+            effect.update_remove_effect()
+            effect.update_fusion_effect()
+            renderer.fig.canvas.draw()
+        elapsed = time.perf_counter() - start
+        stalls = pipeline.stalls if pipeline else 0
+        if pipeline:
+            pipeline.close()
+        plt.close(renderer.fig)
+        if reference is None:
+            reference = state
+        identical = all(np.array_equal(getattr(state, name), getattr(reference, name))
+                        for name in SimulationState.ARRAY_FIELDS if name != 'acc')
+        row = {'mode': mode or 'serial', 'n': n, 'fps': frames / elapsed, 'stalls': stalls, 'identical': identical}
+        if mode is None:
+            render_time = elapsed - physics_time
+            row['ideal_speedup'] = elapsed / max(physics_time, render_time)
+            print(f"串行每帧：物理 {physics_time / frames * 1e3:.1f} ms，渲染 {render_time / frames * 1e3:.1f} ms，"
+                  f"流水线理想加速 {row['ideal_speedup']:.2f}x")
+        results.append(row)
+        print(f"{row['mode']:>8}  N={n}  {row['fps']:6.2f} 帧/秒  加速 {row['fps'] / results[0]['fps']:5.2f}x  "
+              f"结果一致 {identical}")
+    return results
+
+
+
+def bench_checkpoint(ns=(1000, 10000, 100000), repeat:int = 3, n:int = 200, frames:int = 100,
+                     seed:int = 0)->List[Dict]:
+    """存档写入/读取耗时与文件大小；并核对“跑 frames 帧 → 存档 → 新建运行器恢复 → 再跑 frames 帧”
+    与不中断地跑 2*frames 帧逐位相同（各积分器分别核对）"""
+    import os
+    import tempfile
+    from src.config import SIMULATION_PARAMS
+    from src.checkpoint import save_checkpoint, load_checkpoint
+    from src.headless_runner import HeadlessRunner
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'run.ckpt')
+        for size in ns:
+            state = random_state(size, seed)
+            save_time = time_call(lambda: save_checkpoint(path, state, size), repeat)
+            load_time = time_call(lambda: load_checkpoint(path), repeat)
+            row = {'n': size, 'save_ms': save_time * 1e3, 'load_ms': load_time * 1e3,
+                   'size_mb': os.path.getsize(path) / 2 ** 20}
+            results.append(row)
+            print(f"N={size:>7}  写入 {row['save_ms']:7.2f} ms  读取 {row['load_ms']:7.2f} ms  "
+                  f"文件 {row['size_mb']:6.2f} MB")
+        for integrator in ('taylor', 'verlet', 'leapfrog', 'block'):
+            params = dict(SIMULATION_PARAMS, num_bodies=n, x_lim=200, y_lim=200, integrator=integrator)
+            straight = HeadlessRunner(params, 1 << 62, rng=np.random.default_rng(seed))
+            straight.run(frames=2 * frames)
+            first = HeadlessRunner(params, 1 << 62, rng=np.random.default_rng(seed))
+            first.run(frames=frames)
+            first.save_checkpoint(path)
+            resumed = HeadlessRunner.resume(path, rng=np.random.default_rng(seed + 1))
+            resumed.run(frames=frames)
+            identical = all(np.array_equal(getattr(straight.state, name), getattr(resumed.state, name))
+                            for name in ('ids', 'mass', 'radius', 'pos', 'vel', 'acc'))
+            identical &= (straight.state.time == resumed.state.time and
+                          straight.fusion_events == resumed.fusion_events and
+                          straight.rng.bit_generator.state == resumed.rng.bit_generator.state)
+            results.append({'integrator': integrator, 'identical': bool(identical)})
+            print(f"{integrator:>8}  中断恢复后与不中断运行逐位一致 {identical}")
+    return results
+
+
+def initial_state_loop(params:Dict, random)->Dict[str, np.ndarray]:
+    """原逐个天体抽样的初始化（对照用）"""
+    bodies = {'mass': [], 'pos': [], 'vel': []}
+    for i in range(params['num_bodies']):
+        mass = random.uniform(params['min_mass'], params['max_mass'])
+        if params['center_mass'] and i == 0:
+            mass = params['center_mass_num']
+        position = [random.uniform(-params['x_lim'], params['x_lim']), random.uniform(-params['y_lim'], params['y_lim'])]
+        velocity = [random.uniform(-params['max_velocity'], params['max_velocity']),
+                    random.uniform(-params['max_velocity'], params['max_velocity'])]
+        if params['center_mass'] and i == 0:
+            position, velocity = [0.0, 0.0], [0.0, 0.0]
+        bodies['mass'].append(mass)
+        bodies['pos'].append(position)
+        bodies['vel'].append(velocity)
+    return {name: np.array(values, dtype=float) for name, values in bodies.items()}
+
+
+def bench_initial_conditions(ns=(1000, 100000, 1000000), loop_limit:int = 100000, seed:int = 0)->List[Dict]:
+    """各初始条件预设的生成耗时（与原逐个抽样对比），并核对 'uniform' 与原实现逐位相同
+    （全局 np.random 与 np.random.Generator 两种随机源各核对一次）"""
+    from src.config import SIMULATION_PARAMS
+    from src.initial_conditions import INITIAL_CONDITIONS, generate_state
+    results = []
+    for size in ns:
+        params = dict(SIMULATION_PARAMS, num_bodies=size)
+        row = {'n': size}
+        if size <= loop_limit:
+            row['loop_s'] = time_call(lambda: initial_state_loop(params, np.random.default_rng(seed)), 1)
+        for name in INITIAL_CONDITIONS:
+            variant = dict(params, initial_conditions=name)
+            row[f'{name}_s'] = time_call(lambda: generate_state(variant, np.random.default_rng(seed)))
+        results.append(row)
+        print(f"N={size:>8}  原逐个抽样 " + (f"{row['loop_s']:7.3f} s" if 'loop_s' in row else "      -  ") +
+              "".join(f"  {name} {row[f'{name}_s'] * 1e3:8.1f} ms" for name in INITIAL_CONDITIONS))
+    params = dict(SIMULATION_PARAMS, num_bodies=1000)
+    np.random.seed(seed)
+    expected_global = initial_state_loop(params, np.random)
+    np.random.seed(seed)
+    state_global = generate_state(params)
+    expected_rng = initial_state_loop(params, np.random.default_rng(seed))
+    state_rng = generate_state(params, np.random.default_rng(seed))
+    identical = all(np.array_equal(expected['mass'], state.mass) and np.array_equal(expected['pos'], state.pos) and
+                    np.array_equal(expected['vel'], state.vel)
+                    for expected, state in ((expected_global, state_global), (expected_rng, state_rng)))
+    results.append({'uniform_identical': bool(identical)})
+    print(f"uniform 与原逐个抽样逐位一致 {identical}")
+    return results
+
+
+BENCHMARKS = {
+    'gravity': bench_gravity,
+    'fusion': bench_fusion,
+    'fusion_check': check_fusion_equivalence,
+    'fusion_cluster': bench_fusion_cluster,
+    'barnes_hut': bench_barnes_hut,
+    'precision': check_precision,
+    'renderer': bench_renderer,
+    'blit': bench_blit,
+    'lod': bench_lod,
+    'trails': bench_trails,
+    'soak': bench_soak,
+    'integrators': bench_integrators,
+    'sweep': bench_sweep,
+    'batched': bench_batched,
+    'profiler': bench_profiler,
+    'pipeline': bench_pipeline,
+    'checkpoint': bench_checkpoint,
+    'initial_conditions': bench_initial_conditions,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"== {name} ==")
+        BENCHMARKS[name]()
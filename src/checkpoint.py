@@ -0,0 +1,75 @@
+# src/checkpoint.py 长时间运行的存档与恢复：完整状态、天体id计数器、随机数状态、进行中的特效
+# 一个存档 = 一个不压缩的 .npz（每列一个原始数组，10 万天体也能在几毫秒内读入），标量与参数放在 JSON 字符串里
+# 先写临时文件再 os.replace 原子替换，写到一半崩溃时旧存档仍然完好
+import os
+import json
+import numpy as np
+from typing import Dict, Optional
+from src.simulation_data import SimulationState
+
+CHECKPOINT_VERSION = 1
+
+
+def rng_state(rng:Optional[np.random.Generator] = None)->Dict:
+    """取出随机数发生器的状态，rng 为 None 时取全局 np.random 的状态"""
+    if rng is not None:
+        return {'kind': 'generator', 'state': rng.bit_generator.state}
+    name, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+    return {'kind': 'global', 'name': name, 'keys': keys.tolist(), 'pos': int(pos),
+            'has_gauss': int(has_gauss), 'cached_gaussian': float(cached_gaussian)}
+
+
+def restore_rng(saved:Optional[Dict], rng:Optional[np.random.Generator] = None)->None:
+    """把 rng_state() 的结果写回 rng（None 时写回全局 np.random）"""
+    if saved is None:
+        return
+    if saved['kind'] == 'generator':
+        if rng is not None:
+            rng.bit_generator.state = saved['state']
+    elif rng is None:
+        np.random.set_state((saved['name'], np.array(saved['keys'], dtype=np.uint32), saved['pos'],
+                             saved['has_gauss'], saved['cached_gaussian']))
+
+
+def save_checkpoint(path:str, state:SimulationState, next_id:int = 0, params:Optional[Dict] = None,
+                    rng:Optional[Dict] = None, effects:Optional[Dict[str, np.ndarray]] = None,
+                    extra:Optional[Dict[str, np.ndarray]] = None)->None:
+    """原子写入存档
+    next_id 为 PhysicsEngine.id；rng 为 rng_state() 的结果；effects 为 SpecialEffect.snapshot() 的结果；
+    extra 为调用方自己的数组（如融合事件），恢复时原样返回"""
+    meta = {
+        'version': CHECKPOINT_VERSION,
+        'time': state.time,
+        'frame': state.frame,
+        'acc_valid': state.acc_valid,
+        'next_id': int(next_id),
+        'params': {k: v for k, v in (params or {}).items() if isinstance(v, (int, float, str, bool, type(None)))},
+        'rng': rng,
+    }
+    arrays = {name: getattr(state, name) for name in SimulationState.ARRAY_FIELDS}
+    arrays.update({f'effect_{name}': array for name, array in (effects or {}).items()})
+    arrays.update({f'extra_{name}': np.asarray(array) for name, array in (extra or {}).items()})
+    arrays['meta'] = np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8)
+    temp_path = f'{path}.tmp'
+    # 写入文件对象，np.savez 不会自动追加 .npz 扩展名
+    with open(temp_path, 'wb') as f:
+        np.savez(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def load_checkpoint(path:str)->Dict:
+    """读取存档，返回 'state'/'next_id'/'params'/'rng'/'effects'/'extra'
+    恢复出的状态与保存时逐位相同（包括 acc 与 acc_valid，Verlet 等积分器的下一步不受影响）"""
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(data['meta'].tobytes().decode('utf-8'))
+        if meta['version'] != CHECKPOINT_VERSION:
+            raise ValueError(f"不支持的存档版本: {meta['version']}")
+        state = SimulationState.from_arrays(*(data[name] for name in SimulationState.ARRAY_FIELDS),
+                                            time=meta['time'], frame=meta['frame'], copy=False,
+                                            acc_valid=meta['acc_valid'])
+        effects = {name[len('effect_'):]: data[name] for name in data.files if name.startswith('effect_')}
+        extra = {name[len('extra_'):]: data[name] for name in data.files if name.startswith('extra_')}
+    return {'state': state, 'next_id': meta['next_id'], 'params': meta['params'], 'rng': meta['rng'],
+            'effects': effects, 'extra': extra}
@@ -0,0 +1,112 @@
+# src/compiled_kernel.py 可选的 Numba 编译内核：引力与融合粗筛逐天体循环、分块（tile）遍历，不产生任何 N×N 临时数组
+# 未安装 numba 时 AVAILABLE 为 False，PhysicsEngine 回退到 src/kernels.py 的 NumPy 内核
+# 坐标为 float32 时差值、距离与力按 float32 计算，每个天体受到的合力用 float64 累加
+import numpy as np
+from typing import Optional, Tuple
+from src.kernels import SOFTENING
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+AVAILABLE = numba is not None
+TILE_TARGETS = 64 # 每个并行任务负责的目标天体数
+TILE_SOURCES = 512 # 每次遍历的源天体块，坐标与质量留在 L1 缓存里给同一块目标反复使用
+
+if AVAILABLE:
+    @numba.njit(parallel=True, cache=True)
+    def _tiled_acceleration(positions, target_positions, masses, G, softening, tile_targets, tile_sources):
+        n = positions.shape[0]
+        m = target_positions.shape[0]
+        out = np.zeros((m, 2))
+        for tile in numba.prange((m + tile_targets - 1) // tile_targets):
+            lo = tile * tile_targets
+            hi = min(lo + tile_targets, m)
+            for j0 in range(0, n, tile_sources):
+                j1 = min(j0 + tile_sources, n)
+                for i in range(lo, hi):
+                    xi = target_positions[i, 0]
+                    yi = target_positions[i, 1]
+                    ax = 0.0
+                    ay = 0.0
+                    for j in range(j0, j1):
+                        dx = positions[j, 0] - xi
+                        dy = positions[j, 1] - yi
+                        distance = np.sqrt(dx * dx + dy * dy) + softening
+                        weight = G * masses[j] / (distance * distance * distance)
+                        ax += weight * dx
+                        ay += weight * dy
+                    out[i, 0] += ax
+                    out[i, 1] += ay
+        return out
+
+    @numba.njit(cache=True)
+    def _grid_pairs(positions, radii, cell_size):
+        # 网格与 kernels.fusion_candidates 相同，只是逐天体查相邻格子，找到的天体对直接追加到可增长的数组里
+        n = positions.shape[0]
+        cx = np.floor(positions[:, 0] / cell_size).astype(np.int64)
+        cy = np.floor(positions[:, 1] / cell_size).astype(np.int64)
+        cx -= cx.min()
+        cy -= cy.min()
+        width = cy.max() + 3
+        keys = (cx + 1) * width + (cy + 1)
+        order = np.argsort(keys, kind='mergesort')
+        sorted_keys = keys[order]
+        capacity = max(16, n)
+        row_a = np.empty(capacity, dtype=np.int64)
+        row_b = np.empty(capacity, dtype=np.int64)
+        distances = np.empty(capacity)
+        count = 0
+        for a in range(n):
+            for ox in range(-1, 2):
+                for oy in range(-1, 2):
+                    target = keys[a] + ox * width + oy
+                    lo = np.searchsorted(sorted_keys, target, side='left')
+                    hi = np.searchsorted(sorted_keys, target, side='right')
+                    for k in range(lo, hi):
+                        b = order[k]
+                        if b <= a:
+                            continue
+                        dx = positions[a, 0] - positions[b, 0]
+                        dy = positions[a, 1] - positions[b, 1]
+                        distance = np.sqrt(dx ** 2 + dy ** 2)
+                        if distance < (radii[a] + radii[b]) / 3:
+                            if count == capacity:
+                                capacity *= 2
+                                row_a = np.concatenate((row_a, np.empty(capacity - count, dtype=np.int64)))
+                                row_b = np.concatenate((row_b, np.empty(capacity - count, dtype=np.int64)))
+                                distances = np.concatenate((distances, np.empty(capacity - count)))
+                            row_a[count] = a
+                            row_b[count] = b
+                            distances[count] = distance
+                            count += 1
+        return row_a[:count], row_b[:count], distances[:count]
+
+
+def compiled_acceleration(positions:np.ndarray, masses:np.ndarray, G:float, targets:Optional[np.ndarray] = None,
+                          dtype=np.float64)->np.ndarray:
+    """与 kernels.pairwise_acceleration 相同的软化引力，返回 float64 的 (len(targets) 或 N, 2)
+    dtype=np.float32 时坐标先平移到质心附近再转成 float32，减小坐标绝对值带来的舍入误差"""
+    if dtype == np.float64:
+        source = np.ascontiguousarray(positions, dtype=np.float64)
+    else:
+        source = np.ascontiguousarray(positions - positions.mean(axis=0), dtype=dtype) if len(positions) else \
+            np.zeros((0, 2), dtype=dtype)
+    target = source if targets is None else np.ascontiguousarray(source[targets])
+    return _tiled_acceleration(source, target, np.ascontiguousarray(masses, dtype=dtype), dtype(G),
+                               dtype(SOFTENING), TILE_TARGETS, TILE_SOURCES)
+
+
+def compiled_fusion_candidates(positions:np.ndarray, radii:np.ndarray)->Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """与 kernels.fusion_candidates 结果逐位相同（同样的网格、同样的距离算式、同样的排序）"""
+    if len(positions) < 2:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0)
+    cell_size = 2 * radii.max() / 3
+    if not cell_size > 0:
+        cell_size = 1.0
+    row_a, row_b, distance = _grid_pairs(np.ascontiguousarray(positions, dtype=np.float64),
+                                         np.ascontiguousarray(radii, dtype=np.float64), float(cell_size))
+    order = np.lexsort((row_b, row_a, distance))
+    return row_a[order], row_b[order], distance[order]
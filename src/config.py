@@ -11,13 +11,33 @@ SIMULATION_PARAMS = {
     'min_mass':10,
     'max_mass':1000,
     'x_lim':50,
-    'y_lim':50 #创建天体分布范围
+    'y_lim':50, #创建天体分布范围
+    'initial_conditions': 'uniform', #初始分布：'uniform' 矩形内均匀（原实现），'plummer' Plummer 球，'disk' 指数盘，'orbits' 绕中心天体的近圆轨道
+    'ic_scale_radius': None, #Plummer 尺度半径/指数盘标长，None 取 min(x_lim, y_lim)/4
+    'ic_dispersion': 0.05, #disk/orbits 速度相对圆速度的随机扰动幅度
+    'precision': 'float64', #引力内核精度：'float64'，或 'float32'（坐标与力用 float32 计算、合力按 float64 累加，内存带宽减半）
+    'kernel_backend': 'numpy', #内核后端：'numpy'，或 'numba'（已安装时编译为分块循环，无 N×N 临时数组；未安装时回退到 numpy）
+    'chunk_size': None, #引力内核分块行数，None 为自动分块（限制 N×N 临时数组内存）
+    'gravity_solver': 'direct', #引力求解器：'direct' 直接求和 O(N²)，'barnes_hut' 四叉树近似 O(N log N)
+    'theta': 0.5, #Barnes–Hut 张角参数，越小越精确，0 时退化为精确求和
+    'integrator': 'taylor', #积分器：'taylor' 原一阶泰勒，'verlet' 速度Verlet，'leapfrog' 蛙跳，'block' 分级块步长
+    'timestep_eta': 0.1, #块步长精度参数，天体步长不超过 eta*sqrt(软化长度/|a|)
+    'max_block_level': 6, #块步长最多把 dt 细分为 2^level 个子步
+    'fusion_mode': 'pair', #融合：'pair' 按距离逐对贪心（原实现，成团的天体要多帧才并完），'cluster' 并查集一帧内合并整个重叠簇
+    'diagnostics': False, #每步计算总能量与动量漂移（额外 O(N²)），结果在 step() 返回的 'diagnostics' 中
 }
 
 
 RENDERER_PARAMS = {
-    'show_trails': True,
+    'backend': 'collection', #渲染后端：'collection' 每层一个 EllipseCollection；'patch' 每个圆环一个 Circle（原实现）
+    'blit': True, #blit 模式：缓存静态背景（星空、坐标轴），每帧只重绘天体与特效
+    'show_trails': True, #轨迹尾迹：所有天体最近 trail_length 帧的位置画在一个 LineCollection 里，越旧越透明
+    'trail_length': 60, #尾迹保留的帧数（环形缓冲长度）
+    'trail_linewidth': 1.0,
+    'trail_alpha': 0.6, #最新一段尾迹的不透明度
     'layer': 30,
+    'lod': True, #细节层次：按天体在屏幕上的大小减少渐变层数，整个光斑在视野外的天体不画
+    'lod_band_px': 2.0, #相邻两层露出的环带不宽于该像素数（越大层数越少、越粗糙）
     #质量由小到大共划分六个区间
     #深蓝-蓝-淡蓝-淡黄-黄-橙红
     'inner_color':[(1.0, 0.7, 0.3),(0.2, 0.4, 1.0),(0.4, 0.7, 0.9),
@@ -29,6 +49,22 @@ RENDERER_PARAMS = {
     'axe_y_lim':(-50, 50),#坐标轴范围
     'figure_size':(10,10),
     'transition_ani_time':0.25, #融合过渡动画持续时间，单位：s
+    'substeps': 1, #每个显示帧推进的物理帧数：1 为原实现（一帧一步）；整数 K 固定推进 K 步；
+                   #'auto' 按流逝的真实时间推进 floor(累计时间/dt) 步，余下不足一步的时间用于插值显示
+    'max_substeps': 8, #'auto' 时每个显示帧最多推进的物理帧数，物理跟不上时丢弃多出的时间（变慢而不是越积越多）
+    'frame_interval': None, #显示帧间隔（毫秒），None 沿用 int(dt*1000)
+    'artist_pool_size': 3000, #圆环池最多保留的空闲圆环数，超出的才从画布删除
+    'export_path': 'star.gif', #save_gif=True 时关闭窗口后导出的动画文件（.gif/.mp4）
+    'record_path': None, #save_gif=True 时轨迹记录目录，None 为临时目录
+    'export_processes': None, #并行导出的进程数，None 为 CPU 核数
+    'pipeline': None, #物理流水线：None 串行；'thread' 后台线程 / 'process' 后台进程提前计算后续帧
+    'pipeline_depth': 8, #流水线最多提前计算的帧数，队列满时物理端等待
+    'checkpoint_path': None, #运行中定期原子写入存档的路径，MainController(resume=路径) 从存档继续，None 不存档
+    'checkpoint_every': 200, #每隔多少帧写一次存档
+    'profile': False, #记录 update_frame 各阶段与绘制的耗时（关闭时几乎没有额外开销）
+    'profile_overlay': True, #开启 profile 时在画面左上角显示最近各阶段的平均耗时
+    'profile_capacity': 600, #环形缓冲保留的最近帧数
+    'profile_path': None, #关闭窗口后把计时数据导出到该路径（.csv 或 .json），None 不导出
 }
 GUI_CONFIG = {
     'window_size': '800x800',
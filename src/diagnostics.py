@@ -0,0 +1,29 @@
+# src/diagnostics.py 守恒量诊断：总能量（动能 + 与软化引力一致的势能）与总动量
+# 融合是完全非弹性碰撞，会损失能量，所以漂移只比较“积分前”与“积分后、融合前”两个状态
+import numpy as np
+from typing import Dict
+from src.simulation_data import SimulationState
+from src.kernels import potential_energy
+
+
+def conserved_quantities(state:SimulationState, G:float)->Dict:
+    """总动能、势能、能量与动量；势能为直接求和 O(N²)（与所选引力求解器无关）"""
+    kinetic = 0.5 * float(np.sum(state.mass * np.einsum('ij,ij->i', state.vel, state.vel)))
+    potential = potential_energy(state.pos, state.mass, G)
+    return {
+        'kinetic': kinetic,
+        'potential': potential,
+        'energy': kinetic + potential,
+        'momentum': state.mass @ state.vel,
+    }
+
+
+def step_drift(before:Dict, after:Dict, before_state:SimulationState)->Dict:
+    """一步积分的相对漂移：能量按 |E| 归一化，动量按 Σm|v| 归一化（总动量本身可能接近0）"""
+    momentum_scale = float(np.sum(before_state.mass * np.linalg.norm(before_state.vel, axis=1))) or 1.0
+    return {
+        'energy': after['energy'],
+        'momentum': after['momentum'],
+        'energy_drift': (after['energy'] - before['energy']) / (abs(before['energy']) or 1.0),
+        'momentum_drift': float(np.linalg.norm(after['momentum'] - before['momentum'])) / momentum_scale,
+    }
@@ -0,0 +1,118 @@
+# src/frame_export.py 离屏并行导出 GIF/MP4：多进程用 Agg 后端光栅化，主进程按顺序送入编码器
+# 每个任务负责一段连续帧，先无绘制地“预热”特效，使画面与实时窗口逐帧一致
+import os
+import shutil
+import subprocess
+import multiprocessing
+import numpy as np
+from typing import Iterator, List, Optional, Tuple
+from src.trajectory import TrajectoryReader, TrajectoryPlayer
+from src.config import RENDERER_PARAMS, SIMULATION_PARAMS
+
+CHUNK_FRAMES = 24 # 每个任务渲染的帧数，越大预热开销占比越小，但首帧出现越晚、占用内存越多
+
+
+def _init_worker()->None:
+    """工作进程只做离屏渲染，使用 Agg 后端"""
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def _render_chunk(task:Tuple[str, int, int])->List[np.ndarray]:
+    """在工作进程中渲染 [start, stop) 帧，返回 RGBA 图像列表"""
+    path, start, stop = task
+    import matplotlib.pyplot as plt
+    from src.renderer import create_renderer
+    from src.special_effect import SpecialEffect
+
+    reader = TrajectoryReader(path)
+    # 离屏整帧绘制，不使用 blit（animated 图元不会被 canvas.draw 画出）；画面与窗口中 blit 合成的结果相同
+    renderer = create_renderer(reader.meta.get('star_seed'), blit=False)
+    effect = SpecialEffect(renderer.ax, renderer)
+    player = TrajectoryPlayer(reader, renderer, effect)
+    # 在 start 之前 total_frame+1 帧内创建的特效仍会出现在画面里，从那里开始重放特效
+    warm_start = max(0, start - effect.total_frame - 2)
+    player.seek(warm_start)
+    frames = []
+    while player.k + 1 < stop and player.advance():
+        if player.k >= start:
+            renderer.fig.canvas.draw()
+            frames.append(np.asarray(renderer.fig.canvas.buffer_rgba()).copy())
+    plt.close(renderer.fig)
+    return frames
+
+
+def render_frames(path:str, processes:Optional[int] = None,
+                  chunk_frames:int = CHUNK_FRAMES)->Iterator[np.ndarray]:
+    """按顺序产出第 1..K-1 帧（与实时窗口每次 update_frame 后的画面对应）"""
+    count = len(TrajectoryReader(path))
+    tasks = [(path, start, min(start + chunk_frames, count)) for start in range(1, count, chunk_frames)]
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        for task in tasks:
+            yield from _render_chunk(task)
+        return
+    # spawn 保证子进程里 matplotlib 从零开始选择 Agg 后端，不继承 GUI 状态
+    with multiprocessing.get_context('spawn').Pool(processes, initializer=_init_worker) as pool:
+        for frames in pool.imap(_render_chunk, tasks):
+            yield from frames
+
+
+class FrameEncoder:
+    """把 RGBA 帧按顺序送入编码器：有 ffmpeg 时通过管道流式编码（MP4/GIF），否则用 Pillow 写 GIF"""
+
+    def __init__(self, output:str, fps:float):
+        self.output = output
+        self.fps = fps
+        self.process = None
+        self.images = []
+        self.ffmpeg = shutil.which('ffmpeg')
+        if not self.ffmpeg and not output.lower().endswith('.gif'):
+            raise RuntimeError("未找到 ffmpeg，只能导出 .gif")
+
+    def write(self, frame:np.ndarray)->None:
+        if self.ffmpeg:
+            if self.process is None:
+                height, width = frame.shape[:2]
+                command = [self.ffmpeg, '-y', '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgba',
+                           '-s', f'{width}x{height}', '-r', str(self.fps), '-i', '-']
+                if not self.output.lower().endswith('.gif'):
+                    command += ['-vcodec', 'libx264', '-pix_fmt', 'yuv420p']
+                self.process = subprocess.Popen(command + [self.output], stdin=subprocess.PIPE)
+            self.process.stdin.write(frame.tobytes())
+        else:
+            from PIL import Image
+            # GIF 需要一次写入，先转成调色板图像以减少内存
+            self.images.append(Image.fromarray(frame).convert('RGB').quantize())
+
+    def close(self)->None:
+        if self.process is not None:
+            self.process.stdin.close()
+            self.process.wait()
+        elif self.images:
+            self.images[0].save(self.output, save_all=True, append_images=self.images[1:],
+                                duration=int(1000 / self.fps), loop=0)
+            self.images = []
+
+
+def export_animation(path:str, output:str, fps:Optional[float] = None,
+                     processes:Optional[int] = None, verbose:bool = True)->int:
+    """把记录目录 path 中的轨迹导出为 output（.gif/.mp4），返回导出的帧数"""
+    reader = TrajectoryReader(path)
+    fps = fps or 1 / reader.meta['params'].get('dt', SIMULATION_PARAMS['dt'])
+    encoder = FrameEncoder(output, fps)
+    count = 0
+    for frame in render_frames(path, processes):
+        encoder.write(frame)
+        count += 1
+        if verbose and count % 50 == 0:
+            print(f"已导出 {count}/{len(reader) - 1} 帧")
+    encoder.close()
+    if verbose:
+        print(f"导出完成：{output}（{count} 帧）")
+    return count
+
+
+if __name__ == "__main__":
+    import sys
+    export_animation(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else RENDERER_PARAMS['export_path'])
@@ -0,0 +1,141 @@
+# src/headless_runner.py 无界面批量模拟，不创建图形也不导入 matplotlib，只推进物理
+import time
+import numpy as np
+from typing import List, Dict, Optional, Callable
+from src.physics_engine import PhysicsEngine
+from src.simulation_data import SimulationState
+from src.config import SIMULATION_PARAMS
+from src.trajectory import TrajectoryRecorder
+from src.profiler import FrameProfiler
+from src.checkpoint import save_checkpoint, load_checkpoint, rng_state, restore_rng
+
+
+class HeadlessRunner:
+    """以 CPU 允许的最快速度推进 total_time/dt 帧，按 snapshot_stride 间隔记录快照"""
+
+    def __init__(self, params:Optional[Dict] = None, snapshot_stride:int = 1,
+                 state:Optional[SimulationState] = None, physics:Optional[PhysicsEngine] = None,
+                 rng:Optional[np.random.Generator] = None, profiler=None,
+                 checkpoint_path:Optional[str] = None, checkpoint_every:int = 0):
+        self.params = dict(SIMULATION_PARAMS if params is None else params)
+        self.physics = PhysicsEngine(self.params) if physics is None else physics
+        self.rng = rng # 保存下来写入存档，None 表示使用全局 np.random
+        self.state = self.physics.initialize_physics_state(self.params, rng) if state is None else state
+        self.snapshot_stride = max(1, int(snapshot_stride))
+        self.snapshots = [] # 按间隔记录的状态（状态不可变，直接保存引用即可）
+        self.fusion_events = [] # 每次融合的 (帧号, 消失天体id, 吞并它的天体id)
+        self.diagnostics = [] # 开启 diagnostics 时每步的能量/动量漂移
+        self.profiler = profiler # FrameProfiler，记录每帧各物理阶段的耗时
+        self.checkpoint_path = checkpoint_path # 每隔 checkpoint_every 帧原子写入一次存档，0 为不写
+        self.checkpoint_every = int(checkpoint_every)
+
+    @classmethod
+    def resume(cls, path:str, params:Optional[Dict] = None, rng:Optional[np.random.Generator] = None,
+               **kwargs)->'HeadlessRunner':
+        """从存档恢复，之后的运行与不中断的运行逐位相同
+        params 为 None 时使用存档中的参数；融合事件一并恢复，快照只包含恢复之后记录的部分"""
+        checkpoint = load_checkpoint(path)
+        params = dict(SIMULATION_PARAMS, **checkpoint['params']) if params is None else params
+        runner = cls(params, state=checkpoint['state'], rng=rng, **kwargs)
+        runner.physics.id = checkpoint['next_id']
+        restore_rng(checkpoint['rng'], rng)
+        events = checkpoint['extra'].get('fusion_events')
+        if events is not None:
+            runner.fusion_events = [tuple(int(v) for v in event) for event in events]
+        return runner
+
+    def save_checkpoint(self, path:Optional[str] = None)->None:
+        """把当前状态、id 计数器、随机数状态与已发生的融合事件写入存档"""
+        save_checkpoint(path or self.checkpoint_path, self.state, self.physics.id, self.params,
+                        rng_state(self.rng),
+                        extra={'fusion_events': np.array(self.fusion_events, dtype=np.int64).reshape(-1, 3)})
+
+    def total_frames(self, total_time:Optional[float] = None)->int:
+        total_time = self.params['total_time'] if total_time is None else total_time
+        return int(round(total_time / self.params['dt']))
+
+    def run(self, total_time:Optional[float] = None,
+            on_step:Optional[Callable[[Dict], None]] = None, frames:Optional[int] = None)->List[SimulationState]:
+        """运行模拟并返回快照列表，on_step 可用于逐帧处理每一步的结果（如写入轨迹文件）
+        frames 给出时直接指定推进的帧数（从存档恢复后只跑剩余的帧）"""
+        frames = self.total_frames(total_time) if frames is None else frames
+        if self.state.frame % self.snapshot_stride == 0:
+            self.snapshots.append(self.state)
+        for _ in range(frames):
+            if self.profiler is not None:
+                self.profiler.begin_frame(self.state.frame + 1)
+            result = self.physics.step(self.state, self.profiler)
+            self.state = result['state']
+            for remove_body_id, fusion_body_id in result['fused_pair']:
+                self.fusion_events.append((self.state.frame, remove_body_id, fusion_body_id))
+            if 'diagnostics' in result:
+                self.diagnostics.append(result['diagnostics'])
+            if self.state.frame % self.snapshot_stride == 0:
+                self.snapshots.append(self.state)
+            if on_step is not None:
+                on_step(result)
+            if self.checkpoint_every and self.state.frame % self.checkpoint_every == 0:
+                self.save_checkpoint()
+        return self.snapshots
+
+
+def save_snapshots(path:str, snapshots:List[SimulationState], fusion_events:List = ())->None:
+    """把快照拼接保存为一个 .npz，offsets[k]:offsets[k+1] 为第 k 个快照的行范围"""
+    counts = [len(s) for s in snapshots]
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    np.savez_compressed(
+        path,
+        offsets=offsets,
+        frame=np.array([s.frame for s in snapshots], dtype=np.int64),
+        time=np.array([s.time for s in snapshots], dtype=float),
+        ids=np.concatenate([s.ids for s in snapshots]) if snapshots else np.zeros(0, np.int64),
+        mass=np.concatenate([s.mass for s in snapshots]) if snapshots else np.zeros(0),
+        radius=np.concatenate([s.radius for s in snapshots]) if snapshots else np.zeros(0),
+        pos=np.concatenate([s.pos for s in snapshots]) if snapshots else np.zeros((0, 2)),
+        vel=np.concatenate([s.vel for s in snapshots]) if snapshots else np.zeros((0, 2)),
+        fusion_events=np.array(fusion_events, dtype=np.int64).reshape(-1, 3),
+    )
+
+
+def run_headless(params:Optional[Dict] = None, total_time:Optional[float] = None,
+                 snapshot_stride:int = 1, output:Optional[str] = None, record:Optional[str] = None,
+                 verbose:bool = True, profile:Optional[str] = None, checkpoint:Optional[str] = None,
+                 checkpoint_every:int = 0, resume:Optional[str] = None)->HeadlessRunner:
+    """命令行与脚本共用的入口：运行、打印统计、可选保存快照，record 给出目录时逐帧记录完整轨迹
+    profile 给出 .csv/.json 路径时导出每帧各物理阶段的耗时
+    checkpoint 给出路径时每 checkpoint_every 帧及结束时写入存档；resume 给出存档时从中恢复，只跑到 total_time 为止"""
+    if resume:
+        runner = HeadlessRunner.resume(resume, params, snapshot_stride=snapshot_stride,
+                                       checkpoint_path=checkpoint, checkpoint_every=checkpoint_every)
+    else:
+        runner = HeadlessRunner(params, snapshot_stride, checkpoint_path=checkpoint,
+                                checkpoint_every=checkpoint_every)
+    frames = max(0, runner.total_frames(total_time) - runner.state.frame)
+    if profile:
+        runner.profiler = FrameProfiler(capacity=frames + 1)
+    recorder = None
+    if record:
+        recorder = TrajectoryRecorder(record, runner.params)
+        recorder.record_state(runner.state)
+    start = time.perf_counter()
+    runner.run(on_step=recorder.record_step if recorder else None, frames=frames)
+    elapsed = time.perf_counter() - start
+    if checkpoint:
+        runner.save_checkpoint()
+    if recorder:
+        recorder.close()
+    if runner.profiler is not None:
+        runner.profiler.flush()
+        runner.profiler.export(profile)
+    if output:
+        save_snapshots(output, runner.snapshots, runner.fusion_events)
+    if verbose:
+        print(f"模拟 {frames} 帧（{runner.state.time:.2f}s 模拟时间）用时 {elapsed:.3f}s，"
+              f"{frames / elapsed if elapsed > 0 else float('inf'):.1f} 帧/秒；"
+              f"剩余天体 {len(runner.state)}，融合 {len(runner.fusion_events)} 次，快照 {len(runner.snapshots)} 个")
+        if runner.diagnostics:
+            energy = np.abs([d['energy_drift'] for d in runner.diagnostics])
+            momentum = np.abs([d['momentum_drift'] for d in runner.diagnostics])
+            print(f"积分器 {runner.params.get('integrator', 'taylor')}：能量漂移 累计 {energy.sum():.3e} 单步最大 {energy.max():.3e}，"
+                  f"动量漂移 单步最大 {momentum.max():.3e}")
+    return runner
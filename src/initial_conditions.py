@@ -0,0 +1,139 @@
+# src/initial_conditions.py 向量化的初始条件生成：一次性抽出全部天体的质量、位置、速度，百万天体也在一秒内完成
+# 'uniform' 与原逐个天体抽样的质量、位置、速度逐位相同（同一随机数序列按同样的顺序使用；半径由向量化乘方算出，可能差 1 ulp），
+# 其余预设围绕中心天体给出近似平衡的分布
+import numpy as np
+from typing import Callable, Dict, Optional, Tuple
+from src.simulation_data import SimulationState
+from src.kernels import SOFTENING
+
+
+def _masses(params:Dict, n:int, u:np.ndarray)->np.ndarray:
+    """u 为 [0,1) 均匀随机数，换算到 [min_mass, max_mass)；开启 center_mass 时第 0 个天体为中心天体"""
+    mass = params['min_mass'] + (params['max_mass'] - params['min_mass']) * u
+    if params['center_mass'] and n:
+        mass[0] = params['center_mass_num']
+    return mass
+
+
+def _scale_radius(params:Dict)->float:
+    """Plummer 尺度半径 / 指数盘标长，未设置时取分布范围的 1/4"""
+    scale = params.get('ic_scale_radius')
+    return min(params['x_lim'], params['y_lim']) / 4 if scale is None else scale
+
+
+def _circular_speed(params:Dict, radius:np.ndarray, mass:np.ndarray)->np.ndarray:
+    """按半径排序累加内侧质量（含中心天体），按引力内核的软化形式 |a| = G·M·r/(r+SOFTENING)³ 给出圆轨道速度
+    平面分布不满足壳层定理，所以只是近似平衡"""
+    order = np.argsort(radius, kind='stable')
+    enclosed = np.empty_like(mass)
+    enclosed[order] = np.cumsum(mass[order]) - mass[order]
+    return radius * np.sqrt(params['G'] * enclosed / (radius + SOFTENING) ** 3)
+
+
+def _polar(params:Dict, radius:np.ndarray, angle:np.ndarray)->np.ndarray:
+    """极坐标 → 位置；中心天体的半径先置0，之后计算内侧质量时它对所有天体都在内侧"""
+    if params['center_mass'] and len(radius):
+        radius[0] = 0
+    return np.stack([radius * np.cos(angle), radius * np.sin(angle)], axis=1)
+
+
+def _rotate(pos:np.ndarray, speed:np.ndarray)->np.ndarray:
+    """沿逆时针切向、大小为 speed 的速度"""
+    radius = np.hypot(pos[:, 0], pos[:, 1])
+    direction = np.stack([-pos[:, 1], pos[:, 0]], axis=1) / np.maximum(radius, 1e-12)[:, np.newaxis]
+    return direction * speed[:, np.newaxis]
+
+
+def _center(params:Dict, pos:np.ndarray, vel:np.ndarray)->None:
+    """中心天体放在原点、静止"""
+    if params['center_mass'] and len(pos):
+        pos[0] = 0
+        vel[0] = 0
+
+
+def _remove_drift(mass:np.ndarray, vel:np.ndarray)->None:
+    """扣除质心速度，整个系统不整体漂移"""
+    if len(mass):
+        vel -= (mass[:, np.newaxis] * vel).sum(axis=0) / mass.sum()
+
+
+def uniform(params:Dict, random, n:int)->Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """原实现：位置在 ±x_lim/±y_lim 的矩形内均匀分布，速度各分量在 ±max_velocity 内均匀分布
+    每个天体依次用 5 个随机数（质量、x、y、vx、vy），中心天体的也照常抽取后覆盖"""
+    u = random.random((n, 5))
+    mass = _masses(params, n, u[:, 0])
+    pos = np.stack([-params['x_lim'] + 2 * params['x_lim'] * u[:, 1],
+                    -params['y_lim'] + 2 * params['y_lim'] * u[:, 2]], axis=1)
+    vel = -params['max_velocity'] + 2 * params['max_velocity'] * u[:, 3:5]
+    _center(params, pos, vel)
+    return mass, pos, vel
+
+
+def plummer(params:Dict, random, n:int)->Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Plummer 球投影到平面：面密度 ∝ (1+R²/a²)^-2，R = a·sqrt(u/(1-u))；
+    速度为各向同性高斯，一维弥散 σ² = G·M/(6·sqrt(R²+a²))（M 为总质量，含中心天体）"""
+    a = _scale_radius(params)
+    mass = _masses(params, n, random.random(n))
+    # 截掉最外 1% 的质量，避免极少数天体落在极远处
+    u = 0.99 * random.random(n)
+    radius = a * np.sqrt(u / (1 - u))
+    angle = 2 * np.pi * random.random(n)
+    pos = _polar(params, radius, angle)
+    sigma = np.sqrt(params['G'] * mass.sum() / (6 * np.sqrt(radius ** 2 + a ** 2)))
+    vel = random.normal(size=(n, 2)) * sigma[:, np.newaxis]
+    _center(params, pos, vel)
+    _remove_drift(mass, vel)
+    return mass, pos, vel
+
+
+def exponential_disk(params:Dict, random, n:int)->Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """指数盘：面密度 ∝ exp(-R/Rd)，R 服从形状参数为 2 的 Gamma 分布；
+    逆时针圆轨道速度，再叠加 ic_dispersion 倍圆速度的随机扰动"""
+    scale = _scale_radius(params)
+    mass = _masses(params, n, random.random(n))
+    radius = random.gamma(2.0, scale, n)
+    angle = 2 * np.pi * random.random(n)
+    pos = _polar(params, radius, angle)
+    speed = _circular_speed(params, radius, mass)
+    vel = _rotate(pos, speed) + random.normal(size=(n, 2)) * (params.get('ic_dispersion', 0.05) * speed)[:, np.newaxis]
+    _center(params, pos, vel)
+    _remove_drift(mass, vel)
+    return mass, pos, vel
+
+
+def circular_orbits(params:Dict, random, n:int)->Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """绕中心天体的近圆轨道：面积均匀地分布在中心天体半径的 3 倍到 min(x_lim, y_lim) 的圆环内，
+    切向速度为圆速度乘以 1 ± ic_dispersion 的随机因子（小偏心率）"""
+    mass = _masses(params, n, random.random(n))
+    inner = 3 * 3 / 7 * mass[0] ** (1 / 3) if params['center_mass'] and n else SOFTENING
+    outer = max(min(params['x_lim'], params['y_lim']), inner)
+    radius = np.sqrt(inner ** 2 + (outer ** 2 - inner ** 2) * random.random(n))
+    angle = 2 * np.pi * random.random(n)
+    pos = _polar(params, radius, angle)
+    speed = _circular_speed(params, radius, mass)
+    speed *= 1 + params.get('ic_dispersion', 0.05) * (2 * random.random(n) - 1)
+    vel = _rotate(pos, speed)
+    _center(params, pos, vel)
+    _remove_drift(mass, vel)
+    return mass, pos, vel
+
+
+INITIAL_CONDITIONS:Dict[str, Callable] = {
+    'uniform': uniform,
+    'plummer': plummer,
+    'disk': exponential_disk,
+    'orbits': circular_orbits,
+}
+
+
+def generate_state(params:Dict, rng:Optional[np.random.Generator] = None, first_id:int = 0)->SimulationState:
+    """按 params['initial_conditions'] 生成初始状态，天体 id 从 first_id 起连续编号
+    rng 为 None 时沿用全局 np.random（np.random.seed 仍然有效）"""
+    name = params.get('initial_conditions', 'uniform')
+    if name not in INITIAL_CONDITIONS:
+        raise ValueError(f"未知的初始条件: {name}，可选 {tuple(INITIAL_CONDITIONS)}")
+    n = params['num_bodies']
+    random = np.random if rng is None else rng
+    mass, pos, vel = INITIAL_CONDITIONS[name](params, random, n)
+    return SimulationState.from_arrays(np.arange(first_id, first_id + n), mass, 3 / 7 * mass ** (1 / 3),
+                                       pos, vel, copy=False)
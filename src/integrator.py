@@ -0,0 +1,79 @@
+# src/integrator.py 可插拔的时间积分器，统一签名 integrator(engine, state, dt) -> 新状态（时间与帧号不变）
+# 所有积分器都通过 engine.compute_accelerations 计算引力，直接求和与 Barnes–Hut 均可使用
+import numpy as np
+from typing import Callable, Dict
+from src.simulation_data import SimulationState
+from src.kernels import SOFTENING
+
+
+def taylor(engine, state:SimulationState, dt:float)->SimulationState:
+    """原实现：一阶泰勒展开，x += v*dt + a*dt²/2，v += a*dt，每步一次引力计算
+    保存的 acc 是更新前位置的加速度，所以新状态的 acc_valid 为 False"""
+    acceleration = engine.compute_accelerations(state.pos, state.mass)
+    new_velocity = state.vel + acceleration * dt
+    new_position = state.pos + state.vel * dt + 1/2 * acceleration * dt ** 2
+    return state.with_arrays(pos=new_position, vel=new_velocity, acc=acceleration, acc_valid=False)
+
+
+def velocity_verlet(engine, state:SimulationState, dt:float)->SimulationState:
+    """速度 Verlet（踢-漂-踢），二阶、辛，能量误差不随时间累积
+    起点加速度有效时直接复用（没有融合的帧每步只需一次引力计算）"""
+    acceleration = state.acc if state.acc_valid else engine.compute_accelerations(state.pos, state.mass)
+    half_velocity = state.vel + 1/2 * acceleration * dt
+    new_position = state.pos + half_velocity * dt
+    new_acceleration = engine.compute_accelerations(new_position, state.mass)
+    new_velocity = half_velocity + 1/2 * new_acceleration * dt
+    return state.with_arrays(pos=new_position, vel=new_velocity, acc=new_acceleration, acc_valid=True)
+
+
+def leapfrog(engine, state:SimulationState, dt:float)->SimulationState:
+    """蛙跳（漂-踢-漂），二阶、辛，每步固定一次引力计算，不依赖上一步的加速度
+    适合融合频繁、缓存的加速度经常失效的场景"""
+    half_position = state.pos + 1/2 * state.vel * dt
+    acceleration = engine.compute_accelerations(half_position, state.mass)
+    new_velocity = state.vel + acceleration * dt
+    new_position = half_position + 1/2 * new_velocity * dt
+    return state.with_arrays(pos=new_position, vel=new_velocity, acc=acceleration, acc_valid=False)
+
+
+def timestep_levels(acceleration:np.ndarray, dt:float, eta:float, max_level:int)->np.ndarray:
+    """为每个天体选择步长级别 k（步长 dt/2^k），使 dt/2^k <= eta*sqrt(SOFTENING/|a|)
+    加速度越大（越靠近大质量天体）级别越高，步长越小"""
+    magnitude = np.sqrt(acceleration[:, 0] ** 2 + acceleration[:, 1] ** 2)
+    with np.errstate(divide='ignore'):
+        wanted = eta * np.sqrt(SOFTENING / magnitude)
+        level = np.ceil(np.log2(dt / wanted))
+    return np.clip(np.nan_to_num(level, nan=0.0, neginf=0.0), 0, max_level).astype(np.int64)
+
+
+def block_timestep(engine, state:SimulationState, dt:float)->SimulationState:
+    """分级块步长（层级踢-漂-踢）：一帧 dt 内，每个天体按自身级别 k 以 dt/2^k 的步长推进
+    所有天体每个最细子步都漂移，只有到达自身步长边界的天体才重新计算加速度并踢速度，
+    因此近距离交会的少数天体走小步，其余天体几乎不增加计算量"""
+    eta = engine.params.get('timestep_eta', 0.1)
+    max_level = engine.params.get('max_block_level', 6)
+    acceleration = state.acc.copy() if state.acc_valid else engine.compute_accelerations(state.pos, state.mass)
+    level = timestep_levels(acceleration, dt, eta, max_level)
+    top = int(level.max()) if len(level) else 0
+    substeps = 1 << top
+    h = dt / substeps
+    span = 1 << (top - level) # 每个天体的一步包含多少个最细子步
+    step = (span * h)[:, np.newaxis]
+    position = state.pos.copy()
+    velocity = state.vel + 1/2 * acceleration * step
+    for s in range(1, substeps + 1):
+        position += velocity * h
+        active = np.nonzero(s % span == 0)[0]
+        acceleration[active] = engine.compute_accelerations(position, state.mass, active)
+        # 中间边界：上一步的后半踢 + 下一步的前半踢；最后一个子步所有天体同时结束，只做后半踢
+        kick = 1/2 if s == substeps else 1
+        velocity[active] += kick * acceleration[active] * step[active]
+    return state.with_arrays(pos=position, vel=velocity, acc=acceleration, acc_valid=True)
+
+
+INTEGRATORS: Dict[str, Callable] = {
+    'taylor': taylor,
+    'verlet': velocity_verlet,
+    'leapfrog': leapfrog,
+    'block': block_timestep,
+}
@@ -0,0 +1,152 @@
+# src/kernels.py 物理计算的向量化内核，只依赖 numpy，作用在连续的位置/质量/半径数组上
+import numpy as np
+from typing import Tuple, Optional
+
+SOFTENING = 2 # 距离软化项，防止除以0（与原双重循环中的 distance+2 一致）
+CHUNK_ELEMENTS = 1 << 22 # 分块计算时每块最多容纳的两两配对数，用于限制临时数组内存
+
+
+def pairwise_acceleration(positions:np.ndarray, masses:np.ndarray, G:float,
+                          chunk_size:Optional[int] = None, targets:Optional[np.ndarray] = None,
+                          dtype=np.float64)->np.ndarray:
+    """向量化两两引力内核：positions (N,2)，masses (N,)，返回加速度 (N,2)
+    chunk_size 为每块处理的行数，为 None 时按 CHUNK_ELEMENTS 自动分块，保证临时数组为 O(chunk*N)
+    targets 给出行号时只计算这些天体受到的（全部天体的）引力，返回 (len(targets),2)
+    dtype=np.float32 时分块临时数组用 float32（内存与带宽减半），每行的合力仍按 float64 累加"""
+    if dtype != np.float64:
+        return _pairwise_acceleration_mixed(positions, masses, G, chunk_size, targets, dtype)
+    n = len(positions)
+    target_positions = positions if targets is None else positions[targets]
+    m = len(target_positions)
+    accelerations = np.zeros((m, 2))
+    if n == 0 or m == 0:
+        return accelerations
+    if chunk_size is None:
+        chunk_size = max(1, CHUNK_ELEMENTS // n)
+    for start in range(0, m, chunk_size):
+        stop = min(start + chunk_size, m)
+        # dr[i, j] = p_j - p_i；自身一项 dr=0，贡献恰好为0，无需额外掩码
+        dr = positions[np.newaxis, :, :] - target_positions[start:stop, np.newaxis, :]
+        distance = np.sqrt(np.einsum('ijk,ijk->ij', dr, dr)) + SOFTENING
+        force_magnitude = G * masses[np.newaxis, :] / distance ** 2
+        accelerations[start:stop] = np.einsum('ij,ijk->ik', force_magnitude / distance, dr)
+    return accelerations
+
+
+def _pairwise_acceleration_mixed(positions:np.ndarray, masses:np.ndarray, G:float, chunk_size:Optional[int],
+                                 targets:Optional[np.ndarray], dtype)->np.ndarray:
+    """低精度版 pairwise_acceleration：坐标先平移到质心附近再转成 dtype，减小坐标绝对值带来的舍入误差；
+    差值、距离与力按 dtype 计算，求和时逐块转成 float64 累加（ufunc 归约的缓冲转换，不产生 float64 的整块副本）"""
+    n = len(positions)
+    m = n if targets is None else len(targets)
+    accelerations = np.zeros((m, 2))
+    if n == 0 or m == 0:
+        return accelerations
+    source = (positions - positions.mean(axis=0)).astype(dtype)
+    target_positions = source if targets is None else source[targets]
+    weights = (G * masses).astype(dtype)
+    if chunk_size is None:
+        chunk_size = max(1, CHUNK_ELEMENTS // n)
+    for start in range(0, m, chunk_size):
+        stop = min(start + chunk_size, m)
+        dr = source[np.newaxis, :, :] - target_positions[start:stop, np.newaxis, :]
+        distance = np.sqrt(np.einsum('ijk,ijk->ij', dr, dr)) + dtype(SOFTENING)
+        weight = weights[np.newaxis, :] / (distance * distance * distance)
+        for k in range(2):
+            accelerations[start:stop, k] = np.add.reduce(weight * dr[:, :, k], axis=1, dtype=np.float64)
+    return accelerations
+
+
+def potential_energy(positions:np.ndarray, masses:np.ndarray, G:float,
+                     chunk_size:Optional[int] = None)->float:
+    """与软化引力 a = G*m*dr/(d+s)^3 对应的总势能：每对 U = -G*mi*mj*(2d+s)/(2(d+s)^2)
+    （对 d 求导恰好得到上面的力），分块方式与 pairwise_acceleration 相同"""
+    n = len(positions)
+    if n < 2:
+        return 0.0
+    if chunk_size is None:
+        chunk_size = max(1, CHUNK_ELEMENTS // n)
+    total = 0.0
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        dr = positions[np.newaxis, :, :] - positions[start:stop, np.newaxis, :]
+        distance = np.sqrt(np.einsum('ijk,ijk->ij', dr, dr))
+        pair = (2 * distance + SOFTENING) / (2 * (distance + SOFTENING) ** 2)
+        # 每对只算一次：只取 j > i 的上三角
+        pair[np.arange(stop - start)[:, np.newaxis] + start >= np.arange(n)[np.newaxis, :]] = 0
+        total -= G * float(masses[start:stop] @ pair @ masses)
+    return total
+
+
+def fusion_candidates(positions:np.ndarray, radii:np.ndarray)->Tuple[np.ndarray,np.ndarray,np.ndarray]:
+    """均匀网格粗筛 + 精确判定，找出所有满足 distance < (r_a+r_b)/3 的天体对
+    返回按 (距离, 行号a, 行号b) 排序的行号数组 a<b 及其距离，与逐对暴力遍历后稳定排序的顺序完全一致"""
+    n = len(positions)
+    if n < 2:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0)
+    # 融合距离不可能超过 2*r_max/3，取它作为格子边长，则候选只可能在自身及相邻 8 个格子里
+    cell_size = 2 * radii.max() / 3
+    if not cell_size > 0:
+        cell_size = 1.0
+    cells = np.floor(positions / cell_size).astype(np.int64)
+    cells -= cells.min(axis=0)
+    # 行列编码成一个整数键，四周各留一格，相邻格子的键不会越界串行
+    width = cells[:, 1].max() + 3
+    keys = (cells[:, 0] + 1) * width + (cells[:, 1] + 1)
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    rows = np.arange(n)
+
+    row_a, row_b = [], []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            target = keys + dx * width + dy
+            lo = np.searchsorted(sorted_keys, target, 'left')
+            counts = np.searchsorted(sorted_keys, target, 'right') - lo
+            total = counts.sum()
+            if total == 0:
+                continue
+            # 把每个天体对应的 [lo, hi) 区间展开成逐对的行号
+            a = np.repeat(rows, counts)
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            b = order[np.repeat(lo, counts) + offsets]
+            keep = a < b  # 邻接关系对称，每对只保留一次
+            row_a.append(a[keep])
+            row_b.append(b[keep])
+    row_a = np.concatenate(row_a)
+    row_b = np.concatenate(row_b)
+
+    dr = positions[row_a] - positions[row_b]
+    distance = np.sqrt(dr[:, 0] ** 2 + dr[:, 1] ** 2)
+    hit = distance < (radii[row_a] + radii[row_b]) / 3
+    row_a, row_b, distance = row_a[hit], row_b[hit], distance[hit]
+    order = np.lexsort((row_b, row_a, distance))
+    return row_a[order], row_b[order], distance[order]
+
+
+def fusion_clusters(row_a:np.ndarray, row_b:np.ndarray, n:int)->np.ndarray:
+    """并查集：把 fusion_candidates 给出的重叠对看作边，返回每个天体所在连通簇的根（簇内最小行号），未参与融合的天体根为自身
+    只在参与融合的天体上建并查集，循环次数与重叠对数相同（与逐对贪心融合同一量级），与总天体数无关"""
+    nodes = np.unique(np.concatenate([row_a, row_b]))
+    parent = list(range(len(nodes)))
+    for a, b in zip(np.searchsorted(nodes, row_a).tolist(), np.searchsorted(nodes, row_b).tolist()):
+        # 路径减半地找到两端的根，再把较大的根挂到较小的根下（nodes 有序，所以根就是簇内最小行号）
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        while parent[b] != b:
+            parent[b] = parent[parent[b]]
+            b = parent[b]
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+    parent = np.array(parent, dtype=np.int64)
+    # 指针跳跃直到每个节点都直接指向根
+    while True:
+        compact = parent[parent]
+        if np.array_equal(compact, parent):
+            break
+        parent = compact
+    root = np.arange(n)
+    root[nodes] = nodes[parent]
+    return root
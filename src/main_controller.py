@@ -1,70 +1,279 @@
 # src/main_controller.py
+import tempfile
+import time
+import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 from src.physics_engine import PhysicsEngine
-from src.renderer import Renderer
+from src.renderer import create_renderer
 from src.special_effect import SpecialEffect
-from src.simulation_data import SimulationState
+from src.trajectory import TrajectoryRecorder
+from src.frame_export import export_animation
+from src.profiler import FrameProfiler
+from src.pipeline import PhysicsPipeline
+from src.checkpoint import save_checkpoint, load_checkpoint, rng_state, restore_rng
 from src.config import SIMULATION_PARAMS, RENDERER_PARAMS
 
 class MainController:
-    def __init__(self, save_gif=True):
+    def __init__(self, save_gif=True, resume=None):
+        # 从存档恢复时先换上存档中的参数，各模块按同样的参数创建
+        checkpoint = load_checkpoint(resume) if resume else None
+        if checkpoint is not None:
+            SIMULATION_PARAMS.update(checkpoint['params'])
+
         # 1.初始化各个模块
         self.physics = PhysicsEngine(SIMULATION_PARAMS)
-        self.renderer = Renderer()
+        # 导出动画时固定星空种子，离屏渲染才能画出与窗口完全一致的背景
+        star_seed = np.random.randint(2 ** 31 - 1) if save_gif else None
+        if checkpoint is not None and 'star_seed' in checkpoint['extra']:
+            star_seed = int(checkpoint['extra']['star_seed'][0])
+        self.star_seed = star_seed
+        self.renderer = create_renderer(star_seed)
         self.effect = SpecialEffect(self.renderer.ax,self.renderer)
 
-        # 2.创建初始状态
-        self.state = self.physics.initialize_physics_state(SIMULATION_PARAMS)
+        # 2.创建初始状态（或恢复存档中的状态、id 计数器与随机数状态）
+        if checkpoint is None:
+            self.state = self.physics.initialize_physics_state(SIMULATION_PARAMS)
+        else:
+            self.state = checkpoint['state']
+            self.physics.id = checkpoint['next_id']
+            restore_rng(checkpoint['rng'])
+
+        # 保存动画：运行时逐帧记录轨迹，关闭窗口后再离屏并行渲染导出
+        self.recorder = None
+        if save_gif:
+            record_path = RENDERER_PARAMS['record_path'] or tempfile.mkdtemp(prefix='star_record_')
+            self.recorder = TrajectoryRecorder(record_path, SIMULATION_PARAMS, star_seed)
+            self.recorder.record_state(self.state)
+            self.renderer.fig.canvas.mpl_connect('close_event', lambda event: self.export())
+
+        # 3.初始化渲染（恢复时连同进行中的特效一起重建）
+        color_mass = None
+        if checkpoint is not None and 'color_ids' in checkpoint['extra']:
+            color_mass = dict(zip(checkpoint['extra']['color_ids'].tolist(), checkpoint['extra']['color_mass'].tolist()))
+        self.renderer.initialize_graphics(self.state, color_mass)
+        if checkpoint is not None:
+            self.effect.restore(checkpoint['effects'])
+            trails = {name[len('trail_'):]: array for name, array in checkpoint['extra'].items()
+                      if name.startswith('trail_')}
+            if self.renderer.trails is not None and trails:
+                self.renderer.trails.restore(trails)
 
-        # 3.初始化渲染
-        self.renderer.initialize_graphics(self.state)
+        # 帧阶段计时（可选），关闭时 profiler 为 None
+        self.profiler = None
+        self.overlay = None
+        if RENDERER_PARAMS['profile']:
+            self.profiler = FrameProfiler(RENDERER_PARAMS['profile_capacity'])
+            if RENDERER_PARAMS['profile_overlay']:
+                self.overlay = self.renderer.ax.text(0.01, 0.99, '', transform=self.renderer.ax.transAxes,
+                                                     va='top', ha='left', family='monospace', fontsize=8,
+                                                     color='white', zorder=100, animated=self.renderer.blit)
+
+        # 流水线模式：后台提前计算物理帧，界面线程只负责取结果和绘制
+        self.pipeline = None
+        if RENDERER_PARAMS['pipeline']:
+            self.pipeline = PhysicsPipeline(self.physics, self.state, RENDERER_PARAMS['pipeline'],
+                                            RENDERER_PARAMS['pipeline_depth'])
+            self.renderer.fig.canvas.mpl_connect('close_event', lambda event: self.close_pipeline())
+
+        # 子步模式：物理帧率与显示帧率解耦，显示时在最后两个物理状态之间插值
+        self.substeps = RENDERER_PARAMS['substeps']
+        if self.substeps != 'auto' and (not isinstance(self.substeps, int) or self.substeps < 1):
+            raise ValueError(f"substeps 应为正整数或 'auto'，而不是 {self.substeps!r}")
+        self.previous_state = None # 上一个物理状态，插值的起点
+        self.alpha = 1.0 # 显示时刻在 previous_state 与 state 之间的位置
+        self.accumulator = 0.0 # 'auto' 时尚未推进的真实时间（秒）
+        self.last_tick = None
 
         # 4. 创建动画
         self.ani = FuncAnimation(
             self.renderer.fig,
-            self.update_frame,
-            interval=int(SIMULATION_PARAMS['dt'] * 1000),  # dt 是秒，转毫秒
-            blit=False,
+            self.update_frame if self.substeps == 1 else self.update_substeps,
+            interval=RENDERER_PARAMS['frame_interval'] or int(SIMULATION_PARAMS['dt'] * 1000),  # dt 是秒，转毫秒
+            blit=RENDERER_PARAMS['blit'],
             cache_frame_data=False
         )
+        if self.profiler is not None:
+            self.profiler.attach(self.ani)
 
     def update_frame(self, frame):
         old_state = self.state
+        profiler = self.profiler
 
-        # 1. 先进行正常的运动积分
-        after_acceleration_new_bodies = self.physics.compute_acceleration_and_update(old_state)
-
-        # 用运动后的状态作为基础进行碰撞检测
-        temp_state = SimulationState(after_acceleration_new_bodies, old_state.time, old_state.frame)
+        # 1. 推进物理：积分、检测融合、删除被融合天体（流水线模式下直接取后台算好的结果）
+        if self.pipeline is not None:
+            result = self.pipeline.next_result()
+            if result is None:
+                # 物理还没算好：保持上一帧画面，特效也不前进，保证与物理帧同步
+                return self.renderer.animated_artists() + self.effect.active_artists() + \
+                    ([self.overlay] if self.overlay is not None else [])
+            if profiler is not None:
+                profiler.begin_frame(result['state'].frame)
+                profiler.count(queued=self.pipeline.queued(), stalls=self.pipeline.stalls)
+        else:
+            if profiler is not None:
+                profiler.begin_frame(old_state.frame + 1)
+            result = self.physics.step(old_state, profiler)
+        # 2-3. 为融合创建特效，真实状态更新
+        remove_id = result['remove_id']
+        self._apply_result(result, old_state)
 
-        # 2. 检测融合
-        fusion_id, remove_id, fused_pair, after_fusion_new_bodies = self.physics.detect_fusion(temp_state)
-        # 3. 如果有融合，创建特效
-        if fusion_id:
-            # 需要传入正确的旧状态和新状态给特效
-            new_state_for_effect = SimulationState(after_fusion_new_bodies, old_state.time, old_state.frame)
-            self.effect.create_fusion_effect(fusion_id, old_state, new_state_for_effect)
-            self.effect.create_remove_effect(remove_id, temp_state,fused_pair)
-
-        # 4. 删除被融合天体
-        after_del_new_bodies = self.physics.update_del_bodies(remove_id, after_fusion_new_bodies)
-        # 5. 真实状态再次更新（删除天体)
-        self.state = SimulationState(
-            bodies=after_del_new_bodies,
-            time=old_state.time + SIMULATION_PARAMS['dt'],
-            frame=old_state.frame + 1
-        )
-
-        # 6. 渲染更新
+        # 4. 渲染更新
         updated_graphics = self.renderer.update_graphics(self.state,remove_id)
+        if profiler is not None:
+            profiler.mark('update_graphics')
         self.effect.update_remove_effect()
         self.effect.update_fusion_effect()
 
-        return self.renderer.ax.patches
+        # blit 模式下只返回本帧需要重绘的图元，其余部分来自缓存的背景
+        artists = self.renderer.animated_artists() + self.effect.active_artists()
+        if profiler is not None:
+            profiler.mark('effects_update')
+            ax = self.renderer.ax
+            profiler.count(bodies=len(self.state), artists=len(ax.patches) + len(ax.collections),
+                           effects=len(self.effect.fusion_effect) + len(self.effect.remove_effect))
+            if self.overlay is not None:
+                self.overlay.set_text(profiler.overlay_text())
+                artists.append(self.overlay)
+            profiler.mark('profiler') # 计数与叠加文字本身的开销，单独记录，不计入其他阶段
+
+        # 5. 定期存档（在特效更新之后，恢复后画面与存档时一致）
+        if RENDERER_PARAMS['checkpoint_path'] and self.state.frame % RENDERER_PARAMS['checkpoint_every'] == 0:
+            self.save_checkpoint()
+            if profiler is not None:
+                profiler.mark('checkpoint')
+        return artists
+
+    def _apply_result(self, result, old_state):
+        """接收一个物理帧的结果：为本帧的融合创建特效，换上新状态并写入轨迹记录"""
+        profiler = self.profiler
+        fusion_id, remove_id = result['fusion_id'], result['remove_id']
+        # 如果有融合，创建特效
+        if fusion_id and 'fusion_clusters' in result:
+            # 按簇融合：每个融合簇一个融合特效 + 一个消失特效
+            self.effect.create_cluster_effect(result['fusion_clusters'], old_state, result['moved_state'],
+                                              result['fused_state'])
+        elif fusion_id:
+            # 需要传入正确的旧状态和新状态给特效
+            self.effect.create_fusion_effect(fusion_id, old_state, result['fused_state'])
+            self.effect.create_remove_effect(remove_id, result['moved_state'], result['fused_pair'])
+        if profiler is not None:
+            profiler.mark('effects_create')
+
+        # 真实状态更新
+        self.state = result['state']
+        if self.recorder is not None:
+            self.recorder.record_step(result)
+            if profiler is not None:
+                profiler.mark('record')
+
+    def _substep_count(self):
+        """本显示帧要推进的物理帧数：固定 K，或 'auto' 时按上一显示帧以来流逝的真实时间"""
+        if self.substeps != 'auto':
+            return self.substeps
+        now = time.perf_counter()
+        dt = SIMULATION_PARAMS['dt']
+        self.accumulator += dt if self.last_tick is None else now - self.last_tick
+        self.last_tick = now
+        return min(int(self.accumulator / dt), RENDERER_PARAMS['max_substeps'])
+
+    def update_substeps(self, frame):
+        """子步模式的一个显示帧：推进若干物理帧（特效按物理帧推进），
+        然后天体与特效按 alpha 在最后两个物理状态之间插值，只绘制一次"""
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.begin_frame(self.state.frame + 1)
+        steps = self._substep_count()
+        removed = []
+        done = 0
+        for _ in range(steps):
+            old_state = self.state
+            if self.pipeline is not None:
+                result = self.pipeline.next_result()
+                if result is None:
+                    break # 物理还没算好，剩下的时间留到之后的显示帧
+            else:
+                result = self.physics.step(old_state, profiler)
+            self._apply_result(result, old_state)
+            self.previous_state = old_state
+            removed.extend(result['remove_id'])
+            self.effect.advance()
+            done += 1
+
+        dt = SIMULATION_PARAMS['dt']
+        if self.substeps == 'auto':
+            # 物理跟不上（达到 max_substeps 或流水线未就绪）时丢弃多出的时间，插值系数不超过 1
+            self.accumulator = min(self.accumulator - done * dt, dt)
+            self.alpha = self.accumulator / dt
+        display_state = self.state.interpolate(self.previous_state, self.alpha)
+        if profiler is not None:
+            profiler.mark('interpolate')
+
+        # 渲染更新：本显示帧内被融合的天体一起移除
+        self.renderer.update_graphics(display_state, removed)
+        if profiler is not None:
+            profiler.mark('update_graphics')
+        self.effect.render(self.alpha, display_state)
+
+        artists = self.renderer.animated_artists() + self.effect.active_artists()
+        if profiler is not None:
+            profiler.mark('effects_update')
+            ax = self.renderer.ax
+            profiler.count(bodies=len(self.state), artists=len(ax.patches) + len(ax.collections),
+                           effects=len(self.effect.fusion_effect) + len(self.effect.remove_effect), substeps=done)
+            if self.pipeline is not None:
+                profiler.count(queued=self.pipeline.queued(), stalls=self.pipeline.stalls)
+            if self.overlay is not None:
+                self.overlay.set_text(profiler.overlay_text())
+                artists.append(self.overlay)
+            profiler.mark('profiler')
+
+        # 定期存档：本显示帧推进的物理帧越过 checkpoint_every 的整数倍时写一次
+        every = RENDERER_PARAMS['checkpoint_every']
+        if RENDERER_PARAMS['checkpoint_path'] and self.state.frame // every > (self.state.frame - done) // every:
+            self.save_checkpoint()
+            if profiler is not None:
+                profiler.mark('checkpoint')
+        return artists
+
+    def save_checkpoint(self, path=None):
+        """把当前显示的状态、id 计数器、随机数状态、进行中的特效、天体着色与尾迹原子写入存档"""
+        color_mass = self.renderer.color_masses()
+        extra = {'color_ids': np.array(list(color_mass), dtype=np.int64),
+                 'color_mass': np.array(list(color_mass.values()), dtype=float)}
+        # 有固定星空种子时一并保存，恢复后背景也相同
+        if self.star_seed is not None:
+            extra['star_seed'] = np.array([self.star_seed])
+        if self.renderer.trails is not None:
+            extra.update({f'trail_{name}': array for name, array in self.renderer.trails.snapshot().items()})
+        save_checkpoint(path or RENDERER_PARAMS['checkpoint_path'], self.state, self.physics.id,
+                        SIMULATION_PARAMS, rng_state(), self.effect.snapshot(), extra=extra)
+
+    def export(self):
+        """结束记录并导出动画，只执行一次"""
+        if self.recorder is None:
+            return
+        self.ani.pause()
+        self.recorder.close()
+        export_animation(self.recorder.path, RENDERER_PARAMS['export_path'],
+                         processes=RENDERER_PARAMS['export_processes'])
+        self.recorder = None
+
+    def export_profile(self):
+        """把计时数据导出到 RENDERER_PARAMS['profile_path']"""
+        if self.profiler is not None and RENDERER_PARAMS['profile_path']:
+            self.profiler.export(RENDERER_PARAMS['profile_path'])
 
+    def close_pipeline(self):
+        """停止后台物理计算"""
+        if self.pipeline is not None:
+            self.pipeline.close()
+            self.pipeline = None
 
     def run(self):
         plt.show()
+        self.close_pipeline()
+        self.export_profile()
+        self.export()
 
 
@@ -0,0 +1,297 @@
+# src/perf_suite.py 性能回归套件：用固定种子的状态在 N = 10…100k 下逐项计时物理、融合、状态操作、渲染与特效，
+# 记录每步耗时、单步分配的峰值/残留内存（tracemalloc），结果按 git 提交写入 JSON，compare 对比两次提交并标出变慢的项
+# 用法：python -m src.perf_suite run [--sizes 10 100 1000] [--cases integrate detect_fusion] [--output perf_results.json]
+#       python -m src.perf_suite compare [基准提交] [对比提交] --threshold 0.1
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+import tracemalloc
+import numpy as np
+from typing import Callable, Dict, List, Optional
+
+SIZES = (10, 100, 1000, 10000, 100000)
+DEFAULT_OUTPUT = 'perf_results.json'
+
+
+def _seeded_state(n:int, seed:int = 0):
+    """与天体密度无关的可复现状态：分布范围随 N 增大，平均间距保持不变"""
+    from src.config import SIMULATION_PARAMS
+    from src.initial_conditions import generate_state
+    lim = 50 * max(1.0, np.sqrt(n / 20))
+    params = dict(SIMULATION_PARAMS, num_bodies=n, x_lim=lim, y_lim=lim)
+    return params, generate_state(params, np.random.default_rng(seed))
+
+
+def _physics(params:Dict, **changes):
+    from src.physics_engine import PhysicsEngine
+    return PhysicsEngine(dict(params, **changes))
+
+
+def case_integrate(n:int)->Callable:
+    """PhysicsEngine.compute_acceleration_and_update（直接求和，O(N²)）"""
+    params, state = _seeded_state(n)
+    physics = _physics(params)
+    return lambda: physics.compute_acceleration_and_update(state)
+
+
+def case_integrate_float32(n:int)->Callable:
+    """PhysicsEngine.compute_acceleration_and_update（直接求和，float32 内核）"""
+    params, state = _seeded_state(n)
+    physics = _physics(params, precision='float32')
+    return lambda: physics.compute_acceleration_and_update(state)
+
+
+def case_integrate_barnes_hut(n:int)->Callable:
+    """PhysicsEngine.compute_acceleration_and_update（Barnes–Hut）"""
+    params, state = _seeded_state(n)
+    physics = _physics(params, gravity_solver='barnes_hut')
+    return lambda: physics.compute_acceleration_and_update(state)
+
+
+def case_detect_fusion(n:int)->Callable:
+    """PhysicsEngine.detect_fusion（逐对）"""
+    params, state = _seeded_state(n)
+    physics = _physics(params)
+    return lambda: physics.detect_fusion(state)
+
+
+def case_detect_fusion_cluster(n:int)->Callable:
+    """PhysicsEngine.detect_fusion_clusters（并查集按簇）"""
+    params, state = _seeded_state(n)
+    physics = _physics(params)
+    return lambda: physics.detect_fusion_clusters(state)
+
+
+def case_replace_body(n:int)->Callable:
+    """SimulationState.replace_body（替换一个天体）"""
+    _, state = _seeded_state(n)
+    body = dict(state.get_body(int(state.ids[n // 2])), mass=1.0)
+    return lambda: state.replace_body(body)
+
+
+def case_remove_bodies(n:int)->Callable:
+    """SimulationState.remove_bodies（删除 1% 的天体，至少一个）"""
+    _, state = _seeded_state(n)
+    removed = state.ids[::100].tolist()
+    return lambda: state.remove_bodies(removed)
+
+
+def _renderer(backend:str, state):
+    import matplotlib
+    matplotlib.use('Agg')
+    from src.config import RENDERER_PARAMS
+    from src.renderer import create_renderer
+    saved = RENDERER_PARAMS['backend']
+    RENDERER_PARAMS['backend'] = backend
+    try:
+        renderer = create_renderer(star_seed=0, blit=False)
+    finally:
+        RENDERER_PARAMS['backend'] = saved
+    # 让坐标轴覆盖全部天体，每个天体都参与更新
+    lim = float(np.abs(state.pos).max()) + 10
+    renderer.ax.set_xlim(-lim, lim)
+    renderer.ax.set_ylim(-lim, lim)
+    renderer.initialize_graphics(state)
+    return renderer
+
+
+def _update_graphics_case(backend:str, n:int)->Callable:
+    params, state = _seeded_state(n)
+    # 两个交替的状态，每次调用天体都真的移动了
+    states = [state, state.with_arrays(pos=state.pos + 0.5)]
+    renderer = _renderer(backend, state)
+    calls = [0]
+
+    def step():
+        calls[0] += 1
+        renderer.update_graphics(states[calls[0] % 2], [])
+    return step
+
+
+def case_update_graphics_collection(n:int)->Callable:
+    """CollectionRenderer.update_graphics（不含绘制）"""
+    return _update_graphics_case('collection', n)
+
+
+def case_update_graphics_patch(n:int)->Callable:
+    """Renderer.update_graphics（逐圆环 patch，不含绘制）"""
+    return _update_graphics_case('patch', n)
+
+
+def case_effects(n:int)->Callable:
+    """SpecialEffect.update_remove_effect + update_fusion_effect，n 个天体同时播放融合与消失特效"""
+    params, state = _seeded_state(n)
+    renderer = _renderer('collection', state)
+    from src.special_effect import SpecialEffect
+    effect = SpecialEffect(renderer.ax, renderer)
+    ids = state.ids.tolist()
+    effect.create_fusion_effect(ids, state, state.with_arrays(radius=state.radius * 1.2))
+    effect.create_remove_effect(ids, state, [[body_id, ids[0]] for body_id in ids])
+
+    def step():
+        # 保持特效始终在播放中，每次测到的都是同样数量的特效
+        for eff in effect.fusion_effect + effect.remove_effect:
+            eff['frame'] = 1
+        effect.update_remove_effect()
+        effect.update_fusion_effect()
+    return step
+
+
+# 名称 → (构造函数, 默认的 N)：O(N²) 与逐图元的项只跑到还能在几秒内完成的规模
+CASES:Dict[str, tuple] = {
+    'integrate': (case_integrate, (10, 100, 1000, 10000)),
+    'integrate_float32': (case_integrate_float32, (10, 100, 1000, 10000)),
+    'integrate_barnes_hut': (case_integrate_barnes_hut, SIZES),
+    'detect_fusion': (case_detect_fusion, SIZES),
+    'detect_fusion_cluster': (case_detect_fusion_cluster, SIZES),
+    'replace_body': (case_replace_body, SIZES),
+    'remove_bodies': (case_remove_bodies, SIZES),
+    'update_graphics_collection': (case_update_graphics_collection, (10, 100, 1000, 10000)),
+    'update_graphics_patch': (case_update_graphics_patch, (10, 100, 1000)),
+    'effects': (case_effects, (10, 100, 1000)),
+}
+
+
+def measure(step:Callable, repeat:int = 5, min_time:float = 0.2)->Dict:
+    """先预热一次；再至少运行 repeat 次、且累计不少于 min_time 秒（单次超过 1 秒时只跑一次），取最短与中位耗时；
+    最后单独在 tracemalloc 下运行一次，记录这一步分配的峰值内存与调用结束后仍未释放的内存（含返回值）"""
+    step()
+    times = []
+    while len(times) < repeat or sum(times) < min_time:
+        start = time.perf_counter()
+        step()
+        times.append(time.perf_counter() - start)
+        if times[-1] > 1.0 or len(times) >= 1000:
+            break
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    result = step()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {'min_ms': min(times) * 1e3, 'median_ms': float(np.median(times)) * 1e3, 'runs': len(times),
+            'peak_kb': (peak - before) / 1024, 'retained_kb': (after - before) / 1024}
+
+
+def git_commit(path:Optional[str] = None)->str:
+    """当前提交的短哈希，工作区有未提交的改动时加 '-dirty'，不在 git 仓库中时为 'unknown'"""
+    path = path or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=path, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=path,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f'{commit}-dirty' if dirty else commit
+
+
+def run_suite(cases:Optional[List[str]] = None, sizes:Optional[List[int]] = None, repeat:int = 5,
+              verbose:bool = True)->List[Dict]:
+    """运行选中的项目（默认全部），sizes 给出时每项只跑其中不超过该项默认最大规模的 N"""
+    results = []
+    for name in cases or list(CASES):
+        if name not in CASES:
+            raise ValueError(f"未知的基准项: {name}，可选 {tuple(CASES)}")
+        build, default_sizes = CASES[name]
+        for n in ([n for n in sizes if n <= max(default_sizes)] if sizes else default_sizes):
+            row = {'case': name, 'n': int(n), **measure(build(int(n)), repeat)}
+            results.append(row)
+            if verbose:
+                print(f"{name:>28}  N={n:>7}  最短 {row['min_ms']:10.3f} ms  中位 {row['median_ms']:10.3f} ms  "
+                      f"({row['runs']:4d} 次)  峰值 {row['peak_kb']:10.1f} KB  残留 {row['retained_kb']:8.1f} KB")
+    return results
+
+
+def save_results(results:List[Dict], path:str = DEFAULT_OUTPUT, commit:Optional[str] = None)->str:
+    """以提交为键写入（同一提交重复运行时覆盖，同一提交内按 (case, n) 合并），先写临时文件再原子替换"""
+    commit = commit or git_commit()
+    data = load_results(path)
+    entry = data.pop(commit, {'results': []})
+    merged = {(row['case'], row['n']): row for row in entry['results']}
+    merged.update({(row['case'], row['n']): row for row in results})
+    data[commit] = {
+        'commit': commit,
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': f'{platform.system()} {platform.machine()} ({os.cpu_count()} CPU)',
+        'results': list(merged.values()),
+    }
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(f'{path}.tmp', path)
+    return commit
+
+
+def load_results(path:str = DEFAULT_OUTPUT)->Dict[str, Dict]:
+    """读取结果文件，键为提交，按写入先后排列"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(data:Dict[str, Dict], base:Optional[str] = None, head:Optional[str] = None,
+            threshold:float = 0.1, floor_ms:float = 0.05, verbose:bool = True)->List[Dict]:
+    """对比两次提交中都有的 (项目, N)：中位耗时变慢超过 threshold（比例）即标记；两边都低于 floor_ms 的项计时噪声太大，不标记
+    base/head 默认取结果文件中最后两次提交；返回每项的对比结果，'slower' 为 True 的是回归"""
+    commits = list(data)
+    if head is None:
+        head = commits[-1] if commits else None
+    if base is None:
+        earlier = commits[:commits.index(head)] if head in commits else []
+        base = earlier[-1] if earlier else None
+    if base not in data or head not in data:
+        raise ValueError(f"结果文件中没有要对比的提交：{base} / {head}，已有 {commits}")
+    old = {(row['case'], row['n']): row for row in data[base]['results']}
+    rows = []
+    for row in data[head]['results']:
+        key = (row['case'], row['n'])
+        if key not in old:
+            continue
+        ratio = row['median_ms'] / old[key]['median_ms'] if old[key]['median_ms'] > 0 else float('inf')
+        slower = ratio > 1 + threshold and max(row['median_ms'], old[key]['median_ms']) >= floor_ms
+        rows.append({'case': key[0], 'n': key[1], 'base_ms': old[key]['median_ms'], 'head_ms': row['median_ms'],
+                     'ratio': ratio, 'base_peak_kb': old[key]['peak_kb'], 'head_peak_kb': row['peak_kb'],
+                     'slower': bool(slower)})
+    if verbose:
+        print(f"基准 {base}  →  对比 {head}（阈值 +{threshold:.0%}）")
+        for r in rows:
+            flag = '  ← 变慢' if r['slower'] else ''
+            print(f"{r['case']:>28}  N={r['n']:>7}  {r['base_ms']:10.3f} → {r['head_ms']:10.3f} ms  "
+                  f"x{r['ratio']:5.2f}  峰值 {r['base_peak_kb']:9.1f} → {r['head_peak_kb']:9.1f} KB{flag}")
+        print(f"共 {len(rows)} 项，变慢 {sum(r['slower'] for r in rows)} 项")
+    return rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="性能回归套件")
+    sub = parser.add_subparsers(dest='command', required=True)
+    run = sub.add_parser('run', help="运行基准并按当前提交写入结果文件")
+    run.add_argument('--cases', nargs='+', default=None, help=f"要运行的项目，默认全部：{' '.join(CASES)}")
+    run.add_argument('--sizes', nargs='+', type=int, default=None, help="天体数，默认按各项目的默认规模")
+    run.add_argument('--repeat', type=int, default=5, help="每项至少计时的次数")
+    run.add_argument('--output', default=DEFAULT_OUTPUT, help="结果文件（JSON，以提交为键）")
+    run.add_argument('--commit', default=None, help="结果的键，默认为当前 git 提交")
+    cmp = sub.add_parser('compare', help="对比两次提交的结果，有变慢的项时退出码为 1")
+    cmp.add_argument('base', nargs='?', default=None, help="基准提交，默认为倒数第二次")
+    cmp.add_argument('head', nargs='?', default=None, help="对比提交，默认为最后一次")
+    cmp.add_argument('--threshold', type=float, default=0.1, help="中位耗时变慢超过该比例即标记")
+    cmp.add_argument('--output', default=DEFAULT_OUTPUT, help="结果文件")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == 'run':
+        commit = save_results(run_suite(args.cases, args.sizes, args.repeat), args.output, args.commit)
+        print(f"结果已写入 {args.output}（{commit}）")
+    else:
+        rows = compare(load_results(args.output), args.base, args.head, args.threshold)
+        sys.exit(1 if any(r['slower'] for r in rows) else 0)
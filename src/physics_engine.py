@@ -1,165 +1,212 @@
 # physics_engine.py - 纯物理计算，不涉及任何动画
+import warnings
 import numpy as np
-from typing import List, Dict,Tuple
+from typing import List, Dict, Tuple, Optional
 from src.simulation_data import SimulationState
+from src.kernels import pairwise_acceleration, fusion_candidates, fusion_clusters
+from src.barnes_hut import barnes_hut_acceleration
+from src.integrator import INTEGRATORS
+from src.diagnostics import conserved_quantities, step_drift
+from src.initial_conditions import generate_state
+from src import compiled_kernel
 
 """原则：尽量以天体id代替天体索引进行遍历查找"""
 
+GRAVITY_SOLVERS = ('direct', 'barnes_hut')
+FUSION_MODES = ('pair', 'cluster')
+KERNEL_BACKENDS = ('numpy', 'numba')
+PRECISIONS = {'float64': np.float64, 'float32': np.float32}
+
+
+def group_clusters(fused_pair:List[List[int]])->List[Tuple[int, List[int]]]:
+    """把 [消失天体id, 吞并者id] 列表按吞并者分组为 [(吞并者id, [消失天体id, ...]), ...]，按吞并者首次出现的顺序"""
+    groups = {}
+    for remove_body_id, fusion_body_id in fused_pair:
+        groups.setdefault(fusion_body_id, []).append(remove_body_id)
+    return list(groups.items())
+
+
 class PhysicsEngine:
     def __init__(self, params):
         self.params = params
         self.G = params['G']
         self.dt = params['dt']
         self.id = 0
-
-    def initialize_physics_state(self, params:Dict)->SimulationState:
-        """初始化物理状态"""
-        num_bodies = params['num_bodies']
-        bodies = []
-        time = 0.0
-        frame = 0
-
-        for i in range(num_bodies):
-            mass = np.random.uniform(params['min_mass'], params['max_mass'])
-            if params['center_mass'] and i == 0:
-                mass = params['center_mass_num']
-
-            radius = 3 / 7 * mass ** (1 / 3)
-
-            position = np.array([
-                np.random.uniform(-params['x_lim'], params['x_lim']),
-                np.random.uniform(-params['y_lim'], params['y_lim'])
-            ])
-
-            velocity = np.array([
-                np.random.uniform(-params['max_velocity'], params['max_velocity']),
-                np.random.uniform(-params['max_velocity'], params['max_velocity'])
-            ])
-
-            if params['center_mass'] and i == 0:
-                position = np.array([0.0, 0.0])
-                velocity = np.array([0.0, 0.0])
-
-            body = {}
-            body['position'] = position
-            body['velocity'] = velocity
-            body['mass'] = mass
-            body['radius'] = radius
-            body['id'] = self.id
-            body['acceleration'] = np.array([0, 0])
-            bodies.append(body)
-            self.id += 1
-        return SimulationState(bodies.copy(),time,frame)
-
-    def detect_fusion(self,SimulationState)->Tuple[List,List,List[Dict],List[Dict]]:
-        """检测哪些天体需要融合，创建新列表更新融合对象，但其中不删除被融合天体"""
-        bodies = SimulationState.bodies
-        fusion_pairs = [] #创建列表储存需要融合的天体对
+        self.gravity_solver = params.get('gravity_solver', 'direct')
+        self.theta = params.get('theta', 0.5)
+        if self.gravity_solver not in GRAVITY_SOLVERS:
+            raise ValueError(f"未知的引力求解器: {self.gravity_solver}，可选 {GRAVITY_SOLVERS}")
+        integrator = params.get('integrator', 'taylor')
+        if integrator not in INTEGRATORS:
+            raise ValueError(f"未知的积分器: {integrator}，可选 {tuple(INTEGRATORS)}")
+        self.integrator = INTEGRATORS[integrator]
+        self.diagnostics = params.get('diagnostics', False)
+        self.fusion_mode = params.get('fusion_mode', 'pair')
+        if self.fusion_mode not in FUSION_MODES:
+            raise ValueError(f"未知的融合模式: {self.fusion_mode}，可选 {FUSION_MODES}")
+        precision = params.get('precision', 'float64')
+        if precision not in PRECISIONS:
+            raise ValueError(f"未知的计算精度: {precision}，可选 {tuple(PRECISIONS)}")
+        self.dtype = PRECISIONS[precision]
+        self.kernel_backend = params.get('kernel_backend', 'numpy')
+        if self.kernel_backend not in KERNEL_BACKENDS:
+            raise ValueError(f"未知的内核后端: {self.kernel_backend}，可选 {KERNEL_BACKENDS}")
+        if self.kernel_backend == 'numba' and not compiled_kernel.AVAILABLE:
+            warnings.warn("未安装 numba，回退到 NumPy 内核", RuntimeWarning)
+            self.kernel_backend = 'numpy'
+
+    def compute_accelerations(self, positions:np.ndarray, masses:np.ndarray, targets=None)->np.ndarray:
+        """按 gravity_solver 选择直接求和或 Barnes–Hut 计算加速度，targets 为只需计算的行号"""
+        if self.gravity_solver == 'barnes_hut':
+            return barnes_hut_acceleration(positions, masses, self.G, self.theta, targets)
+        if self.kernel_backend == 'numba':
+            return compiled_kernel.compiled_acceleration(positions, masses, self.G, targets, self.dtype)
+        return pairwise_acceleration(positions, masses, self.G, self.params.get('chunk_size'), targets, self.dtype)
+
+    def fusion_candidates(self, positions:np.ndarray, radii:np.ndarray):
+        """按 kernel_backend 选择融合粗筛内核，两者结果逐位相同"""
+        if self.kernel_backend == 'numba':
+            return compiled_kernel.compiled_fusion_candidates(positions, radii)
+        return fusion_candidates(positions, radii)
+
+    def initialize_physics_state(self, params:Dict, rng:Optional[np.random.Generator] = None)->SimulationState:
+        """初始化物理状态，rng 为独立的随机数发生器（并行运行多个种子时使用），None 时沿用全局 np.random
+        分布由 params['initial_conditions'] 选择，见 src/initial_conditions.py"""
+        state = generate_state(params, rng, self.id)
+        self.id += len(state)
+        return state
+
+    def step(self, state:'SimulationState', profiler=None)->Dict:
+        """推进一个物理帧：积分 → 检测融合 → 删除被融合天体
+        返回字典，除最终状态外还带上特效需要的中间状态和融合信息；profiler 为 FrameProfiler 时记录各阶段耗时"""
+        moved_state = self.compute_acceleration_and_update(state)
+        if profiler is not None:
+            profiler.mark('integration')
+        detect = self.detect_fusion_clusters if self.fusion_mode == 'cluster' else self.detect_fusion
+        fusion_id, remove_id, fused_pair, fused_state = detect(moved_state)
+        if profiler is not None:
+            profiler.mark('detect_fusion')
+        after_del_state = self.update_del_bodies(remove_id, fused_state)
+        if profiler is not None:
+            profiler.mark('update_del_bodies')
+        result = {
+            'state': after_del_state.next_frame(self.dt),
+            'moved_state': moved_state, #积分后、融合前
+            'fused_state': fused_state, #融合后、删除前
+            'fusion_id': fusion_id,
+            'remove_id': remove_id,
+            'fused_pair': fused_pair,
+        }
+        if self.fusion_mode == 'cluster':
+            # 每个融合簇一条事件：(吞并者id, [被吞并的天体id, ...])，特效按簇创建
+            result['fusion_clusters'] = group_clusters(fused_pair)
+        if self.diagnostics:
+            #只衡量积分误差：比较积分前与积分后（融合前）的守恒量
+            result['diagnostics'] = step_drift(conserved_quantities(state, self.G),
+                                               conserved_quantities(moved_state, self.G), state)
+            if profiler is not None:
+                profiler.mark('diagnostics')
+        return result
+
+    def detect_fusion(self,SimulationState)->Tuple[List,List,List[List],'SimulationState']:
+        """检测哪些天体需要融合，返回更新了融合天体的新状态，但其中不删除被融合天体"""
+        ids = SimulationState.ids
+        mass = SimulationState.mass
+        radius = SimulationState.radius
+        position = SimulationState.pos
+        velocity = SimulationState.vel
         fusion_id = [] #储存融合天体id
         remove_id = [] #储存消失天体id
         fused_pair = [] #储存融合队，为每个消失天体找到被谁吞了
-        fusion_new_bodies = []
-        after_fusion_new_bodies = [] #融合出的新天体
-        body_dict = {b['id']: b for b in bodies}
-        for i in range(len(bodies)):
-            for j in range(i+1,len(bodies)):
-                body_a = bodies[i]
-                body_b = bodies[j]
-                dr=body_a['position'] - body_b['position']
-                distance = np.linalg.norm(dr)
-                if distance < (body_a['radius'] + body_b['radius'])/3:
-                    fusion_pairs.append((distance,body_a['id'],body_b['id']))
-        # 按距离排序，优先处理最近的天体对
-        fusion_pairs.sort(key=lambda x: x[0])
-        for i in range(len(fusion_pairs)):
-            #用id进行匹配
-            matching_body_a = body_dict[fusion_pairs[i][1]]
-            matching_body_b = body_dict[fusion_pairs[i][2]]
-            if matching_body_a['mass'] < matching_body_b['mass']:
-                fusion_body_id = fusion_pairs[i][2]
-                remove_body_id = fusion_pairs[i][1]
-            else:
-                fusion_body_id = fusion_pairs[i][1]
-                remove_body_id = fusion_pairs[i][2]
-            if remove_body_id not in remove_id and fusion_body_id not in remove_id:
-                fusion_id.append(fusion_body_id)
-                remove_id.append(remove_body_id)
-                fusion_body = body_dict[fusion_body_id]
-                removed_body = body_dict[remove_body_id]
-                #根据动量守恒计算融合后新天体状态
-                new_mass = fusion_body['mass']+removed_body['mass']
-                new_position = (fusion_body['position']*fusion_body['mass']+
-                removed_body['position']*removed_body['mass'])/new_mass
-                new_velocity = (fusion_body['velocity'] * fusion_body['mass'] +
-                                removed_body['velocity'] * removed_body['mass']) / new_mass
-                new_radius = 3 / 7 * new_mass ** (1 / 3)
-                fusion_new_body = {
-                    'mass': new_mass,
-                    'position': new_position,
-                    'velocity': new_velocity,
-                    'radius': new_radius,
-                    'id': fusion_body_id,
-                    'acceleration': fusion_body['acceleration']
-                }
-                fusion_new_bodies.append(fusion_new_body)
-                fused_pair.append([remove_body_id,fusion_body_id])
-
-        for body1 in bodies:
-            for body2 in fusion_new_bodies:
-                if body1['id'] == body2['id']:
-                    after_fusion_new_bodies.append(body2)
-                    break
-            else:
-                after_fusion_new_bodies.append(body1)
-        return fusion_id,remove_id,fused_pair,after_fusion_new_bodies.copy()
-
-    def update_del_bodies(self, remove_id,after_fusion_new_bodies)->List[Dict]:
-        """更新融合天体数据,通过新列表进行替换"""
-        remove_set = set(remove_id)
-        after_del_new_bodies = []
-        for new_body in after_fusion_new_bodies:
-            for id in remove_set:
-                if new_body['id'] == id:
-                    break
-            else:
-                after_del_new_bodies.append(new_body)
-        return after_del_new_bodies
-
-    def compute_acceleration_and_update(self,SimulationState)->List[Dict]:
-        """计算天体加速度并根据此更新位置速度"""
-        bodies = SimulationState.bodies
-        after_acceleration_new_bodies = []
-
-        accelerations = []
-        for i,body_i in enumerate(bodies):
-            acceleration = np.array([0.0, 0.0])
-            for j in range(len(bodies)):
-                body_i = bodies[i]
-                body_j = bodies[j]
-                if i != j:
-                    dr = body_j['position'] - body_i['position']
-                    distance = np.linalg.norm(dr)+2 # 加1是为了防止除以0
-                    force_magnitude = self.G * body_j['mass'] / (distance ** 2)
-                    acceleration += force_magnitude * dr / distance
-            accelerations.append(acceleration)
-        for i,body in enumerate(bodies):
-            acceleration = accelerations[i]
-            velocity = body['velocity']+acceleration*self.dt
-            position = (body['position']+body['velocity']*self.dt+
-                        1/2*acceleration*self.dt**2)
-            after_acceleration_new_bodies.append({
-                'position': position.copy(),
-                'velocity': velocity.copy(),
-                'mass': body['mass'],
-                'radius': body['radius'],
-                'acceleration': acceleration.copy(),
-                'id': body['id']
-            })
-        return after_acceleration_new_bodies
-
-
-
-
-
-
 
+        #网格粗筛找出需要融合的天体对（行号），已按距离从近到远排好
+        row_a, row_b, _ = self.fusion_candidates(position, radius)
+        fusion_pairs = zip(row_a, row_b)
+
+        new_mass = mass.copy()
+        new_radius = radius.copy()
+        new_position = position.copy()
+        new_velocity = velocity.copy()
+        removed_rows = set()
+        updated_rows = set()
+        for a, b in fusion_pairs:
+            if mass[a] < mass[b]:
+                fusion_row, remove_row = b, a
+            else:
+                fusion_row, remove_row = a, b
+            if remove_row not in removed_rows and fusion_row not in removed_rows:
+                fusion_id.append(int(ids[fusion_row]))
+                remove_id.append(int(ids[remove_row]))
+                fused_pair.append([int(ids[remove_row]), int(ids[fusion_row])])
+                removed_rows.add(remove_row)
+                #同一天体在一帧内多次吞并时，与原实现一致只保留第一次的融合结果
+                if fusion_row in updated_rows:
+                    continue
+                updated_rows.add(fusion_row)
+                #根据动量守恒计算融合后新天体状态（用融合前的数据）
+                total_mass = mass[fusion_row] + mass[remove_row]
+                new_position[fusion_row] = (position[fusion_row] * mass[fusion_row] +
+                                            position[remove_row] * mass[remove_row]) / total_mass
+                new_velocity[fusion_row] = (velocity[fusion_row] * mass[fusion_row] +
+                                            velocity[remove_row] * mass[remove_row]) / total_mass
+                new_mass[fusion_row] = total_mass
+                new_radius[fusion_row] = 3 / 7 * total_mass ** (1 / 3)
+
+        if not fusion_id:
+            return fusion_id, remove_id, fused_pair, SimulationState
+        after_fusion_state = SimulationState.with_arrays(mass=new_mass, radius=new_radius,
+                                                         pos=new_position, vel=new_velocity)
+        return fusion_id,remove_id,fused_pair,after_fusion_state
+
+    def detect_fusion_clusters(self, SimulationState)->Tuple[List,List,List[List],'SimulationState']:
+        """并查集版融合检测：重叠关系连通的天体（融合簇）在同一帧内一次合并到簇内质量最大的天体
+        （质量相同时取行号小的，与逐对规则一致），质量相加，位置与速度按质量加权平均；
+        返回值与 detect_fusion 相同，但每个吞并者在 fusion_id 中只出现一次，簇按其最近一对的距离排序"""
+        ids = SimulationState.ids
+        mass = SimulationState.mass
+        position = SimulationState.pos
+        velocity = SimulationState.vel
+        row_a, row_b, _ = self.fusion_candidates(position, SimulationState.radius)
+        if not len(row_a):
+            return [], [], [], SimulationState
+
+        root = fusion_clusters(row_a, row_b, len(ids))
+        # 簇的顺序：根在（按距离排好的）重叠对中第一次出现的先后
+        pair_roots = root[row_a]
+        _, first = np.unique(pair_roots, return_index=True)
+        rank = np.empty(len(ids), dtype=np.int64)
+        rank[pair_roots[np.sort(first)]] = np.arange(len(first))
+        involved = np.unique(np.concatenate([row_a, row_b]))
+        # 按 簇、质量从大到小、行号 排序，每簇第一行即吞并者
+        rows = involved[np.lexsort((involved, -mass[involved], rank[root[involved]]))]
+        head = np.r_[True, root[rows[1:]] != root[rows[:-1]]]
+        cluster = np.cumsum(head) - 1
+        survivors = rows[head]
+
+        total_mass = np.bincount(cluster, mass[rows])
+        new_mass = mass.copy()
+        new_radius = SimulationState.radius.copy()
+        new_position = position.copy()
+        new_velocity = velocity.copy()
+        for new, old in ((new_position, position), (new_velocity, velocity)):
+            for k in range(2):
+                new[survivors, k] = np.bincount(cluster, mass[rows] * old[rows, k]) / total_mass
+        new_mass[survivors] = total_mass
+        # 逐个标量计算半径，与逐对融合的结果逐位相同
+        new_radius[survivors] = [3 / 7 * m ** (1 / 3) for m in total_mass.tolist()]
+
+        removed = ~head
+        fusion_id = ids[survivors].tolist()
+        remove_id = ids[rows[removed]].tolist()
+        fused_pair = [[r, f] for r, f in zip(remove_id, ids[survivors[cluster[removed]]].tolist())]
+        after_fusion_state = SimulationState.with_arrays(mass=new_mass, radius=new_radius,
+                                                         pos=new_position, vel=new_velocity)
+        return fusion_id, remove_id, fused_pair, after_fusion_state
+
+    def update_del_bodies(self, remove_id,after_fusion_state)->'SimulationState':
+        """删除被融合天体，返回新状态"""
+        return after_fusion_state.remove_bodies(remove_id)
+
+    def compute_acceleration_and_update(self,SimulationState)->'SimulationState':
+        """用配置的积分器（见 src/integrator.py）推进 dt，返回新状态（时间与帧号不变）"""
+        return self.integrator(self, SimulationState, self.dt)
@@ -0,0 +1,99 @@
+# src/pipeline.py 物理/渲染流水线：后台线程或进程提前计算后续帧，放入有界队列，渲染端按显示节奏逐帧取用
+# 状态不可变，生产者与消费者之间只传递新状态与融合信息，特效仍按帧顺序创建，画面与串行运行一致
+import queue
+import threading
+import multiprocessing
+from typing import Dict, Optional
+from src.physics_engine import PhysicsEngine
+from src.simulation_data import SimulationState
+
+PIPELINE_MODES = ('thread', 'process')
+
+
+def _involved_state(state:SimulationState, body_ids)->SimulationState:
+    """只保留参与融合的天体，减少跨进程传递的数据量"""
+    return state.with_arrays(**{name: getattr(state, name)[state.rows_of(body_ids)]
+                                for name in SimulationState.ARRAY_FIELDS})
+
+
+def compact_result(result:Dict)->Dict:
+    """去掉 step() 结果中特效与记录用不到的部分：没有融合时不传中间状态，
+    有融合时中间状态只保留消失天体与吞并者（SpecialEffect 与 TrajectoryRecorder 只按 id 读取它们）"""
+    compact = dict(result)
+    if not result['fused_pair']:
+        compact['moved_state'] = compact['fused_state'] = None
+    else:
+        involved = list(dict.fromkeys(body_id for pair in result['fused_pair'] for body_id in pair))
+        compact['moved_state'] = _involved_state(result['moved_state'], involved)
+        compact['fused_state'] = _involved_state(result['fused_state'], result['fusion_id'])
+    return compact
+
+
+def _produce(physics:PhysicsEngine, state:SimulationState, results, stop)->None:
+    """生产者循环：不断推进物理并放入队列；队列满时阻塞等待（背压），直到收到停止信号"""
+    while not stop.is_set():
+        result = compact_result(physics.step(state))
+        state = result['state']
+        while not stop.is_set():
+            try:
+                results.put(result, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+
+
+def _process_worker(params:Dict, state:SimulationState, results, stop)->None:
+    _produce(PhysicsEngine(params), state, results, stop)
+
+
+class PhysicsPipeline:
+    """在后台提前计算最多 depth 帧
+    thread：与界面同进程，numpy 大数组运算会释放 GIL，可与绘制部分重叠；
+    process：独立进程，真正并行，但每帧的状态需要序列化传回"""
+
+    def __init__(self, physics:PhysicsEngine, state:SimulationState, mode:str = 'thread', depth:int = 8):
+        if mode not in PIPELINE_MODES:
+            raise ValueError(f"未知的流水线模式: {mode}，可选 {PIPELINE_MODES}")
+        self.mode = mode
+        self.stalls = 0 # 渲染端来取时物理还没算好的次数
+        if mode == 'thread':
+            self.results = queue.Queue(maxsize=depth)
+            self.stop_event = threading.Event()
+            self.worker = threading.Thread(target=_produce, args=(physics, state, self.results, self.stop_event),
+                                           daemon=True)
+        else:
+            # spawn：不把界面进程的 GUI 状态复制进子进程
+            context = multiprocessing.get_context('spawn')
+            self.results = context.Queue(maxsize=depth)
+            self.stop_event = context.Event()
+            self.worker = context.Process(target=_process_worker,
+                                          args=(physics.params, state, self.results, self.stop_event), daemon=True)
+        self.worker.start()
+
+    def next_result(self, timeout:Optional[float] = None)->Optional[Dict]:
+        """取出下一帧的结果；timeout 内没有算好时返回 None（本次显示保持上一帧）"""
+        try:
+            return self.results.get(timeout=timeout) if timeout else self.results.get_nowait()
+        except queue.Empty:
+            if not self.worker.is_alive():
+                raise RuntimeError("物理流水线的后台计算已意外退出")
+            self.stalls += 1
+            return None
+
+    def queued(self)->int:
+        """队列中已算好、尚未显示的帧数（进程模式下为近似值）"""
+        try:
+            return self.results.qsize()
+        except NotImplementedError:
+            return -1
+
+    def close(self)->None:
+        """通知生产者停止并等待其退出"""
+        self.stop_event.set()
+        # 取空队列，让阻塞在 put 上的生产者尽快看到停止信号
+        while True:
+            try:
+                self.results.get_nowait()
+            except queue.Empty:
+                break
+        self.worker.join(timeout=5)
@@ -0,0 +1,115 @@
+# src/profiler.py 帧阶段计时：把 update_frame 的每个阶段与之后的绘制分别计时，并记录天体数、图元数、特效数
+# 数据保存在固定长度的环形缓冲里，可显示为画面左上角的文字，也可导出为 CSV/JSON
+# 关闭时调用方只持有 None，热路径上只多一次 `is not None` 判断
+import csv
+import json
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+PHASES = ('integration', 'detect_fusion', 'update_del_bodies', 'effects_create',
+          'update_graphics', 'effects_update', 'draw')
+COUNTERS = ('bodies', 'artists', 'effects', 'queued', 'stalls', 'substeps')
+
+
+class FrameProfiler:
+    """按帧记录各阶段耗时（毫秒）与计数，最多保留最近 capacity 帧"""
+
+    def __init__(self, capacity:int = 600):
+        self.records = deque(maxlen=capacity)
+        self.current = None # 正在计时的帧，绘制完成后才放入 records
+        self.last = 0.0 # 上一个阶段结束的时刻
+
+    def begin_frame(self, frame:int)->None:
+        """开始新的一帧；上一帧若没有收到绘制完成的通知（如无界面运行），以没有 draw 的形式保存"""
+        self.flush()
+        self.current = {'frame': frame}
+        self.last = time.perf_counter()
+
+    def flush(self)->None:
+        """把正在计时的帧放入缓冲"""
+        if self.current is not None:
+            self.records.append(self.current)
+            self.current = None
+
+    def mark(self, phase:str)->None:
+        """记录从上一个阶段结束到现在的耗时，作为 phase 阶段的时间"""
+        now = time.perf_counter()
+        if self.current is not None:
+            self.current[phase] = self.current.get(phase, 0.0) + (now - self.last) * 1e3
+        self.last = now
+
+    def count(self, **counters)->None:
+        """记录本帧的计数（天体数、图元数等）"""
+        if self.current is not None:
+            self.current.update(counters)
+
+    def finish_draw(self)->None:
+        """绘制完成：update_frame 返回到现在的时间记为 draw，本帧结束"""
+        if self.current is None:
+            return
+        self.mark('draw')
+        self.records.append(self.current)
+        self.current = None
+
+    def attach(self, animation)->None:
+        """挂到 FuncAnimation 上测量绘制时间
+        blit 模式的重绘在 _post_draw 中同步完成且不触发 draw_event，包装它；否则等待整帧绘制后的 draw_event"""
+        if getattr(animation, '_blit', False):
+            post_draw = animation._post_draw
+
+            def timed_post_draw(framedata, blit):
+                post_draw(framedata, blit)
+                self.finish_draw()
+
+            animation._post_draw = timed_post_draw
+        else:
+            animation._fig.canvas.mpl_connect('draw_event', lambda event: self.finish_draw())
+
+    def summary(self, last:Optional[int] = None)->Dict[str, Dict[str, float]]:
+        """最近 last 帧（默认全部）各阶段耗时的平均值与最大值"""
+        records = list(self.records)[-last:] if last else list(self.records)
+        # 除固定阶段外，还包括调用方额外标记的阶段（如 record、diagnostics）
+        phases = [key for key in self.columns(records) if key != 'frame' and key not in COUNTERS]
+        result = {}
+        for phase in phases:
+            values = [r[phase] for r in records if phase in r]
+            if values:
+                result[phase] = {'mean_ms': sum(values) / len(values), 'max_ms': max(values)}
+        totals = [sum(r.get(phase, 0.0) for phase in phases) for r in records]
+        if totals:
+            result['total'] = {'mean_ms': sum(totals) / len(totals), 'max_ms': max(totals)}
+        return result
+
+    def overlay_text(self, last:int = 30)->str:
+        """画面叠加显示用的多行文字：最近 last 帧的平均阶段耗时与最新的计数"""
+        if not self.records:
+            return ''
+        lines = [f"{phase:<18}{stat['mean_ms']:7.2f} ms" for phase, stat in self.summary(last).items()]
+        latest = self.records[-1]
+        lines += [f"{key:<18}{latest[key]:>7}" for key in COUNTERS if key in latest]
+        return '\n'.join(lines)
+
+    def columns(self, records=None)->List[str]:
+        """导出的列：帧号、固定阶段，再加上记录中出现过的其他键"""
+        keys = ['frame', *PHASES]
+        for record in self.records if records is None else records:
+            keys += [key for key in record if key not in keys]
+        return keys
+
+    def to_csv(self, path:str)->None:
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=self.columns())
+            writer.writeheader()
+            writer.writerows(self.records)
+
+    def to_json(self, path:str)->None:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'summary': self.summary(), 'frames': list(self.records)}, f, ensure_ascii=False, indent=2)
+
+    def export(self, path:str)->None:
+        """按扩展名导出为 .csv 或 .json"""
+        if path.lower().endswith('.json'):
+            self.to_json(path)
+        else:
+            self.to_csv(path)
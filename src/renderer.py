@@ -1,12 +1,36 @@
 #src/renderer 渲染模块，只负责渲染真实对象
 import matplotlib.pyplot as plt
 import numpy as np
+from matplotlib.collections import EllipseCollection
 from src.config import RENDERER_PARAMS, SIMULATION_PARAMS
+from src.artist_pool import CirclePool
+from src.trails import TrailRenderer
 from typing import List,Tuple,Dict
 
 
+# 外层圆环的线宽以磅为单位（1.5 + 28*r/R），与天体大小无关：再小的天体在屏幕上也是几十像素宽的渐变光斑
+MAX_LINEWIDTH_PT = 1.5 + 28
+LINEWIDTH_GROWTH_PT = 28
+
+
+def ring_slots(rings:int, layer:int)->np.ndarray:
+    """rings 层的天体第 i 层对应完整 layer 层中的哪一层（决定 zorder 与所属集合）
+    最里层固定为第 0 层、最外层固定为第 layer-1 层，遮挡关系与画满 layer 层时一致"""
+    slots = np.round(np.arange(1, rings + 1) * layer / rings).astype(np.int64) - 1
+    if rings:
+        slots[0] = 0
+    return slots
+
+
+def with_color_mass(bodies, color_mass=None)->List[dict]:
+    """把天体字典中的质量换成着色用的质量（没有记录的天体保持原质量）"""
+    if not color_mass:
+        return bodies
+    return [dict(body, mass=color_mass.get(body['id'], body['mass'])) for body in bodies]
+
+
 class Renderer:
-    def __init__(self):
+    def __init__(self, star_seed=None, blit=None):
         self.layer = RENDERER_PARAMS['layer']
         self.dt = SIMULATION_PARAMS['dt']
 
@@ -16,26 +40,82 @@ class Renderer:
         self.ax.set_aspect('equal')
         self.ax.set_facecolor('black')
         self.fig.patch.set_facecolor('black')
-        # 背景星星
+        # 背景星星，给定 star_seed 时星空可复现（导出视频时各进程画出的背景完全一致）
+        rng = np.random if star_seed is None else np.random.RandomState(star_seed)
         num_stars = 300
-        star_x = np.random.uniform(*RENDERER_PARAMS['axe_x_lim'], num_stars)
-        star_y = np.random.uniform(*RENDERER_PARAMS['axe_y_lim'], num_stars)
-        star_sizes = np.random.uniform(0.5, 3, num_stars)
-        star_alpha = np.random.uniform(0.4, 1, num_stars)
+        star_x = rng.uniform(*RENDERER_PARAMS['axe_x_lim'], num_stars)
+        star_y = rng.uniform(*RENDERER_PARAMS['axe_y_lim'], num_stars)
+        star_sizes = rng.uniform(0.5, 3, num_stars)
+        star_alpha = rng.uniform(0.4, 1, num_stars)
         self.ax.scatter(star_x, star_y, s=star_sizes, c='white', alpha=star_alpha,zorder = 15-self.layer)
         self.graphics = []  # 真实天体对象
+        # blit 模式下天体图元一创建就标记为 animated，不会被画进缓存的静态背景
+        self.blit = RENDERER_PARAMS.get('blit', False) if blit is None else blit
+        # 圆环池：消失天体与结束特效的圆环放回池中复用（SpecialEffect 共用同一个池）
+        self.pool = CirclePool(self.ax)
+        # 细节层次：按天体在屏幕上的大小选择渐变层数，视野外的天体不画
+        self.lod = RENDERER_PARAMS.get('lod', False)
+        self.lod_band_px = RENDERER_PARAMS.get('lod_band_px', 2.0)
+        # 轨迹尾迹：画在所有天体圆环之下，颜色取天体外层颜色
+        self.trails = None
+        if RENDERER_PARAMS.get('show_trails', False):
+            self.trails = TrailRenderer(self.ax, RENDERER_PARAMS.get('trail_length', 60),
+                                        lambda body: self.body_colors(body)[1],
+                                        RENDERER_PARAMS.get('trail_linewidth', 1.0),
+                                        RENDERER_PARAMS.get('trail_alpha', 0.6),
+                                        zorder=10 - self.layer, animated=self.blit)
 
+    def pixels_per_unit(self)->float:
+        """当前视野下一个数据单位对应的像素数（等比例坐标轴取两个方向中较小的，缩放、改变窗口大小后自动更新）"""
+        x0, x1 = self.ax.get_xlim()
+        y0, y1 = self.ax.get_ylim()
+        return min(self.ax.bbox.width / abs(x1 - x0), self.ax.bbox.height / abs(y1 - y0))
 
-    def initialize_graphics(self, SimulationState):
-        bodies = SimulationState.bodies
-        self.graphics.clear() #如果重置过模拟，则需要清理之前的图形对象
-        for body in bodies:
-            circles = self.create_single_body(body)
-            self.graphics.append({
-                'id': body['id'],
-                'body_circles': circles,
-                'radius': body['radius'],
-            })
+    def lod_layers(self, positions, radii)->np.ndarray:
+        """每个天体画多少层圆环
+        相邻两层在屏幕上露出的环带宽约为 (半径像素 + 外层线宽增量的一半) / 层数，
+        取使环带不宽于 lod_band_px 像素的层数（更密的层肉眼已分辨不出）；大天体仍画满 layer 层，
+        整个光斑都在视野外的天体为 0 层"""
+        radii = np.asarray(radii, dtype=float)
+        if not self.lod:
+            return np.full(len(radii), self.layer, dtype=np.int64)
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        scale = self.pixels_per_unit()
+        points = self.fig.dpi / 72 # 1 磅对应的像素数
+        band = (radii * scale + LINEWIDTH_GROWTH_PT * points / 2) / self.lod_band_px
+        rings = np.clip(np.ceil(band), 2, self.layer).astype(np.int64)
+        reach = radii + MAX_LINEWIDTH_PT * points / 2 / scale # 光斑外缘离圆心的距离（数据单位）
+        (x0, x1), (y0, y1) = sorted(self.ax.get_xlim()), sorted(self.ax.get_ylim())
+        outside = ((positions[:, 0] + reach < x0) | (positions[:, 0] - reach > x1) |
+                   (positions[:, 1] + reach < y0) | (positions[:, 1] - reach > y1))
+        rings[outside] = 0
+        return rings
+
+    def initialize_graphics(self, SimulationState, color_mass=None):
+        """color_mass 为 {id: 质量}，从存档恢复时按天体最初着色时的质量上色（融合后颜色不随质量变化）"""
+        bodies = with_color_mass(SimulationState.bodies, color_mass)
+        for graphic in self.graphics: #如果重置过模拟，则需要清理之前的图形对象
+            self.pool.release(graphic['body_circles'])
+        self.graphics.clear()
+        rings = self.lod_layers(SimulationState.pos, SimulationState.radius)
+        for body, count in zip(bodies, rings):
+            self._add_graphic(body, count)
+        if self.trails is not None:
+            self.trails.reset(SimulationState, bodies)
+
+    def _add_graphic(self, body, rings=None):
+        circles = self.create_single_body(body, rings)
+        self.graphics.append({
+            'id': body['id'],
+            'body_circles': circles,
+            'radius': body['radius'],
+            'color_mass': body['mass'],
+            'hidden': False,
+        })
+
+    def color_masses(self)->Dict[int, float]:
+        """每个天体着色时用的质量，写入存档"""
+        return {graphic['id']: graphic['color_mass'] for graphic in self.graphics}
 
     def update_graphics(self,SimulationState,remove_id):
         """根据物理状态更新天体对象"""
@@ -43,36 +123,48 @@ class Renderer:
         graphic_dict = {g['id']: g for g in self.graphics}
         body_dict = {b['id']: b for b in bodies}
         current_ids = set(body_dict.keys())
-        #从画布上删除消失天体
-        for id in remove_id:
-            for c in graphic_dict[id]['body_circles']:
-                c.remove()
+        # 消失天体（以及其他已不在状态中的天体）的圆环放回池中，供特效或新天体复用
+        for graphic in self.graphics:
+            if graphic['id'] not in current_ids:
+                self.pool.release(graphic['body_circles'])
+        self.graphics = [g for g in self.graphics if g['id'] in current_ids]
 
+        # 状态中新出现的天体（如从存档恢复、外部加入）补建图形
+        if len(self.graphics) < len(body_dict):
+            for body_id in current_ids - set(graphic_dict):
+                self._add_graphic(body_dict[body_id], 0)
 
-        # 删除已不存在的天体图形
-        self.graphics = [g for g in self.graphics if g['id'] in current_ids]
+        # 天体长大、移出/移入视野或视野缩放后层数变化的，重建其圆环
+        rows = SimulationState.rows_of([graphic['id'] for graphic in self.graphics])
+        rings = self.lod_layers(SimulationState.pos[rows], SimulationState.radius[rows])
+        for graphic, count in zip(self.graphics, rings):
+            if count != len(graphic['body_circles']):
+                self.pool.release(graphic['body_circles'])
+                body = dict(body_dict[graphic['id']], mass=graphic['color_mass'])
+                graphic['body_circles'] = self.create_single_body(body, count)
+                if graphic['hidden']:
+                    for circle in graphic['body_circles']:
+                        circle.set_visible(False)
 
         # 更新现有天体
         for graphic in self.graphics:
             pos = body_dict[graphic['id']]['position']
             new_radius = body_dict[graphic['id']]['radius']
+            count = len(graphic['body_circles'])
             for layer,circle in enumerate(graphic['body_circles']):
-                layer_radius = (layer + 1) * new_radius / self.layer
+                layer_radius = (layer + 1) * new_radius / count
                 circle.center = (pos[0], pos[1])
                 circle.radius=layer_radius
+        if self.trails is not None:
+            self.trails.update(SimulationState, remove_id)
 
         # 调试信息
         #for graphic in self.graphics:
             #print(f'天体半径{graphic["id"]}：{graphic["radius"]}')
 
-    def create_single_body(self, body)->List:
-        """利用多层圆环创建天体实现颜色径向渐变"""
-        circles = []
+    def body_colors(self, body)->Tuple[np.ndarray,np.ndarray]:
+        """质量 → 内外层颜色映射"""
         mass = body['mass']
-        radius = body['radius']
-        pos = body['position']
-
-        # === 正确的质量 → 颜色映射
         min_m = SIMULATION_PARAMS['min_mass']
         max_m = SIMULATION_PARAMS['max_mass']
         ratio = (mass - min_m) / (max_m - min_m + 1e-6)
@@ -82,32 +174,46 @@ class Renderer:
         if body['id'] == 0 and SIMULATION_PARAMS['center_mass']:
             inner_color = np.array([0.0, 0.0, 0.0])      # 绝对纯黑（视界）
             outer_color = outer_color = np.array([0.40, 0.02, 0.02])    # 深紫红吸积盘辉光（最经典的黑洞颜色）
+        return inner_color, outer_color
 
-        for layer in range(self.layer):
-            current_radius = (layer + 1) * radius / self.layer
+    def create_single_body(self, body, rings=None)->List:
+        """利用多层圆环创建天体实现颜色径向渐变，rings 为层数（细节层次），默认画满 layer 层"""
+        circles = []
+        radius = body['radius']
+        pos = body['position']
+        inner_color, outer_color = self.body_colors(body)
+        rings = self.layer if rings is None else int(rings)
+        slots = ring_slots(rings, self.layer)
+
+        for layer in range(rings):
+            current_radius = (layer + 1) * radius / rings
             # 颜色从内到外线性渐变
-            t = layer / (self.layer - 1) if self.layer > 1 else 0
+            t = layer / (rings - 1) if rings > 1 else 0
             color = (1 - t) * inner_color + t * outer_color
 
             if layer == 0:
                 # 最里面一层：实心圆
-                circle = plt.Circle(pos, current_radius, color=color, ec='none', zorder=10)
+                circle = self.pool.acquire(pos, current_radius, color, zorder=10, animated=self.blit)
             else:
                 # 外层：空心圆环，线宽随半径自适应（越大的天体外环越粗）
                 base_lw = 1.5
                 linewidth = base_lw + 28 * (current_radius / radius)
-                circle = plt.Circle(pos, current_radius, color=color, fill=False,
-                                    linewidth=linewidth, ec=color, zorder=10 - layer)
-
-            self.ax.add_patch(circle)
+                circle = self.pool.acquire(pos, current_radius, color, zorder=10 - int(slots[layer]),
+                                           linewidth=linewidth, animated=self.blit)
             circles.append(circle)
 
         return circles
 
+    def animated_artists(self)->List:
+        """本帧需要重绘的天体图元：仍在画布上且可见的圆环（已删除、被特效隐藏的不返回）"""
+        artists = [circle for graphic in self.graphics for circle in graphic['body_circles'] if circle.get_visible()]
+        return artists + self.trails.artists() if self.trails is not None else artists
+
     def hide_body(self, body_id):
         """隐藏某个天体的所有图形"""
         for graphic in self.graphics:
             if graphic['id'] == body_id:
+                graphic['hidden'] = True
                 for circle in graphic['body_circles']:
                     circle.set_visible(False)
                 break
@@ -116,6 +222,156 @@ class Renderer:
         """显示某个天体的所有图形"""
         for graphic in self.graphics:
             if graphic['id'] == body_id:
+                graphic['hidden'] = False
                 for circle in graphic['body_circles']:
                     circle.set_visible(True)
-                break
\ No newline at end of file
+                break
+
+
+class CollectionRenderer(Renderer):
+    """集合渲染后端：每个渐变层一个 EllipseCollection，所有天体的同一层画在同一个对象里
+    各层的 zorder 与 Renderer 中的圆环一致（10-layer），与特效圆环的遮挡关系不变；
+    每帧只对每层做几次数组赋值（位置、尺寸、颜色），Python 调用次数与天体数量无关
+    层数少于 layer 的天体（细节层次）只出现在 ring_slots 给出的那几个集合中"""
+
+    def __init__(self, star_seed=None, blit=None):
+        super().__init__(star_seed, blit)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.base_colors = np.zeros((0, 2, 3)) # 每个天体最里层与最外层的 RGB
+        self.visible = np.zeros(0, dtype=bool)
+        self.color_mass = np.zeros(0) # 每个天体着色时的质量
+        self.rings = np.zeros(0, dtype=np.int64) # 每个天体当前画的层数
+        # 每个集合中的成员：天体行号、该圆环是天体的第几层（从 1 数）与天体的层数
+        self.members = [(np.zeros(0, dtype=np.int64),) * 3 for _ in range(self.layer)]
+        self.collections = []
+
+    def initialize_graphics(self, SimulationState, color_mass=None):
+        for collection in self.collections:
+            collection.remove()
+        bodies = with_color_mass(SimulationState.bodies, color_mass)
+        n = len(bodies)
+        self.ids = SimulationState.ids.copy()
+        self.visible = np.ones(n, dtype=bool)
+        self.color_mass = np.array([body['mass'] for body in bodies], dtype=float)
+        self.base_colors = self._base_colors(bodies)
+        self.rings = self.lod_layers(SimulationState.pos, SimulationState.radius)
+        self.collections = []
+        for layer in range(self.layer):
+            collection = EllipseCollection(np.zeros(0), np.zeros(0), np.zeros(0), units='xy',
+                                           offsets=np.zeros((0, 2)), offset_transform=self.ax.transData,
+                                           zorder=10 - layer, animated=self.blit)
+            self.ax.add_collection(collection, autolim=False)
+            self.collections.append(collection)
+        self._assign_layers()
+        self._apply_geometry(SimulationState.pos, SimulationState.radius)
+        if self.trails is not None:
+            self.trails.reset(SimulationState, bodies)
+
+    def _base_colors(self, bodies)->np.ndarray:
+        """每个天体最里层与最外层的颜色 (N, 2, 3)"""
+        return np.array([self.body_colors(body) for body in bodies], dtype=float).reshape(len(bodies), 2, 3)
+
+    def _assign_layers(self):
+        """按每个天体的层数把它的各层圆环分配到对应的集合（层数或天体变化时才调用）"""
+        body_rows = np.repeat(np.arange(len(self.rings)), self.rings)
+        counts = np.repeat(self.rings, self.rings)
+        starts = np.cumsum(self.rings) - self.rings
+        rank = np.arange(len(body_rows)) - np.repeat(starts, self.rings) + 1 # 第几层，从 1 数
+        slots = np.round(rank * self.layer / np.maximum(counts, 1)).astype(np.int64) - 1
+        slots[rank == 1] = 0
+        for layer in range(self.layer):
+            selected = slots == layer
+            self.members[layer] = (body_rows[selected], rank[selected], counts[selected])
+        self._apply_colors()
+
+    def _apply_colors(self):
+        """按可见性写入颜色：最里层只填充，外层只描边；颜色从内到外线性渐变"""
+        for layer, collection in enumerate(self.collections):
+            rows, rank, counts = self.members[layer]
+            t = np.where(counts > 1, (rank - 1) / np.maximum(counts - 1, 1), 0.0)
+            rgb = (1 - t)[:, None] * self.base_colors[rows, 0] + t[:, None] * self.base_colors[rows, 1]
+            colors = np.concatenate([rgb, self.visible[rows].astype(float)[:, None]], axis=1)
+            transparent = np.zeros_like(colors)
+            if layer == 0:
+                collection.set_facecolors(colors)
+                collection.set_edgecolors(transparent)
+                collection.set_linewidths(0.0)
+            else:
+                collection.set_facecolors(transparent)
+                collection.set_edgecolors(colors)
+                # 线宽 1.5 + 28*r/R（磅），与 Renderer 中的圆环一致
+                collection.set_linewidths(1.5 + 28 * rank / counts)
+
+    def _apply_geometry(self, positions, radii):
+        for layer, collection in enumerate(self.collections):
+            rows, rank, counts = self.members[layer]
+            diameter = 2 * rank * radii[rows] / counts
+            collection.set_offsets(positions[rows])
+            collection.set_widths(diameter)
+            collection.set_heights(diameter)
+            if len(rows) != len(collection.get_angles()):
+                collection.set_angles(np.zeros(len(rows)))
+
+    def update_graphics(self,SimulationState,remove_id):
+        """根据物理状态更新所有层的位置与尺寸，消失天体直接从数组中剔除，层数变化的天体重新分配集合"""
+        changed = False
+        keep = np.isin(self.ids, SimulationState.ids)
+        if not keep.all():
+            self.ids = self.ids[keep]
+            self.visible = self.visible[keep]
+            self.color_mass = self.color_mass[keep]
+            self.base_colors = self.base_colors[keep]
+            changed = True
+        # 状态中新出现的天体（如从存档恢复、外部加入）追加到末尾
+        new = ~np.isin(SimulationState.ids, self.ids)
+        if new.any():
+            self.ids = np.concatenate([self.ids, SimulationState.ids[new]])
+            self.visible = np.concatenate([self.visible, np.ones(new.sum(), dtype=bool)])
+            bodies = [SimulationState.bodies[row] for row in np.nonzero(new)[0]]
+            self.color_mass = np.concatenate([self.color_mass, [body['mass'] for body in bodies]])
+            self.base_colors = np.concatenate([self.base_colors, self._base_colors(bodies)])
+            changed = True
+        # 找到每个图形在状态数组中的行号
+        order = np.argsort(SimulationState.ids, kind='stable')
+        rows = order[np.searchsorted(SimulationState.ids, self.ids, sorter=order)]
+        positions, radii = SimulationState.pos[rows], SimulationState.radius[rows]
+        # 天体长大、移出/移入视野或视野缩放后层数会变化
+        rings = self.lod_layers(positions, radii)
+        if changed or not np.array_equal(rings, self.rings):
+            self.rings = rings
+            self._assign_layers()
+        self._apply_geometry(positions, radii)
+        if self.trails is not None:
+            self.trails.update(SimulationState, remove_id)
+
+    def color_masses(self)->Dict[int, float]:
+        return dict(zip(self.ids.tolist(), self.color_mass.tolist()))
+
+    def animated_artists(self)->List:
+        """每层一个集合，整体重绘"""
+        return list(self.collections) + (self.trails.artists() if self.trails is not None else [])
+
+    def _set_visible(self, body_id, visible):
+        match = self.ids == body_id
+        if match.any():
+            self.visible[match] = visible
+            self._apply_colors()
+
+    def hide_body(self, body_id):
+        """隐藏某个天体的所有图层"""
+        self._set_visible(body_id, False)
+
+    def show_body(self, body_id):
+        """显示某个天体的所有图层"""
+        self._set_visible(body_id, True)
+
+
+RENDERER_BACKENDS = {
+    'patch': Renderer,
+    'collection': CollectionRenderer,
+}
+
+
+def create_renderer(star_seed=None, blit=None)->Renderer:
+    """按 RENDERER_PARAMS['backend'] 创建渲染器"""
+    return RENDERER_BACKENDS[RENDERER_PARAMS.get('backend', 'patch')](star_seed, blit)
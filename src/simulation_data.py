@@ -1,7 +1,7 @@
 # src/state.py
 
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 
 # 一个天体 = 一个字典（和原来一模一样）
@@ -20,49 +20,168 @@ def create_body(id: int, mass: float, radius: float,
     }
 
 
-# 整个宇宙 = 一个大字典，里面装着一堆小字典
+def _frozen(array: np.ndarray) -> np.ndarray:
+    """把数组设为只读，保证状态一旦创建就不会被后续步骤修改"""
+    array.flags.writeable = False
+    return array
+
+
+# 整个宇宙 = 一组连续数组（结构体数组），每一列一个 ndarray
 class SimulationState:
-    def __init__(self, bodies: List[dict], time: float = 0.0, frame: int = 0):
-        self.bodies = bodies.copy()
+    ARRAY_FIELDS = ('ids', 'mass', 'radius', 'pos', 'vel', 'acc')
+
+    def __init__(self, bodies: Optional[List[dict]] = None, time: float = 0.0, frame: int = 0):
+        # 兼容旧接口：仍可由“字典列表”构造，内部立即打包成数组
+        bodies = [] if bodies is None else bodies
+        n = len(bodies)
+        arrays = {
+            'ids': np.array([b['id'] for b in bodies], dtype=np.int64),
+            'mass': np.array([b['mass'] for b in bodies], dtype=float),
+            'radius': np.array([b['radius'] for b in bodies], dtype=float),
+            'pos': np.array([b['position'] for b in bodies], dtype=float).reshape(n, 2),
+            'vel': np.array([b['velocity'] for b in bodies], dtype=float).reshape(n, 2),
+            'acc': np.array([b.get('acceleration', np.zeros(2)) for b in bodies], dtype=float).reshape(n, 2),
+        }
+        self._set_arrays(arrays, time, frame)
+
+    def _set_arrays(self, arrays: Dict[str, np.ndarray], time: float, frame: int, acc_valid: bool = False):
+        for name in self.ARRAY_FIELDS:
+            setattr(self, name, _frozen(arrays[name]))
         self.time = time
         self.frame = frame
+        # acc 是否恰好是当前位置、质量下的加速度；为 True 时积分器（如 Verlet）可直接复用，省一次引力计算
+        self.acc_valid = acc_valid
+        self._index = None
+        self._bodies = None
+
+    @classmethod
+    def from_arrays(cls, ids, mass, radius, pos, vel, acc=None,
+                    time: float = 0.0, frame: int = 0, copy: bool = True,
+                    acc_valid: bool = False) -> 'SimulationState':
+        """直接由数组构造状态，不复制已是只读的数组（写时复制：谁要改谁先复制）
+        copy=False 表示调用方把新建的数组交给状态，之后不再修改，可省去一次复制"""
+        state = cls.__new__(cls)
+        n = len(ids)
+        arrays = {
+            'ids': np.asarray(ids, dtype=np.int64),
+            'mass': np.asarray(mass, dtype=float),
+            'radius': np.asarray(radius, dtype=float),
+            'pos': np.asarray(pos, dtype=float).reshape(n, 2),
+            'vel': np.asarray(vel, dtype=float).reshape(n, 2),
+            'acc': np.zeros((n, 2)) if acc is None else np.asarray(acc, dtype=float).reshape(n, 2),
+        }
+        # 外部传入的可写数组可能被调用方继续修改，先复制一份再冻结
+        if copy:
+            for name, array in arrays.items():
+                if array.flags.writeable:
+                    arrays[name] = array.copy()
+        state._set_arrays(arrays, time, frame, acc_valid)
+        return state
+
+    def with_arrays(self, time: Optional[float] = None, frame: Optional[int] = None,
+                    acc_valid: Optional[bool] = None, **changes) -> 'SimulationState':
+        """返回替换了部分列的新状态，未改动的列直接共享（只读，所以共享是安全的）
+        changes 中的新数组由调用方新建并移交，不再复制
+        acc_valid 为 None 时：只要改动了 ids/mass/pos/acc 中的任何一列，加速度就视为失效"""
+        arrays = {name: changes.get(name, getattr(self, name)) for name in self.ARRAY_FIELDS}
+        if acc_valid is None:
+            acc_valid = self.acc_valid and not any(name in changes for name in ('ids', 'mass', 'pos', 'acc'))
+        return SimulationState.from_arrays(time=self.time if time is None else time,
+                                           frame=self.frame if frame is None else frame,
+                                           copy=False, acc_valid=acc_valid, **arrays)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # 跨进程传递（pickle）时不带缓存；反序列化后的数组默认可写，重新冻结
+    def __getstate__(self):
+        return dict(self.__dict__, _index=None, _bodies=None)
 
-        # 为了快速通过 id 找天体，做一个 id → body 的字典
-        self.body_dict = {body['id']: body for body in self.bodies}
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        for name in self.ARRAY_FIELDS:
+            _frozen(getattr(self, name))
+
+    # id → 行号 的索引，第一次用到时才建立
+    @property
+    def index(self) -> Dict[int, int]:
+        if self._index is None:
+            self._index = {int(body_id): row for row, body_id in enumerate(self.ids)}
+        return self._index
+
+    def rows_of(self, body_ids) -> np.ndarray:
+        """把一组 id 转成行号数组"""
+        index = self.index
+        return np.array([index[int(body_id)] for body_id in body_ids], dtype=np.int64)
+
+    def _body_view(self, row: int) -> dict:
+        return {
+            'id': int(self.ids[row]),
+            'mass': float(self.mass[row]),
+            'radius': float(self.radius[row]),
+            'position': self.pos[row],  # 只读视图，不产生复制
+            'velocity': self.vel[row],
+            'acceleration': self.acc[row],
+        }
+
+    # 兼容访问：渲染器和特效仍按“字典列表”遍历，按需生成一次后缓存
+    @property
+    def bodies(self) -> List[dict]:
+        if self._bodies is None:
+            self._bodies = [self._body_view(row) for row in range(len(self.ids))]
+        return self._bodies
+
+    @property
+    def body_dict(self) -> Dict[int, dict]:
+        return {body['id']: body for body in self.bodies}
 
     # 通过 id 快速拿到某个天体（融合时最常用）
     def get_body(self, body_id: int) -> dict:
-        return self.body_dict[body_id]
+        if self._bodies is not None:
+            return self._bodies[self.index[body_id]]
+        return self._body_view(self.index[body_id])
 
     # 返回一个“替换了某个天体”的全新状态（关键！不改原状态）
     def replace_body(self, new_body: dict) -> 'SimulationState':
-        new_list = []
-        for b in self.bodies:
-            if b['id'] == new_body['id']:
-                new_list.append(new_body)  # 换成新的
-            else:
-                new_list.append(b)  # 老的保留
-        return SimulationState(new_list, self.time, self.frame)
+        row = self.index[new_body['id']]
+        changes = {}
+        for name, key in (('mass', 'mass'), ('radius', 'radius'), ('pos', 'position'),
+                          ('vel', 'velocity'), ('acc', 'acceleration')):
+            if key in new_body:
+                column = getattr(self, name).copy()  # 写时复制，只复制被替换的列
+                column[row] = new_body[key]
+                changes[name] = column
+        return self.with_arrays(**changes)
 
     # 删除某个天体后返回新状态
     def remove_body(self, body_id: int) -> 'SimulationState': #前向类型声明，让类定义内部也能引用自己
-        new_list = [b for b in self.bodies if b['id'] != body_id]
-        return SimulationState(new_list, self.time, self.frame)
+        return self.remove_bodies([body_id])
+
+    def remove_bodies(self, body_ids) -> 'SimulationState':
+        """一次删除多个天体，只做一次布尔掩码筛选"""
+        if len(body_ids) == 0:
+            return self
+        keep = ~np.isin(self.ids, np.asarray(list(body_ids), dtype=np.int64))
+        return self.with_arrays(**{name: getattr(self, name)[keep] for name in self.ARRAY_FIELDS})
 
     # 时间前进一帧
     def next_frame(self, dt: float) -> 'SimulationState':
-        return SimulationState(self.bodies, self.time + dt, self.frame + 1)
+        return self.with_arrays(time=self.time + dt, frame=self.frame + 1)
+
+    # 显示用的插值状态：位置取 previous 与本状态之间的线性插值，alpha=1 即本状态
+    def interpolate(self, previous: Optional['SimulationState'], alpha: float) -> 'SimulationState':
+        """只对 previous 中也存在的天体插值，本帧新出现的天体（融合后的新 id 等）直接取当前位置"""
+        if previous is None or alpha >= 1:
+            return self
+        order = np.argsort(previous.ids, kind='stable')
+        rows = order[np.minimum(np.searchsorted(previous.ids, self.ids, sorter=order), len(order) - 1)]
+        common = previous.ids[rows] == self.ids if len(order) else np.zeros(len(self.ids), dtype=bool)
+        pos = self.pos.copy()
+        pos[common] = previous.pos[rows[common]] + alpha * (self.pos[common] - previous.pos[rows[common]])
+        return self.with_arrays(pos=pos)
 
-    # 深拷贝（如果你真的需要可变副本）
+    # 深拷贝（得到与原状态不共享内存的独立副本）
     def copy(self) -> 'SimulationState':
-        copied_bodies = []
-        for b in self.bodies:
-            copied_bodies.append({
-                'id': b['id'],
-                'mass': b['mass'],
-                'radius': b['radius'],
-                'position': b['position'].copy(),
-                'velocity': b['velocity'].copy(),
-                'acceleration': b['acceleration'].copy(),
-            })
-        return SimulationState(copied_bodies, self.time, self.frame)
\ No newline at end of file
+        return SimulationState.from_arrays(
+            *(getattr(self, name).copy() for name in self.ARRAY_FIELDS),
+            time=self.time, frame=self.frame, copy=False, acc_valid=self.acc_valid)
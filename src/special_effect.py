@@ -1,7 +1,8 @@
 # src/special_effect.py   ← 完整正确版本（请完全替换）
-import matplotlib.pyplot as plt
 import numpy as np
 from src.config import RENDERER_PARAMS, SIMULATION_PARAMS
+from src.artist_pool import CirclePool
+from src.renderer import ring_slots
 
 
 class SpecialEffect:
@@ -12,24 +13,58 @@ class SpecialEffect:
         self.layer = RENDERER_PARAMS['layer']
         self.fusion_effect = []
         self.remove_effect = []
+        self.blit = renderer.blit if renderer else RENDERER_PARAMS.get('blit', False)
+        # 与渲染器共用圆环池，特效结束后圆环放回池中，不再在画布上越积越多
+        self.pool = renderer.pool if renderer else CirclePool(ax)
+        # 复用的圆环在画布子图元列表中的位置不再代表创建先后，用极小的 zorder 增量保持
+        # “后创建的特效画在上面、特效总在同层天体之上”的顺序，离屏导出时与窗口画面一致
+        self.sequence = 0
+
+    def active_artists(self):
+        """正在播放的特效圆环，blit 模式下每帧只重绘它们"""
+        return [c for eff in self.fusion_effect + self.remove_effect for c in eff['circles'] if c.get_visible()]
 
     def create_remove_effect(self, remove_id, state,fused_pair):
         for rid in remove_id:
             body = state.get_body(rid)
-            circles = self._create_circles(body['position'], body['radius'], body['mass'],rid)
             for pair in fused_pair:
                 if rid == pair[0]:
                     who_to_eat = pair[1]
             fusion_body = state.get_body(who_to_eat)
-            end_pos = fusion_body['position']
-            self.remove_effect.append({
-                'circles': circles,
-                'start_pos': body['position'].copy(),
-                'end_pos':end_pos,
-                'vel': body['velocity'].copy(),
-                'radius': body['radius'],
-                'frame': 0
-            })
+            self._add_remove_effect(rid, body['position'], body['velocity'], body['radius'], body['mass'],
+                                    fusion_body['position'], who_to_eat)
+
+    def _add_remove_effect(self, rid, position, velocity, radius, mass, end_pos, target):
+        circles = self._create_circles(position, radius, mass, rid)
+        self.remove_effect.append({
+            'circles': circles,
+            'id': rid,
+            'target': target, #吞并者id，render() 中终点跟随它移动
+            'mass': mass,
+            'sequence': self.sequence,
+            'start_pos': np.array(position, dtype=float),
+            'end_pos':end_pos,
+            'vel': np.array(velocity, dtype=float),
+            'radius': radius,
+            'frame': 0
+        })
+
+    def create_cluster_effect(self, clusters, old_state, moved_state, fused_state):
+        """fusion_mode='cluster' 时每个融合簇只创建两个特效：吞并者的融合特效，以及一个代表全部被吞并天体的消失特效
+        （位于它们的质心、按总质量取半径和颜色，id 取其中第一个）；每簇只吞并一个天体时与逐对特效完全相同"""
+        self.create_fusion_effect([fid for fid, _ in clusters], old_state, fused_state)
+        for fid, members in clusters:
+            bodies = [moved_state.get_body(rid) for rid in members]
+            mass = np.array([body['mass'] for body in bodies])
+            total = float(mass.sum())
+            if len(bodies) == 1:
+                position, velocity, radius = bodies[0]['position'], bodies[0]['velocity'], bodies[0]['radius']
+            else:
+                position = (mass[:, np.newaxis] * np.array([body['position'] for body in bodies])).sum(axis=0) / total
+                velocity = (mass[:, np.newaxis] * np.array([body['velocity'] for body in bodies])).sum(axis=0) / total
+                radius = 3 / 7 * total ** (1 / 3)
+            self._add_remove_effect(members[0], position, velocity, radius, total, moved_state.get_body(fid)['position'],
+                                    fid)
 
     def create_fusion_effect(self, fusion_id, old_state, new_state):
         for fid in fusion_id:
@@ -42,6 +77,8 @@ class SpecialEffect:
             self.fusion_effect.append({
                 'circles': circles,
                 'id':fid,
+                'mass': old_body['mass'],
+                'sequence': self.sequence,
                 'start_pos': old_body['position'].copy(),
                 'end_pos': new_body['position'].copy(),
                 'start_radius': old_body['radius'],
@@ -49,7 +86,15 @@ class SpecialEffect:
                 'frame': 0
             })
 
-    def _create_circles(self, pos, radius, mass,id):
+    def _create_circles(self, pos, radius, mass,id, sequence=None, rings=None):
+        if sequence is None:
+            self.sequence += 1
+            sequence = self.sequence
+        # 层数与天体一样按屏幕上的大小决定（细节层次），没有渲染器时画满
+        if rings is None:
+            rings = int(self.renderer.lod_layers([pos], [radius])[0]) if self.renderer else self.layer
+        slots = ring_slots(rings, self.layer)
+        z_offset = sequence * 1e-9
         circles = []
         ratio = np.clip((mass - SIMULATION_PARAMS['min_mass']) / (SIMULATION_PARAMS['max_mass'] - SIMULATION_PARAMS['min_mass'] + 1e-6), 0, 1)
         idx = min(int(ratio * 6), 5)
@@ -58,51 +103,123 @@ class SpecialEffect:
         if SIMULATION_PARAMS['center_mass'] and id == 0:
             inner = np.array([0.0, 0.0, 0.0])
             outer = outer_color = np.array([0.40, 0.02, 0.02])
-        for layer in range(self.layer):
-                r = (layer + 1) * radius / self.layer
-                t = layer / (self.layer - 1) if self.layer > 1 else 0
+        for layer in range(rings):
+                r = (layer + 1) * radius / rings
+                t = layer / (rings - 1) if rings > 1 else 0
                 color = (1 - t) * inner + t * outer
                 if layer == 0:
-                    circle = plt.Circle(pos, r, color=color, ec='none', zorder=20)
+                    circle = self.pool.acquire(pos, r, color, zorder=20 + z_offset, animated=self.blit)
                 else:
                     lw = 1.5 + 28 * (r / radius)
-                    circle = plt.Circle(pos, r, color=color, fill=False, linewidth=lw, ec=color, zorder=19 - layer)
-                self.ax.add_patch(circle)
+                    circle = self.pool.acquire(pos, r, color, zorder=19 - int(slots[layer]) + z_offset, linewidth=lw, animated=self.blit)
                 circles.append(circle)
         return circles
 
-    def update_remove_effect(self):
-        for eff in self.remove_effect[:]:
+    def _advance(self, effects, show=False):
+        """特效前进一个物理帧：播放完的放回圆环池（show 为 True 时重新显示天体），其余帧数加一，返回仍在播放的特效"""
+        for eff in effects[:]:
             if eff['frame'] >= self.total_frame:
-                for c in eff['circles']:
-                    c.set_visible(False)
-                self.remove_effect.remove(eff)
+                self.pool.release(eff['circles'])
+                if show and self.renderer:
+                    self.renderer.show_body(eff['id'])
+                effects.remove(eff)
             else:
                 eff['frame'] += 1
-                t = eff['frame'] / self.total_frame
-                t = t * t * (3 - 2 * t)
-                old_pos = eff['start_pos']
-                new_pos = eff['end_pos']
-                for i, c in enumerate(eff['circles']):
-                    c.center = t*new_pos+(1-t)*old_pos
-                    c.radius = (i + 1) * eff['radius'] * (1 - t) / self.layer
-                    c.set_alpha(1 - t)
+        return effects
+
+    def update_remove_effect(self):
+        for eff in self._advance(self.remove_effect):
+            self._apply_remove_effect(eff)
+
+    def _apply_remove_effect(self, eff, alpha=1.0):
+        t = max(eff['frame'] - 1 + alpha, 0) / self.total_frame
+        t = t * t * (3 - 2 * t)
+        old_pos = eff['start_pos']
+        new_pos = eff['end_pos']
+        for i, c in enumerate(eff['circles']):
+            c.center = t*new_pos+(1-t)*old_pos
+            c.radius = (i + 1) * eff['radius'] * (1 - t) / len(eff['circles'])
+            c.set_alpha(1 - t)
 
     def update_fusion_effect(self):
-        for eff in self.fusion_effect[:]:
-            if eff['frame'] >= self.total_frame:
-                for c in eff['circles']:
-                    c.set_visible(False)
-                if self.renderer:
-                    self.renderer.show_body(eff['id'])
-                self.fusion_effect.remove(eff)
+        for eff in self._advance(self.fusion_effect, show=True):
+            self._apply_fusion_effect(eff)
+
+    def _apply_fusion_effect(self, eff, alpha=1.0):
+        t = max(eff['frame'] - 1 + alpha, 0) / self.total_frame
+        t = t * t * (3 - 2 * t)
+        pos = (1 - t) * eff['start_pos'] + t * eff['end_pos']
+        radius = (1 - t) * eff['start_radius'] + t * eff['end_radius']
+        for i, c in enumerate(eff['circles']):
+            c.center = pos
+            c.radius = (i + 1) * radius / len(eff['circles'])
+
+    def advance(self):
+        """子步模式：每个物理帧调用一次，只推进帧数、回收播放完的特效，圆环留到 render() 统一更新"""
+        self._advance(self.remove_effect)
+        self._advance(self.fusion_effect, show=True)
+
+    def render(self, alpha=1.0, state=None):
+        """子步模式：每个显示帧调用一次，按 alpha（显示时刻在上一物理帧与当前物理帧之间的位置）更新所有特效的圆环
+        给出显示用的 state 时，融合特效与消失特效的终点跟随吞并者此刻的位置，过渡结束时恰好与天体重合，不再跳变"""
+        if state is not None:
+            index = state.index
+            for eff in self.fusion_effect:
+                if eff['id'] in index:
+                    eff['end_pos'] = state.pos[index[eff['id']]].copy()
+            for eff in self.remove_effect:
+                if eff.get('target') in index:
+                    eff['end_pos'] = state.pos[index[eff['target']]].copy()
+        for eff in self.remove_effect:
+            self._apply_remove_effect(eff, alpha)
+        for eff in self.fusion_effect:
+            self._apply_fusion_effect(eff, alpha)
+
+    def snapshot(self):
+        """进行中特效的数值状态（不含图元），写入存档用；kind 0 为消失特效，1 为融合特效"""
+        rows = [(0, eff['radius'], 0.0, eff['vel'], eff) for eff in self.remove_effect] + \
+               [(1, eff['start_radius'], eff['end_radius'], np.zeros(2), eff) for eff in self.fusion_effect]
+        return {
+            'kind': np.array([row[0] for row in rows], dtype=np.int64),
+            'start_radius': np.array([row[1] for row in rows], dtype=float),
+            'end_radius': np.array([row[2] for row in rows], dtype=float),
+            'vel': np.array([row[3] for row in rows], dtype=float).reshape(-1, 2),
+            **{key: np.array([row[4][key] for row in rows], dtype=dtype)
+               for key, dtype in (('id', np.int64), ('frame', np.int64), ('sequence', np.int64), ('mass', float))},
+            'rings': np.array([len(row[4]['circles']) for row in rows], dtype=np.int64),
+            'target': np.array([row[4].get('target', -1) for row in rows], dtype=np.int64),
+            'start_pos': np.array([row[4]['start_pos'] for row in rows], dtype=float).reshape(-1, 2),
+            'end_pos': np.array([row[4]['end_pos'] for row in rows], dtype=float).reshape(-1, 2),
+            'counter': np.array([self.sequence], dtype=np.int64),
+        }
+
+    def restore(self, saved):
+        """由 snapshot() 的结果重建特效：重新取出圆环，按保存的帧数设置到与存档时相同的样子"""
+        for eff in self.fusion_effect + self.remove_effect:
+            self.pool.release(eff['circles'])
+        self.fusion_effect, self.remove_effect = [], []
+        if not saved:
+            return
+        for k in range(len(saved['kind'])):
+            body_id = int(saved['id'][k])
+            rings = int(saved['rings'][k]) if 'rings' in saved else self.layer
+            circles = self._create_circles(saved['start_pos'][k], saved['start_radius'][k], saved['mass'][k],
+                                           body_id, int(saved['sequence'][k]), rings)
+            eff = {'circles': circles, 'id': body_id, 'mass': float(saved['mass'][k]),
+                   'sequence': int(saved['sequence'][k]), 'start_pos': saved['start_pos'][k].copy(),
+                   'end_pos': saved['end_pos'][k].copy(), 'frame': int(saved['frame'][k])}
+            if saved['kind'][k] == 0:
+                eff.update(vel=saved['vel'][k].copy(), radius=float(saved['start_radius'][k]),
+                           target=int(saved['target'][k]) if 'target' in saved else -1)
+                self.remove_effect.append(eff)
+                if eff['frame']:
+                    self._apply_remove_effect(eff)
             else:
-                eff['frame'] += 1
-                t = eff['frame'] / self.total_frame
-                t = t * t * (3 - 2 * t)
-                pos = (1 - t) * eff['start_pos'] + t * eff['end_pos']
-                radius = (1 - t) * eff['start_radius'] + t * eff['end_radius']
-                for i, c in enumerate(eff['circles']):
-                    c.center = pos
-                    c.radius = (i + 1) * radius / self.layer
+                eff.update(start_radius=float(saved['start_radius'][k]), end_radius=float(saved['end_radius'][k]))
+                self.fusion_effect.append(eff)
+                if self.renderer:
+                    self.renderer.hide_body(body_id)
+                if eff['frame']:
+                    self._apply_fusion_effect(eff)
+        self.sequence = int(saved['counter'][0])
 
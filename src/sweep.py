@@ -0,0 +1,181 @@
+# src/sweep.py 多进程参数扫描/系综运行：每个任务 = 一组参数 + 一个显式种子，互不共享随机状态
+# 用法：python -m src.sweep --seeds 100 --num-bodies 20 50 --G 1 2 --batch-size 100 --output sweep.csv
+import os
+import csv
+import time
+import itertools
+import multiprocessing
+import numpy as np
+from typing import Dict, Iterable, List, Optional
+from src.config import SIMULATION_PARAMS
+from src.headless_runner import HeadlessRunner
+from src.batched_engine import BatchedPhysicsEngine, BATCHED_INTEGRATORS
+
+CURVE_POINTS = 10 # 融合次数随时间变化的采样点数（等分 total_time）
+
+
+def sweep_tasks(variants:Optional[Dict[str, Iterable]] = None, seeds:Iterable[int] = range(10),
+                base:Optional[Dict] = None)->List[Dict]:
+    """由参数取值的笛卡尔积与种子列表生成任务，每个任务含 'index'/'seed'/'params'/'variant'"""
+    base = dict(SIMULATION_PARAMS if base is None else base)
+    variants = variants or {}
+    names = list(variants)
+    tasks = []
+    for values in itertools.product(*(list(variants[name]) for name in names)):
+        variant = dict(zip(names, values))
+        for seed in seeds:
+            tasks.append({'index': len(tasks), 'seed': int(seed), 'variant': variant,
+                          'params': dict(base, **variant)})
+    return tasks
+
+
+def summary_row(task:Dict, initial_bodies:int, state, fusion_frames:np.ndarray, frames:int,
+                seconds:float)->Dict:
+    """一次运行的汇总统计：存活数、融合数、最终质量分布与融合次数随时间的累计曲线"""
+    mass = state.mass
+    row = {'index': task['index'], 'seed': task['seed'], **task['variant'],
+           'initial_bodies': initial_bodies,
+           'survivors': len(state),
+           'fusions': len(fusion_frames),
+           'mass_max': float(mass.max()) if len(mass) else 0.0,
+           'mass_mean': float(mass.mean()) if len(mass) else 0.0,
+           'mass_median': float(np.median(mass)) if len(mass) else 0.0,
+           'mass_std': float(mass.std()) if len(mass) else 0.0,
+           #最大天体占总质量的比例，衡量“赢家通吃”的程度
+           'mass_top_fraction': float(mass.max() / mass.sum()) if len(mass) else 0.0}
+    # 融合次数随时间的累计曲线：第 k 列为前 (k+1)/CURVE_POINTS 的总时长内发生的融合次数
+    edges = np.linspace(0, frames, CURVE_POINTS + 1)[1:]
+    curve = np.searchsorted(np.sort(fusion_frames), edges, side='right')
+    for k, count in enumerate(curve):
+        row[f'fusions_t{k + 1}'] = int(count)
+    row['seconds'] = seconds
+    return row
+
+
+def run_task(task:Dict)->List[Dict]:
+    """在工作进程中运行一个任务，只返回汇总统计（不传回整条轨迹）"""
+    start = time.perf_counter()
+    runner = HeadlessRunner(task['params'], snapshot_stride=1 << 62, rng=np.random.default_rng(task['seed']))
+    initial_bodies = len(runner.state)
+    runner.run()
+    fusion_frames = np.array([event[0] for event in runner.fusion_events], dtype=np.int64)
+    return [summary_row(task, initial_bodies, runner.state, fusion_frames, runner.total_frames(),
+                        time.perf_counter() - start)]
+
+
+def run_batch(tasks:List[Dict])->List[Dict]:
+    """在一个工作进程中用 BatchedPhysicsEngine 同步推进一批任务，结果与逐个 run_task 相同
+    积分器或引力求解器不支持批量推进时退回逐个运行"""
+    params_list = [task['params'] for task in tasks]
+    if (params_list[0].get('integrator', 'taylor') not in BATCHED_INTEGRATORS or
+            params_list[0].get('gravity_solver', 'direct') != 'direct'):
+        return [row for task in tasks for row in run_task(task)]
+    start = time.perf_counter()
+    engine = BatchedPhysicsEngine(params_list)
+    state = engine.initialize([np.random.default_rng(task['seed']) for task in tasks])
+    initial_bodies = state.counts()
+    frames = int(round(params_list[0]['total_time'] / engine.dt))
+    events = np.array(engine.run(state, frames), dtype=np.int64).reshape(-1, 4)
+    seconds = (time.perf_counter() - start) / len(tasks)
+    return [summary_row(task, int(initial_bodies[u]), state.universe(u), events[events[:, 1] == u, 0],
+                        frames, seconds) for u, task in enumerate(tasks)]
+
+
+def batch_tasks(tasks:List[Dict], batch_size:int)->List[List[Dict]]:
+    """把 dt/积分器/总时长/求解器相同的任务分组，每组切成不超过 batch_size 个宇宙的批次"""
+    groups = {}
+    for task in tasks:
+        p = task['params']
+        key = (p['dt'], p.get('integrator', 'taylor'), p['total_time'], p.get('gravity_solver', 'direct'))
+        groups.setdefault(key, []).append(task)
+    return [group[start:start + batch_size] for group in groups.values()
+            for start in range(0, len(group), batch_size)]
+
+
+def run_sweep(tasks:List[Dict], processes:Optional[int] = None, verbose:bool = True,
+              batch_size:int = 1)->List[Dict]:
+    """把任务分发到进程池，按完成顺序打印进度，返回按任务序号排列的汇总表（每个任务一行）
+    batch_size > 1 时每个进程一次用批量引擎推进多个宇宙，天体数较少时能省去大部分 Python 开销"""
+    processes = processes or os.cpu_count() or 1
+    if batch_size > 1:
+        work, worker = batch_tasks(tasks, batch_size), run_batch
+    else:
+        work, worker = tasks, run_task
+    results = []
+    start = time.perf_counter()
+
+    def report(rows):
+        results.extend(rows)
+        if verbose:
+            done = len(results)
+            elapsed = time.perf_counter() - start
+            print(f"\r已完成 {done}/{len(tasks)}，用时 {elapsed:.1f}s，"
+                  f"预计剩余 {elapsed / done * (len(tasks) - done):.1f}s", end='', flush=True)
+
+    if processes == 1:
+        for item in work:
+            report(worker(item))
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            # 每个任务耗时差别很大（天体数不同），逐个分发，空闲进程随时领取下一个
+            for rows in pool.imap_unordered(worker, work, chunksize=1):
+                report(rows)
+    if verbose:
+        print()
+    return sorted(results, key=lambda row: row['index'])
+
+
+def save_table(results:List[Dict], path:str)->None:
+    """把汇总表写成 CSV，列为所有行中出现过的键"""
+    columns = list(dict.fromkeys(key for row in results for key in row))
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def summarize(results:List[Dict], by:List[str])->List[Dict]:
+    """按参数组合聚合各种子的结果：存活数、融合数、最大质量的均值与标准差"""
+    groups = {}
+    for row in results:
+        groups.setdefault(tuple(row.get(name) for name in by), []).append(row)
+    table = []
+    for key, rows in groups.items():
+        entry = dict(zip(by, key), runs=len(rows))
+        for column in ('survivors', 'fusions', 'mass_max'):
+            values = np.array([row[column] for row in rows], dtype=float)
+            entry[f'{column}_mean'] = float(values.mean())
+            entry[f'{column}_std'] = float(values.std())
+        table.append(entry)
+    return table
+
+
+def parse_args():
+    import argparse
+    parser = argparse.ArgumentParser(description="多进程参数扫描，每个参数组合运行多个种子")
+    parser.add_argument('--seeds', type=int, default=10, help="每个参数组合运行的种子数")
+    parser.add_argument('--first-seed', type=int, default=0, help="种子从该值开始连续编号")
+    parser.add_argument('--total-time', type=float, default=SIMULATION_PARAMS['total_time'], help="每次模拟总时长")
+    parser.add_argument('--num-bodies', type=int, nargs='+', default=None, help="天体数取值")
+    parser.add_argument('--G', type=float, nargs='+', default=None, help="引力常数取值")
+    parser.add_argument('--center-mass-num', type=float, nargs='+', default=None, help="中心天体质量取值")
+    parser.add_argument('--max-mass', type=float, nargs='+', default=None, help="随机质量上限取值")
+    parser.add_argument('--min-mass', type=float, nargs='+', default=None, help="随机质量下限取值")
+    parser.add_argument('--processes', type=int, default=None, help="进程数，默认 CPU 核数")
+    parser.add_argument('--batch-size', type=int, default=1, help="每个进程一次批量推进的宇宙数（小规模模拟建议 50~200）")
+    parser.add_argument('--output', default='sweep.csv', help="汇总表保存路径（.csv）")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    variants = {name: values for name, values in (
+        ('num_bodies', args.num_bodies), ('G', args.G), ('center_mass_num', args.center_mass_num),
+        ('max_mass', args.max_mass), ('min_mass', args.min_mass)) if values}
+    base = dict(SIMULATION_PARAMS, total_time=args.total_time)
+    tasks = sweep_tasks(variants, range(args.first_seed, args.first_seed + args.seeds), base)
+    results = run_sweep(tasks, args.processes, batch_size=args.batch_size)
+    save_table(results, args.output)
+    for entry in summarize(results, list(variants)):
+        print(entry)
+    print(f"汇总表已保存：{args.output}（{len(results)} 行）")
@@ -0,0 +1,102 @@
+# src/trails.py 轨迹尾迹：每个天体最近 length 帧的位置保存在 (N, length, 2) 的环形缓冲中，
+# 所有尾迹的线段画在同一个 LineCollection 里，越旧的线段越透明；每帧只做 O(N·length) 的数组运算，不为每个天体创建图元
+# LineCollection 的每个元素是一条折线（一个 Path）：把颜色相同、新旧程度相同的线段用 NaN 隔开拼成一条，
+# 元素个数 = 颜色种数 × (length-1)，与天体数无关
+import numpy as np
+from typing import Callable, Dict, List, Optional
+from matplotlib.collections import LineCollection
+
+
+class TrailRenderer:
+    """所有天体共用一个写入位置 head：每帧把当前位置写入第 head 列，再把 head 后移一格
+    count 为每个天体已记录的点数（新出现的天体从 0 开始），只画两端都有效的线段"""
+
+    def __init__(self, ax, length:int, color_of:Callable[[dict], np.ndarray], linewidth:float = 1.0,
+                 alpha:float = 0.6, zorder:float = 0, animated:bool = False):
+        self.length = max(2, int(length))
+        self.color_of = color_of # 天体字典 → 尾迹的 RGB
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.history = np.zeros((0, self.length, 2))
+        self.count = np.zeros(0, dtype=np.int64)
+        self.colors = np.zeros((0, 3))
+        self.groups = None # 按颜色分组的行号，天体增减时重新计算
+        self.head = 0
+        # 从旧到新每段线的不透明度
+        self.fade = alpha * np.arange(1, self.length) / (self.length - 1)
+        self.collection = LineCollection([], linewidths=linewidth, zorder=zorder, animated=animated)
+        ax.add_collection(self.collection, autolim=False)
+
+    def reset(self, state, bodies:Optional[List[dict]] = None)->None:
+        """清空尾迹并记录 state 为第一个点；bodies 用于取颜色（恢复存档时为换成着色质量的天体字典）"""
+        bodies = state.bodies if bodies is None else bodies
+        self.ids = state.ids.copy()
+        self.history = np.zeros((len(self.ids), self.length, 2))
+        self.count = np.zeros(len(self.ids), dtype=np.int64)
+        self.colors = np.array([self.color_of(body) for body in bodies], dtype=float).reshape(-1, 3)
+        self.groups = None
+        self.head = 0
+        self.update(state)
+
+    def update(self, state, remove_id=())->None:
+        """追加一帧：被融合消失的天体（remove_id，以及其他已不在状态中的天体）的尾迹直接退役，
+        新出现的天体追加到末尾"""
+        keep = np.isin(self.ids, state.ids)
+        if len(remove_id):
+            keep &= ~np.isin(self.ids, np.asarray(list(remove_id), dtype=np.int64))
+        if not keep.all():
+            self.ids, self.history = self.ids[keep], self.history[keep]
+            self.count, self.colors = self.count[keep], self.colors[keep]
+            self.groups = None
+        new = ~np.isin(state.ids, self.ids)
+        if new.any():
+            rows = np.nonzero(new)[0]
+            self.ids = np.concatenate([self.ids, state.ids[rows]])
+            self.history = np.concatenate([self.history, np.zeros((len(rows), self.length, 2))])
+            self.count = np.concatenate([self.count, np.zeros(len(rows), dtype=np.int64)])
+            colors = [self.color_of(state.bodies[row]) for row in rows]
+            self.colors = np.concatenate([self.colors, np.array(colors, dtype=float).reshape(-1, 3)])
+            self.groups = None
+        order = np.argsort(state.ids, kind='stable')
+        rows = order[np.searchsorted(state.ids, self.ids, sorter=order)]
+        self.history[:, self.head] = state.pos[rows]
+        self.count = np.minimum(self.count + 1, self.length)
+        self.head = (self.head + 1) % self.length
+        self._apply()
+
+    def _apply(self)->None:
+        """按从旧到新的顺序取出各天体的点（未记录的点置为 NaN，线在此断开），
+        每种颜色、每个新旧程度的线段拼成一条以 NaN 分隔的折线写入 LineCollection"""
+        if self.groups is None:
+            palette, inverse = np.unique(self.colors, axis=0, return_inverse=True)
+            self.groups = [(color, np.nonzero(inverse.ravel() == g)[0]) for g, color in enumerate(palette)]
+        order = (self.head + np.arange(self.length)) % self.length
+        points = self.history[:, order]
+        points[np.arange(self.length)[None, :] < (self.length - self.count)[:, None]] = np.nan
+        segments, colors = [], []
+        for color, rows in self.groups:
+            n = len(rows)
+            # (length-1, n, 3, 2)：每段线的起点、终点和一个 NaN 分隔点
+            pieces = np.full((self.length - 1, n, 3, 2), np.nan)
+            pieces[:, :, 0] = points[rows, :-1].transpose(1, 0, 2)
+            pieces[:, :, 1] = points[rows, 1:].transpose(1, 0, 2)
+            segments.extend(pieces.reshape(self.length - 1, n * 3, 2))
+            colors.extend((*color, alpha) for alpha in self.fade)
+        self.collection.set_segments(segments)
+        self.collection.set_color(colors)
+
+    def artists(self)->List:
+        return [self.collection]
+
+    def snapshot(self)->Dict[str, np.ndarray]:
+        """尾迹缓冲的完整状态，写入存档用"""
+        return {'ids': self.ids, 'history': self.history, 'count': self.count, 'colors': self.colors,
+                'head': np.array([self.head])}
+
+    def restore(self, saved:Dict[str, np.ndarray])->None:
+        self.ids = np.array(saved['ids'], dtype=np.int64)
+        self.history = np.array(saved['history'], dtype=float).reshape(len(self.ids), self.length, 2)
+        self.count = np.array(saved['count'], dtype=np.int64)
+        self.colors = np.array(saved['colors'], dtype=float).reshape(-1, 3)
+        self.head = int(saved['head'][0])
+        self.groups = None
+        self._apply()
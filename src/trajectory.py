@@ -0,0 +1,222 @@
+# src/trajectory.py 紧凑的二进制轨迹记录与内存映射回放
+# 一次运行 = 一个目录，每一列一个追加写入的原始二进制文件，外加帧偏移索引：
+#   ids.bin mass.bin radius.bin pos.bin vel.bin   逐帧拼接的天体数据
+#   frames.bin  每帧 (行起点, 行数, 帧号) int64；times.bin 每帧时间 float64
+#   events.bin  融合事件，每行见 EVENT_FIELDS
+#   meta.json   列的类型与形状、参数等
+import os
+import json
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from src.simulation_data import SimulationState, create_body
+from src.physics_engine import group_clusters
+
+COLUMNS = {
+    'ids': (np.int64, ()),
+    'mass': (np.float64, ()),
+    'radius': (np.float64, ()),
+    'pos': (np.float64, (2,)),
+    'vel': (np.float64, (2,)),
+}
+# 融合事件：帧号、消失天体id、吞并它的天体id，以及重建特效所需的数据：
+# 消失天体与吞并者“积分后、融合前”的数据，吞并者“融合后、删除前”的位置与半径
+EVENT_FIELDS = ('frame', 'remove_id', 'fusion_id', 'remove_mass', 'remove_radius',
+                'remove_x', 'remove_y', 'fusion_x', 'fusion_y', 'fused_radius', 'fused_x', 'fused_y')
+
+
+class TrajectoryRecorder:
+    """逐帧追加写入，写入量只和当前天体数有关，不会随运行时长变慢"""
+
+    def __init__(self, path:str, params:Optional[Dict] = None, star_seed:Optional[int] = None):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._files = {name: open(os.path.join(path, f'{name}.bin'), 'wb') for name in COLUMNS}
+        self._frames = open(os.path.join(path, 'frames.bin'), 'wb')
+        self._times = open(os.path.join(path, 'times.bin'), 'wb')
+        self._events = open(os.path.join(path, 'events.bin'), 'wb')
+        self.rows = 0
+        self.frame_count = 0
+        self.event_count = 0
+        self.meta = {
+            'columns': {name: [np.dtype(dtype).str, list(shape)] for name, (dtype, shape) in COLUMNS.items()},
+            'event_fields': list(EVENT_FIELDS),
+            'params': {k: v for k, v in (params or {}).items() if isinstance(v, (int, float, str, bool, type(None)))},
+            'star_seed': star_seed, #渲染背景星空的种子，回放与导出时复现同样的画面
+        }
+
+    def record_state(self, state:SimulationState)->None:
+        """记录一帧完整状态"""
+        for name, (dtype, _) in COLUMNS.items():
+            self._files[name].write(np.ascontiguousarray(getattr(state, name), dtype=dtype).tobytes())
+        self._frames.write(np.array([self.rows, len(state), state.frame], dtype=np.int64).tobytes())
+        self._times.write(np.array([state.time], dtype=np.float64).tobytes())
+        self.rows += len(state)
+        self.frame_count += 1
+
+    def record_step(self, result:Dict)->None:
+        """记录 PhysicsEngine.step 的结果：新状态与本帧的融合事件"""
+        state = result['state']
+        moved_state = result['moved_state']
+        fused_state = result['fused_state']
+        if result['fused_pair']:
+            events = []
+            for remove_body_id, fusion_body_id in result['fused_pair']:
+                removed = moved_state.get_body(remove_body_id)
+                eater = moved_state.get_body(fusion_body_id)
+                fused = fused_state.get_body(fusion_body_id)
+                events.append([state.frame, remove_body_id, fusion_body_id, removed['mass'], removed['radius'],
+                               *removed['position'], *eater['position'], fused['radius'], *fused['position']])
+            self._events.write(np.array(events, dtype=np.float64).tobytes())
+            self.event_count += len(events)
+        self.record_state(state)
+
+    def close(self)->None:
+        for f in (*self._files.values(), self._frames, self._times, self._events):
+            f.close()
+        self.meta.update(rows=self.rows, frame_count=self.frame_count, event_count=self.event_count)
+        with open(os.path.join(self.path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, ensure_ascii=False, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TrajectoryReader:
+    """用 np.memmap 打开各列，随机访问任意一帧只读取该帧的数据"""
+
+    def __init__(self, path:str):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.columns = {}
+        for name, (dtype, shape) in self.meta['columns'].items():
+            self.columns[name] = self._map(name, np.dtype(dtype), (self.meta['rows'], *shape))
+        self.frames = self._map('frames', np.dtype(np.int64), (self.meta['frame_count'], 3))
+        self.times = self._map('times', np.dtype(np.float64), (self.meta['frame_count'],))
+        self.events = self._map('events', np.dtype(np.float64), (self.meta['event_count'], len(EVENT_FIELDS)))
+        # 融合事件按帧号排序写入，二分即可找到某帧的事件
+        self._event_frames = np.asarray(self.events[:, 0], dtype=np.int64)
+
+    def _map(self, name:str, dtype:np.dtype, shape:Tuple)->np.ndarray:
+        if shape[0] == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(os.path.join(self.path, f'{name}.bin'), dtype=dtype, mode='r', shape=shape)
+
+    def __len__(self)->int:
+        return len(self.frames)
+
+    def state(self, k:int)->SimulationState:
+        """第 k 个记录帧的状态（只复制这一帧的行）"""
+        start, count, frame = (int(x) for x in self.frames[k])
+        rows = slice(start, start + count)
+        return SimulationState.from_arrays(
+            *(np.array(self.columns[name][rows]) for name in COLUMNS),
+            time=float(self.times[k]), frame=frame, copy=False)
+
+    def frame_events(self, k:int)->np.ndarray:
+        """第 k 个记录帧产生的融合事件（每行见 EVENT_FIELDS）"""
+        frame = int(self.frames[k, 2])
+        lo, hi = np.searchsorted(self._event_frames, [frame, frame + 1])
+        return np.asarray(self.events[lo:hi])
+
+    def fusion_info(self, k:int)->Tuple[List, List, List[List], SimulationState, SimulationState]:
+        """还原第 k 帧的 fusion_id/remove_id/fused_pair，以及两个只含相关天体的状态：
+        moved_state（积分后、融合前）与 fused_state（融合后、删除前），
+        这些正好是 SpecialEffect.create_remove_effect/create_fusion_effect 需要的输入"""
+        events = self.frame_events(k)
+        remove_id = [int(e[1]) for e in events]
+        fusion_id = [int(e[2]) for e in events]
+        fused_pair = [[r, f] for r, f in zip(remove_id, fusion_id)]
+        moved, fused = {}, {}
+        for e in events:
+            moved.setdefault(int(e[2]), create_body(int(e[2]), 0.0, 0.0, e[7:9]))
+            moved[int(e[1])] = create_body(int(e[1]), e[3], e[4], e[5:7])
+            fused.setdefault(int(e[2]), create_body(int(e[2]), 0.0, e[9], e[10:12]))
+        return (fusion_id, remove_id, fused_pair,
+                SimulationState(list(moved.values())), SimulationState(list(fused.values())))
+
+
+class TrajectoryPlayer:
+    """把记录的轨迹逐帧应用到 Renderer 与 SpecialEffect 上，调用顺序与 MainController.update_frame 一致"""
+
+    def __init__(self, reader:TrajectoryReader, renderer, effect=None):
+        self.reader = reader
+        self.renderer = renderer
+        self.effect = effect
+        self.k = 0
+        self.state = reader.state(0)
+        renderer.initialize_graphics(self.state)
+
+    def seek(self, k:int)->None:
+        """不创建特效，直接把天体图形跳到第 k 帧（期间消失的天体一并从画布删除）"""
+        if k <= self.k:
+            return
+        first = int(self.reader.frames[self.k, 2]) + 1
+        last = int(self.reader.frames[k, 2])
+        lo, hi = np.searchsorted(self.reader._event_frames, [first, last + 1])
+        removed = [int(body_id) for body_id in self.reader.events[lo:hi, 1]]
+        self.state = self.reader.state(k)
+        self.renderer.update_graphics(self.state, removed)
+        trails = getattr(self.renderer, 'trails', None)
+        if trails is not None:
+            # 尾迹需要最近 length 帧的位置：从记录中重放这几帧，画面与连续播放一致（颜色沿用最初着色的质量）
+            from src.renderer import with_color_mass
+            first = max(0, k - trails.length + 1)
+            start = self.reader.state(first)
+            trails.reset(start, with_color_mass(start.bodies, self.renderer.color_masses()))
+            for j in range(first + 1, k + 1):
+                trails.update(self.reader.state(j))
+        self.k = k
+
+    def advance(self)->bool:
+        """播放下一帧，已到结尾时返回 False"""
+        k = self.k + 1
+        if k >= len(self.reader):
+            return False
+        old_state = self.state
+        self.state = self.reader.state(k)
+        fusion_id, remove_id, fused_pair, moved_state, fused_state = self.reader.fusion_info(k)
+        if fusion_id and self.effect is not None:
+            if self.reader.meta['params'].get('fusion_mode') == 'cluster':
+                self.effect.create_cluster_effect(group_clusters(fused_pair), old_state, moved_state, fused_state)
+            else:
+                self.effect.create_fusion_effect(fusion_id, old_state, fused_state)
+                self.effect.create_remove_effect(remove_id, moved_state, fused_pair)
+        self.renderer.update_graphics(self.state, remove_id)
+        if self.effect is not None:
+            self.effect.update_remove_effect()
+            self.effect.update_fusion_effect()
+        self.k = k
+        return True
+
+
+def replay(path:str, with_effects:bool = True):
+    """用记录的轨迹驱动现有 Renderer（与特效）播放，不重新计算物理"""
+    import matplotlib.pyplot as plt
+    from matplotlib.animation import FuncAnimation
+    from src.renderer import create_renderer
+    from src.special_effect import SpecialEffect
+    from src.config import RENDERER_PARAMS
+
+    reader = TrajectoryReader(path)
+    renderer = create_renderer(reader.meta.get('star_seed'))
+    effect = SpecialEffect(renderer.ax, renderer) if with_effects else None
+    player = TrajectoryPlayer(reader, renderer, effect)
+
+    def update_frame(_):
+        player.advance()
+        return renderer.animated_artists() + (effect.active_artists() if effect else [])
+
+    dt = reader.meta['params'].get('dt', 0.05)
+    ani = FuncAnimation(renderer.fig, update_frame, interval=int(dt * 1000),
+                        blit=RENDERER_PARAMS['blit'], cache_frame_data=False)
+    plt.show()
+    return ani
+
+
+if __name__ == "__main__":
+    import sys
+    replay(sys.argv[1])